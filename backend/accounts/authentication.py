@@ -0,0 +1,115 @@
+"""
+JWT authentication without a per-request user query.
+
+simplejwt's JWTAuthentication verifies the token signature and then SELECTs
+the user on every request. `CachedJWTAuthentication` keeps two bounded
+per-process LRUs:
+
+- verified access tokens, keyed by a SHA-256 of the raw token and kept no
+  longer than the token's own `exp`, so a repeat token skips the signature
+  and claim checks;
+- users by id, for AUTH_USER_CACHE_TTL seconds. Saving or deleting a User
+  evicts it in this process (see accounts/signals.py); other processes pick
+  the change up when their entry expires, and so do QuerySet.update() calls,
+  which send no signals. Only users that pass simplejwt's is_active and
+  revoked-token checks are cached.
+
+Each request gets its own copy of the cached user, so views that modify
+request.user never touch the shared instance.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class ExpiringLRU:
+    """Thread-safe LRU whose entries each carry their own expiry (time.time() seconds)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+tokens = ExpiringLRU(getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000))
+users = ExpiringLRU(getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000))
+
+
+def leeway():
+    value = api_settings.LEEWAY
+    return value.total_seconds() if isinstance(value, timedelta) else value
+
+
+def user_cache_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+
+def evict_user(user_id):
+    users.delete(str(user_id))
+
+
+def clear():
+    tokens.clear()
+    users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that caches verified tokens and resolved users per process"""
+
+    def get_validated_token(self, raw_token):
+        key = hashlib.sha256(raw_token).digest()
+        token = tokens.get(key)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            tokens.set(key, token, token['exp'] + leeway())
+        return token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = None if user_id is None else users.get(str(user_id))
+        if user is None:
+            # The parent does the lookup and the is_active / revoked-token checks; only users
+            # that pass them are cached, and any later save evicts them
+            user = super().get_user(validated_token)
+            if user_cache_ttl() > 0:
+                users.set(str(user_id), user, time.time() + user_cache_ttl())
+        return copy.copy(user)
@@ -0,0 +1,41 @@
+"""
+Email login.
+
+Accounts are keyed by email (username is kept equal to it). `EmailBackend`
+resolves an email with one lookup on LOWER(email), which the
+auth_user_email_lower_uniq index (migration 0001) serves and keeps unique;
+identifiers without an @ fall back to ModelBackend's username lookup, so
+admin accounts created with a plain username still work.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+UserModel = get_user_model()
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def users_with_email(email):
+    """Users whose email matches case-insensitively; an index lookup on LOWER(email)"""
+    # email__gt='' repeats the partial index's predicate, which is what lets the planner use it
+    return UserModel._default_manager.alias(email_lower=Lower('email')).filter(
+        email_lower=normalize_email(email), email__gt='',
+    )
+
+
+class EmailBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        identifier = email or username
+        if identifier is None or password is None or '@' not in identifier:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        try:
+            user = users_with_email(identifier).get()
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords (as ModelBackend does)
+            UserModel().set_password(password)
+        else:
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import authentication
+from accounts.authentication import CachedJWTAuthentication
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request authentication overhead (time and queries) of simplejwt's JWTAuthentication "
+        "against CachedJWTAuthentication, with requests cycling through --users tokens. Runs inside a "
+        "rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=100,
+                            help="Distinct users (and tokens) the requests cycle through.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'bench-auth-{i}@example.com') for i in range(options['users'])
+            ])
+            headers = [f'Bearer {RefreshToken.for_user(user).access_token}' for user in users]
+            factory = APIRequestFactory()
+            requests = [
+                factory.get('/api/auth/me/', HTTP_AUTHORIZATION=headers[i % len(headers)])
+                for i in range(options['requests'])
+            ]
+
+            self.stdout.write(f"{'class':>24} {'us/request':>11} {'p95 us':>8} {'queries/request':>16}")
+            for authenticator in (JWTAuthentication(), CachedJWTAuthentication()):
+                authentication.clear()
+                self.report(authenticator, requests)
+            transaction.set_rollback(True)
+
+    def report(self, authenticator, requests):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for request in requests:
+                started = time.perf_counter()
+                authenticator.authenticate(request)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        self.stdout.write(
+            f"{type(authenticator).__name__:>24} {statistics.mean(timings) * 1e6:>11.1f} "
+            f"{timings[int(len(timings) * 0.95) - 1] * 1e6:>8.1f} {len(queries) / len(requests):>16.3f}"
+        )
@@ -0,0 +1,68 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+PASSWORD = 'bench-login-pass'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput: the old two-step path (SELECT by email, then ModelBackend's username "
+        "lookup) against EmailBackend's single LOWER(email) index lookup. Seeds --users accounts inside a "
+        "rolled-back transaction. Password hashing dominates real logins; --fast-hasher swaps in MD5 so the "
+        "lookup cost is visible."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--logins', type=int, default=2000)
+        parser.add_argument('--fast-hasher', action='store_true')
+
+    def handle(self, *args, **options):
+        hashers = {'PASSWORD_HASHERS': FAST_HASHERS} if options['fast_hasher'] else {}
+        with override_settings(**hashers), transaction.atomic():
+            password = make_password(PASSWORD)
+            User.objects.bulk_create([
+                User(username=f'bench-login-{i}@example.com', email=f'bench-login-{i}@example.com',
+                     password=password)
+                for i in range(options['users'])
+            ], batch_size=5000)
+            rng = random.Random(42)
+            emails = [f'bench-login-{rng.randrange(options["users"])}@example.com' for _ in range(options['logins'])]
+
+            self.stdout.write(f"{'path':>24} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'queries/login':>14}")
+            with override_settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend']):
+                self.report('email SELECT + username', emails, self.two_step)
+            with override_settings(AUTHENTICATION_BACKENDS=['accounts.backends.EmailBackend']):
+                self.report('EmailBackend', emails, self.email_backend)
+            transaction.set_rollback(True)
+
+    def two_step(self, email):
+        # What CustomTokenObtainPairSerializer did before EmailBackend
+        username = User.objects.get(email=email).username
+        return authenticate(username=username, password=PASSWORD)
+
+    def email_backend(self, email):
+        return authenticate(username=email, password=PASSWORD)
+
+    def report(self, label, emails, login):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for email in emails:
+                started = time.perf_counter()
+                assert login(email) is not None, email
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        self.stdout.write(
+            f"{label:>24} {len(timings) / sum(timings):>9.0f} {statistics.median(timings) * 1000:>8.2f} "
+            f"{timings[int(len(timings) * 0.95) - 1] * 1000:>8.2f} {len(queries) / len(timings):>14.1f}"
+        )
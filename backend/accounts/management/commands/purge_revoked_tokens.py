@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete revoked refresh tokens that have expired anyway, in batches that each commit on their own "
+        "so no long lock is held. Safe to run while the site is serving; schedule it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches to spread out the write load.")
+
+    def handle(self, *args, **options):
+        total = batches = 0
+        for deleted in tokens.purge_expired(options['batch_size']):
+            total += deleted
+            batches += 1
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} expired revoked token(s) in {batches} batch(es)."))
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.exclude(email='').annotate(email_lower=Lower('email')).values('email_lower')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1).values_list('email_lower', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Can't add a case-insensitive unique index on auth_user.email; these emails are used by "
+            f"more than one account: {', '.join(duplicates[:20])}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        # auth_user belongs to django.contrib.auth, so the index is created in SQL rather than
+        # through a model constraint. Blank emails (e.g. createsuperuser without one) are exempt;
+        # `email > ''` is spelled the way accounts.backends.users_with_email filters so that
+        # SQLite and PostgreSQL can match the partial index to the lookup.
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_lower_uniq ON auth_user (LOWER(email)) WHERE email > ''",
+            "DROP INDEX auth_user_email_lower_uniq",
+        ),
+    ]
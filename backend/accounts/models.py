@@ -1,3 +1,14 @@
 from django.db import models
 
-# Create your models here.
+
+class RevokedRefreshToken(models.Model):
+    """
+    A refresh token that may no longer be used, kept only until it would have
+    expired anyway (see accounts/tokens.py). Rows are keyed by the token's jti
+    as a 16-byte UUID, so a revocation check is one primary-key probe.
+    """
+    jti = models.UUIDField(primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)  # purge_revoked_tokens walks this
+
+    def __str__(self):
+        return f"{self.jti} (until {self.expires_at:%Y-%m-%d %H:%M})"
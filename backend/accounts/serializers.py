@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from . import tokens
+from .backends import users_with_email
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -13,7 +17,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ('email', 'password', 'first_name', 'last_name')
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if users_with_email(value).exists():
             raise serializers.ValidationError("A user with this email already exists.")
         return value
 
@@ -61,19 +65,11 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         self.fields['username'].required = False
     
     def validate(self, attrs):
-        # Handle email-based login
+        # EmailBackend resolves an email passed as the username in one indexed lookup
         email = self.initial_data.get('email')
-        username = attrs.get('username')
-        
-        # If email is provided but no username, convert email to username
-        if email and not username:
-            try:
-                user = User.objects.get(email=email)
-                attrs['username'] = user.username
-            except User.DoesNotExist:
-                # Set a dummy username to let parent handle authentication failure
-                attrs['username'] = 'nonexistent@example.com'
-        
+        if email and not attrs.get('username'):
+            attrs['username'] = email
+
         # Ensure we have a username for the parent validation
         if not attrs.get('username'):
             raise serializers.ValidationError("Either username or email is required.")
@@ -84,3 +80,34 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Attach serialized user
         data['user'] = UserSerializer(self.user).data
         return data
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that rejects revoked tokens and revokes the one it rotates away (accounts/tokens.py)"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        rotate = api_settings.ROTATE_REFRESH_TOKENS
+        revoke = rotate and api_settings.BLACKLIST_AFTER_ROTATION
+        if revoke:
+            # Replays this process already saw are refused here; otherwise revoke()'s INSERT is the check
+            if tokens.revoked.get(tokens.token_jti(refresh)):
+                raise InvalidToken("Token is blacklisted")
+        elif tokens.is_revoked(refresh):
+            raise InvalidToken("Token is blacklisted")
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        if revoke and not tokens.revoke(refresh):
+            raise InvalidToken("Token is blacklisted")
+
+        data = {'access': str(refresh.access_token)}
+        if rotate:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
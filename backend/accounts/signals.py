@@ -0,0 +1,14 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import authentication
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    # Login bumps last_login; nothing authentication reads changes, so keep the entry
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    authentication.evict_user(instance.pk)
@@ -1,10 +1,22 @@
+import io
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
 import pytest
+from django.contrib.auth import authenticate
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from . import tokens
+from .authentication import CachedJWTAuthentication
+from .models import RevokedRefreshToken
 from .factories import UserFactory
 
 
@@ -242,3 +254,150 @@ class UserSerializerTest(TestCase):
         user = UserFactory(first_name='', last_name='', email='test@example.com')
         serializer = UserSerializer(user)
         self.assertEqual(serializer.data['full_name'], 'test@example.com')
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    """Test the cached JWT authentication class"""
+
+    def setUp(self):
+        self.user = UserFactory(email='cached@example.com', first_name='Cache')
+        self.token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.me_url = reverse('me')
+
+    def test_repeat_requests_skip_the_user_query(self):
+        """Test only the first request with a token looks the user up"""
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.me_url)
+        self.assertEqual(response.data['email'], 'cached@example.com')
+
+    def test_user_save_evicts(self):
+        """Test profile changes, deactivation and deletion are seen on the next request"""
+        self.client.get(self.me_url)
+        self.client.patch(self.me_url, {'first_name': 'Changed'})
+        self.assertEqual(self.client.get(self.me_url).data['first_name'], 'Changed')
+
+        # Login only bumps last_login and keeps the entry
+        login = self.client.post(reverse('login'), {'email': 'cached@example.com', 'password': 'testpass123'})
+        self.assertEqual(login.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.client.get(self.me_url)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.delete()
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_is_rejected(self):
+        """Test a cached token stops working at its exp"""
+        self.client.get(self.me_url)
+        later = datetime.fromtimestamp(self.token['exp'] + 1, tz=dt_timezone.utc)
+        with mock.patch('accounts.authentication.time.time', return_value=self.token['exp'] + 1), \
+                mock.patch('rest_framework_simplejwt.tokens.aware_utcnow', return_value=later):
+            self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_requests_get_their_own_user(self):
+        """Test views can't modify the cached instance through request.user"""
+        request = mock.Mock(META={'HTTP_AUTHORIZATION': f'Bearer {self.token}'})
+        first, _ = CachedJWTAuthentication().authenticate(request)
+        second, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(first.pk, second.pk)
+        self.assertIsNot(first, second)
+
+
+class EmailBackendTest(APITestCase):
+    """Test case-insensitive email login and uniqueness"""
+
+    def setUp(self):
+        self.user = UserFactory(email='Mixed.Case@Example.com', password='testpass123')
+
+    def test_login_is_case_insensitive_and_single_lookup(self):
+        """Test login by email in any case costs one SELECT (plus the last_login UPDATE)"""
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('login'), {'email': ' mixed.case@EXAMPLE.com',
+                                                           'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['id'], self.user.id)
+
+        response = self.client.post(reverse('login'), {'email': 'mixed.case@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_username_login_still_works(self):
+        """Test accounts with a plain username (e.g. admins) log in through ModelBackend"""
+        admin = User.objects.create_user('admin', password='adminpass123')
+        self.assertEqual(authenticate(username='admin', password='adminpass123'), admin)
+        response = self.client.post(reverse('login'), {'username': 'admin', 'password': 'adminpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_email_is_unique_ignoring_case(self):
+        """Test registration, profile updates and the index reject the same email in another case"""
+        response = self.client.post(reverse('register'), {'email': 'MIXED.case@example.com', 'password': 'newpass123!'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = UserFactory(email='other@example.com')
+        self.client.force_authenticate(other)
+        response = self.client.patch(reverse('me'), {'email': 'mixed.CASE@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(username='dupe', email='MIXED.CASE@EXAMPLE.COM')
+        # Blank emails are exempt
+        User.objects.create(username='blank1')
+        User.objects.create(username='blank2')
+
+
+class RefreshRotationTest(APITestCase):
+    """Test refresh-token rotation and revocation"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.refresh = str(RefreshToken.for_user(self.user))
+        self.url = reverse('refresh')
+
+    def test_rotated_token_is_revoked(self):
+        """Test a refresh returns a new token and the old one stops working"""
+        # User SELECT, then the revoking INSERT in its savepoint
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, {'refresh': self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rotated = response.data['refresh']
+        self.assertNotEqual(rotated, self.refresh)
+        self.assertEqual(RevokedRefreshToken.objects.count(), 1)
+
+        # Replays this process has seen are refused without touching the database
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'refresh': self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post(self.url, {'refresh': rotated}).status_code, status.HTTP_200_OK)
+
+    def test_revocation_from_another_process(self):
+        """Test the table still catches a replay the in-process front never saw"""
+        self.client.post(self.url, {'refresh': self.refresh})
+        tokens.revoked.clear()
+        self.assertEqual(self.client.post(self.url, {'refresh': self.refresh}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_cannot_refresh(self):
+        """Test refresh is refused once the account is deactivated or deleted"""
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post(self.url, {'refresh': self.refresh}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.user.delete()
+        self.assertEqual(self.client.post(self.url, {'refresh': self.refresh}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_purge_deletes_expired_rows_in_batches(self):
+        """Test the purge command removes only expired revocations"""
+        now = timezone.now()
+        RevokedRefreshToken.objects.bulk_create(
+            [RevokedRefreshToken(jti=uuid.uuid4(), expires_at=now - timedelta(days=1)) for _ in range(5)]
+            + [RevokedRefreshToken(jti=uuid.uuid4(), expires_at=now + timedelta(days=1))]
+        )
+        out = io.StringIO()
+        call_command('purge_revoked_tokens', batch_size=2, stdout=out)
+        self.assertIn('Purged 5 expired revoked token(s) in 3 batch(es)', out.getvalue())
+        self.assertEqual(RevokedRefreshToken.objects.count(), 1)
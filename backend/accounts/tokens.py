@@ -0,0 +1,76 @@
+"""
+Refresh-token rotation store.
+
+With ROTATE_REFRESH_TOKENS every /api/auth/refresh/ call hands out a new
+refresh token; with BLACKLIST_AFTER_ROTATION the one it was given must never
+work again. simplejwt's token_blacklist app would record every token ever
+issued (OutstandingToken) plus a row per blacklisting. This store only
+records revoked tokens, as (jti UUID, expires_at), and only until they expire:
+
+- revoking is one INSERT on the primary key. A conflict means the token had
+  already been revoked, i.e. it is being replayed, so check-and-revoke is a
+  single atomic statement even when two refreshes race;
+- a per-process LRU of recently revoked jtis answers replays without a
+  query. It only ever holds positives: a miss still goes to the table, so a
+  token revoked by another process can't slip through;
+- `manage.py purge_revoked_tokens` deletes expired rows in small batches.
+"""
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import ExpiringLRU, leeway
+from .models import RevokedRefreshToken
+
+revoked = ExpiringLRU(getattr(settings, 'REVOKED_TOKEN_CACHE_SIZE', 10000))
+
+
+def token_jti(token):
+    try:
+        return uuid.UUID(token[api_settings.JTI_CLAIM])
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidToken("Token has no valid jti") from e
+
+
+def is_revoked(token):
+    jti = token_jti(token)
+    if revoked.get(jti):
+        return True
+    if RevokedRefreshToken.objects.filter(pk=jti).exists():
+        revoked.set(jti, True, token['exp'] + leeway())
+        return True
+    return False
+
+
+def revoke(token):
+    """Revoke `token`; returns False if it already was (the token is being replayed)"""
+    jti = token_jti(token)
+    if revoked.get(jti):
+        return False
+    try:
+        with transaction.atomic():
+            RevokedRefreshToken.objects.create(
+                jti=jti, expires_at=datetime.fromtimestamp(token['exp'] + leeway(), tz=timezone.utc),
+            )
+        first = True
+    except IntegrityError:
+        first = False
+    revoked.set(jti, True, token['exp'] + leeway())
+    return first
+
+
+def purge_expired(batch_size=5000, now=None):
+    """Yield the number of rows deleted per batch of expired revocations; each batch commits on its own"""
+    now = now or datetime.now(tz=timezone.utc)
+    expired = RevokedRefreshToken.objects.filter(expires_at__lt=now)
+    while True:
+        # Deleting by primary key keeps every statement (and its locks) to one small batch
+        jtis = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not jtis:
+            return
+        deleted, _ = RevokedRefreshToken.objects.filter(pk__in=jtis).delete()
+        yield deleted
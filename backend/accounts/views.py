@@ -1,6 +1,7 @@
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from django.contrib.auth.models import User
+from .backends import users_with_email
 from .serializers import RegisterSerializer, UserSerializer, CustomTokenObtainPairSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -29,6 +30,8 @@ class MeView(APIView):
         if 'last_name' in data:
             user.last_name = data['last_name']
         if 'email' in data:
+            if users_with_email(data['email']).exclude(pk=user.pk).exists():
+                return Response({'email': ['A user with this email already exists.']}, status=400)
             user.email = data['email']
             user.username = data['email']  # Keep username in sync with email
         
@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 INSTALLED_APPS += ['django_filters']
 
 MIDDLEWARE = [
+    'crm.metrics.MetricsMiddleware',  # removed at startup unless METRICS_ENABLED
+    'crm.profiling.ServerTimingMiddleware',  # removed at startup unless SERVER_TIMING_ENABLED
+    'crm.nplusone.NPlusOneMiddleware',  # removed at startup when N_PLUS_ONE_DETECTION is 'off'
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,11 +91,60 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 import dj_database_url
 
+# Connection management. By default each worker thread keeps its connection for
+# DB_CONN_MAX_AGE seconds and pings it before reusing it in a new request.
+# DB_POOL=True (PostgreSQL with psycopg 3 only) uses Django's psycopg_pool
+# integration instead: each worker process holds DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections shared by its threads. Keep workers * DB_POOL_MAX_SIZE under the
+# server's max_connections. Use the pool under ASGI, where persistent
+# connections leak. GET /api/system/db/ reports what a process is doing.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=4, cast=int)
+
 DATABASES = {
     'default': dj_database_url.config(
-        default='sqlite:///' + str(BASE_DIR / 'db.sqlite3')
+        default='sqlite:///' + str(BASE_DIR / 'db.sqlite3'),
+        conn_max_age=0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        conn_health_checks=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     )
 }
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),  # seconds to wait for a free connection
+    }
+
+# SQLite profile for single-node deployments (crm/sqlite.py): WAL so readers
+# don't block the writer, and BEGIN IMMEDIATE so concurrent writers wait on
+# busy_timeout instead of failing with "database is locked". Applies to SQLite
+# files only; SQLITE_TUNED=False restores SQLite's defaults.
+SQLITE_TUNED = config('SQLITE_TUNED', default=True, cast=bool)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),  # milliseconds
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),  # negative: KiB per connection
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),  # bytes
+    'temp_store': 'MEMORY',
+} if SQLITE_TUNED else {}
+if SQLITE_TUNED and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+# Optional read replica. Safe reads of the lead list/detail/export, analytics,
+# recent activities and the dashboard go to it (crm/routers.py); a user's reads
+# stay on the primary for REPLICA_PIN_SECONDS after they write. Set
+# REPLICA_DATABASE= (empty) to keep the alias without routing to it.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+    )
+REPLICA_DATABASE = config('REPLICA_DATABASE', default='replica' if DATABASE_REPLICA_URL else '') or None
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+DATABASE_ROUTERS = ['crm.routers.ReplicaRouter']
 
 
 # Password validation
@@ -142,7 +194,10 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication plus per-process token and user caches
+        'accounts.authentication.CachedJWTAuthentication',
+        # /api/batch/ sub-requests carry no token; they reuse the batch's authenticated user
+        'crm.batch.SubRequestAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -151,12 +206,88 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Email login with one indexed LOWER(email) lookup; plain usernames fall back to ModelBackend
+AUTHENTICATION_BACKENDS = ['accounts.backends.EmailBackend']
+
+# CachedJWTAuthentication: verified tokens kept until they expire; users for a short TTL
+AUTH_TOKEN_CACHE_SIZE = config('AUTH_TOKEN_CACHE_SIZE', default=10000, cast=int)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=int)  # seconds; 0 disables
+# Recently revoked refresh-token jtis each process remembers to reject replays without a query
+REVOKED_TOKEN_CACHE_SIZE = config('REVOKED_TOKEN_CACHE_SIZE', default=10000, cast=int)
+
+# Bulk import (/api/leads/import/, manage.py import_leads): rows per bulk_create / transaction
+LEAD_IMPORT_BATCH_SIZE = config('LEAD_IMPORT_BATCH_SIZE', default=1000, cast=int)
+
+# Async dashboard/analytics views under ASGI (crm/aio.py): threads per process running
+# their independent queries concurrently. They check connections out of the same
+# DB_POOL_MAX_SIZE as request threads, so with DB_POOL they default to a quarter of it;
+# keep AIO_MAX_WORKERS + BATCH_MAX_WORKERS well below DB_POOL_MAX_SIZE
+AIO_MAX_WORKERS = config('AIO_MAX_WORKERS', default=max(1, DB_POOL_MAX_SIZE // 4) if DB_POOL else 4, cast=int)
+
+# /api/batch/: threads per process for running GET sub-requests concurrently; like
+# AIO_MAX_WORKERS they default to a quarter of DB_POOL_MAX_SIZE with DB_POOL
+BATCH_MAX_WORKERS = config('BATCH_MAX_WORKERS', default=max(1, DB_POOL_MAX_SIZE // 4) if DB_POOL else 4, cast=int)
+
+# Lead typeahead (/api/leads/suggest/): optional per-process prefix cache
+SUGGEST_CACHE_ENABLED = config('SUGGEST_CACHE_ENABLED', default=False, cast=bool)
+SUGGEST_CACHE_MAX_ENTRIES = config('SUGGEST_CACHE_MAX_ENTRIES', default=10000, cast=int)
+SUGGEST_CACHE_TTL = config('SUGGEST_CACHE_TTL', default=30, cast=int)  # seconds
+
+# Cache framework: locmem by default (dev/tests); point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend such as django.core.cache.backends.redis.RedisCache in production
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='crm-default'),
+    }
+}
+
+# Per-user versioned GET response cache (crm/response_cache.py). Writes invalidate by
+# bumping a generation in the cache, which only reaches other worker processes through
+# a shared backend, so it is on by default only when CACHE_BACKEND is Redis or Memcached
+SHARED_CACHE = CACHES['default']['BACKEND'].startswith((
+    'django.core.cache.backends.redis.', 'django.core.cache.backends.memcached.',
+))
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=SHARED_CACHE, cast=bool)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)  # seconds
+
+# Per-request phase timings (auth, orm, sql, serialize, render) as a Server-Timing
+# header and a JSON line on the crm.profiling logger (crm/profiling.py). The
+# header is visible to clients, so keep it off unless you are measuring.
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=False, cast=bool)
+
+# N+1 query detection (crm/nplusone.py): 'log' warns, 'raise' fails the request
+# (the test suite's default), 'off' removes it. A query shape repeated with
+# N_PLUS_ONE_THRESHOLD different parameter sets in one request counts.
+N_PLUS_ONE_DETECTION = config('N_PLUS_ONE_DETECTION', default='log' if DEBUG else 'off')
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', default=3, cast=int)
+
+# Prometheus metrics (crm/metrics.py): per-route latency, SQL, cache and size
+# histograms, scraped from GET /metrics. Off unless METRICS_ENABLED; the endpoint
+# is then served with DEBUG or to scrapers sending `Authorization: Bearer <METRICS_TOKEN>`.
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'crm.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'crm.nplusone': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # JWT Configuration - Extended for development
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),  # 24 hours instead of default 5 minutes
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),  # 30 days instead of default 1 day
     'ROTATE_REFRESH_TOKENS': True,  # Automatically rotate refresh tokens
-    'BLACKLIST_AFTER_ROTATION': True,  # Blacklist old refresh tokens
+    'BLACKLIST_AFTER_ROTATION': True,  # Blacklist old refresh tokens (accounts/tokens.py, not token_blacklist)
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.RotatingTokenRefreshSerializer',
     'UPDATE_LAST_LOGIN': True,  # Update last login time
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
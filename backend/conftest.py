@@ -5,6 +5,16 @@ import pytest
 
 # Configure Django settings before importing Django models
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# A second in-memory database standing in for a read replica (crm/test_routers.py);
+# nothing is routed to it unless a test overrides REPLICA_DATABASE
+os.environ.setdefault('DATABASE_REPLICA_URL', 'sqlite://:memory:')
+os.environ.setdefault('REPLICA_DATABASE', '')
+# Fail any request that repeats a query per row (crm/nplusone.py); set to 'log' or 'off' to relax
+os.environ.setdefault('N_PLUS_ONE_DETECTION', 'raise')
+# The suite is one process, so the response cache is safe on locmem (crm/response_cache.py)
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'True')
+# Record request metrics so crm/test_metrics.py can read them (off by default)
+os.environ.setdefault('METRICS_ENABLED', 'True')
 django.setup()
 
 from django.test import override_settings
@@ -82,6 +92,20 @@ def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Start every test with empty caches; user ids are reused once the DB rolls back"""
+    from django.core.cache import cache
+    from accounts import authentication, tokens
+    from crm import response_cache, suggest
+    cache.clear()
+    authentication.clear()
+    tokens.revoked.clear()
+    suggest.cache.clear()
+    response_cache.reset_stats()
+    yield
+
+
 @pytest.fixture
 def test_settings():
     """Provide test-specific settings"""
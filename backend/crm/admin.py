@@ -15,5 +15,6 @@ class LeadAdmin(admin.ModelAdmin):
 @admin.register(Activity)
 class ActivityAdmin(admin.ModelAdmin):
     list_display = ['id', 'lead', 'activity_type', 'title', 'activity_date', 'user']
+    list_select_related = ['lead', 'user']  # JOIN just these; the default would follow every FK recursively
     list_filter = ['activity_type', 'activity_date', 'lead__is_active']
     search_fields = ['title', 'notes', 'lead__first_name', 'lead__last_name']
@@ -0,0 +1,104 @@
+"""
+Async views for the dashboard and analytics endpoints.
+
+DRF's APIView is sync only, so `AsyncAPIView` keeps its request handling
+(authentication, permissions, throttles, content negotiation, exception
+handling) and awaits an async handler in between. Under ASGI (see
+gunicorn.asgi.conf.py) a slow dashboard no longer pins a worker; under WSGI
+Django runs the same views through async_to_sync.
+
+Django's async ORM (aget, acount, `async for`) hands every query of a request
+to one shared thread, so `asyncio.gather` over it still runs them one after
+another. Under ASGI `gather` below runs independent queries on a bounded,
+per-process pool of AIO_MAX_WORKERS threads. After each call a thread treats
+its connection as a request thread does at request_finished: it goes back to
+the pool with DB_POOL, is closed with CONN_MAX_AGE=0 and is kept for the next
+call otherwise, so overlapping queries costs at most AIO_MAX_WORKERS extra
+connections per process. Under WSGI every request would need its own event
+loop and threads, so the calls simply run in turn.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from rest_framework.views import APIView
+from . import dbstats
+
+# True while an AsyncAPIView handles a request served over ASGI
+serving_asgi = ContextVar('serving_asgi', default=False)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class AsyncAPIView(APIView):
+    """An APIView whose handlers are `async def`; DRF's sync plumbing runs on the request's thread"""
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        serving_asgi.set(isinstance(request._request, ASGIRequest))
+
+        try:
+            # Authentication may hit the database, so it goes through sync_to_async like any query
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = handler(request, *args, **kwargs)  # OPTIONS and 405s
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+def max_workers():
+    return getattr(settings, 'AIO_MAX_WORKERS', 4)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers(), thread_name_prefix='aio')
+        return _pool
+
+
+def _releasing_connections(call):
+    def run():
+        try:
+            return call()
+        finally:
+            dbstats.release_connections()
+    return run
+
+
+async def gather(*calls):
+    """Run independent sync callables (typically one query each) concurrently; returns their results in order"""
+    if not serving_asgi.get() or await sync_to_async(_in_transaction)():
+        # In turn: under WSGI (see the module docstring), and when other connections
+        # can't see an open transaction's writes (tests, ATOMIC_REQUESTS)
+        return [await sync_to_async(call)() for call in calls]
+    pool = get_pool()
+    return await asyncio.gather(*(
+        sync_to_async(_releasing_connections(call), thread_sensitive=False, executor=pool)() for call in calls
+    ))
@@ -0,0 +1,160 @@
+"""
+Request multiplexing for POST /api/batch/.
+
+A batch carries up to MAX_REQUESTS sub-requests ({method, path, body}). The
+batch itself is authenticated once; each sub-request is then built as a plain
+HttpRequest for the same user and handed straight to the view its path
+resolves to, so it runs the view's own permissions, throttles, filters and
+serializers. Sub-requests carry no Authorization header, so JWT decoding and
+the user lookup are skipped: `SubRequestAuthentication` trusts the user the
+batch already verified.
+Middleware does not run for sub-requests.
+
+With `parallel`, consecutive GET sub-requests run concurrently on a small
+thread pool (BATCH_MAX_WORKERS). After each sub-request a thread releases its
+database connection as a request thread would (back to DB_POOL, closed with
+CONN_MAX_AGE=0, kept while persistent). Each sub-request runs in a copy of the
+caller's context, so replica pins, Server-Timing and the N+1 and metrics
+collectors see its queries as part of the batch. Writes run alone and in order, so a GET
+listed after a write still sees it. Inside an open transaction everything
+runs on the calling thread, since pool threads use their own connections and
+could not see its uncommitted writes.
+"""
+import io
+import json
+import logging
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.authentication import BaseAuthentication
+
+from . import dbstats, nplusone
+
+MAX_REQUESTS = 20
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+PATH_PREFIX = '/api/'
+
+logger = logging.getLogger('django.request')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class SubRequestAuthentication(BaseAuthentication):
+    """Authenticate batch sub-requests as the user the enclosing batch request was authenticated as"""
+
+    def authenticate(self, request):
+        user = getattr(request._request, 'batch_user', None)
+        return None if user is None else (user, None)
+
+
+class SubRequest(HttpRequest):
+    def __init__(self, parent, method, path, body, user):
+        super().__init__()
+        url = urlsplit(path)
+        payload = b'' if body is None else json.dumps(body, cls=DjangoJSONEncoder).encode()
+        self.method = method
+        self.path = self.path_info = url.path
+        self.META = {
+            key: value for key, value in parent.META.items()
+            if (key.startswith('HTTP_') and key not in ('HTTP_AUTHORIZATION', 'HTTP_COOKIE'))
+            or key in ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT')
+        }
+        self.META.update({
+            'REQUEST_METHOD': method, 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(payload)),
+            'HTTP_ACCEPT': 'application/json',
+        })
+        self.GET = QueryDict(url.query)
+        self._stream = io.BytesIO(payload)
+        self._read_started = False
+        self._parent_scheme = parent.scheme
+        self.user = self.batch_user = user
+
+    def _get_scheme(self):
+        return self._parent_scheme
+
+
+def max_workers():
+    return getattr(settings, 'BATCH_MAX_WORKERS', 4)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers(), thread_name_prefix='batch')
+        return _pool
+
+
+def dispatch(parent, user, sub):
+    """Run one sub-request; returns {id, status, headers, body, duration_ms}"""
+    started = time.perf_counter()
+    request = SubRequest(parent, sub['method'], sub['path'], sub.get('body'), user)
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        status, headers, body = 404, {}, {'detail': 'Not found.'}
+    else:
+        # Each sub-request is checked for N+1 queries on its own, like a separate request
+        with nplusone.separate_scope(f"{sub['method']} {sub['path']}"):
+            try:
+                if iscoroutinefunction(match.func):
+                    # Async views (crm/aio.py); the batch view itself is sync, so it may block on them
+                    response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+                else:
+                    response = match.func(request, *match.args, **match.kwargs)
+                if response.streaming:
+                    status, headers, body = 400, {}, {'detail': 'Streaming responses are not supported in a batch.'}
+                else:
+                    if hasattr(response, 'render'):
+                        response.render()
+                    status, headers = response.status_code, dict(response.items())
+                    body = response.data if hasattr(response, 'data') else response.content.decode()
+            except Exception:
+                logger.exception('Batch sub-request failed: %s %s', sub['method'], sub['path'])
+                status, headers, body = 500, {}, {'detail': 'Internal server error.'}
+    result = {'status': status, 'headers': headers, 'body': body,
+              'duration_ms': round((time.perf_counter() - started) * 1000, 2)}
+    if 'id' in sub:
+        result = {'id': sub['id'], **result}
+    return result
+
+
+def _dispatch_in_worker(parent, user, sub):
+    try:
+        return dispatch(parent, user, sub)
+    finally:
+        dbstats.release_connections()
+
+
+def run(parent, user, requests, parallel=False):
+    """Dispatch `requests` in order; with `parallel`, runs of consecutive GETs share the pool"""
+    results = [None] * len(requests)
+    parallel = parallel and not connection.in_atomic_block
+    index = 0
+    while index < len(requests):
+        end = index + 1
+        if parallel and requests[index]['method'] == 'GET':
+            while end < len(requests) and requests[end]['method'] == 'GET':
+                end += 1
+        if end - index == 1:
+            results[index] = dispatch(parent, user, requests[index])
+        else:
+            futures = [
+                get_pool().submit(contextvars.copy_context().run, _dispatch_in_worker, parent, user, requests[i])
+                for i in range(index, end)
+            ]
+            for i, future in zip(range(index, end), futures):
+                results[i] = future.result()
+        index = end
+    return results
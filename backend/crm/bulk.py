@@ -0,0 +1,80 @@
+"""
+Bulk lead writes behind /api/leads/bulk-update-status/, bulk-destroy/ and bulk-restore/.
+
+Each call reads the current (status, is_active) of the requested ids with one
+owner-scoped SELECT ... FOR UPDATE, which decides every id's outcome and the
+LeadStats deltas, then writes all eligible leads with one
+UPDATE ... WHERE user_id = ? AND id IN (...) that also sets updated_at.
+`leads_bulk_updated` (see crm/signals.py) keeps derived data in step inside
+the same transaction.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Lead
+from .signals import leads_bulk_updated
+
+MAX_IDS = 5000
+
+NOT_FOUND = 'not_found'
+
+
+def apply(user, ids, changes, outcome, skip_reason):
+    """
+    Apply `changes` to the user's leads in `ids`.
+
+    `skip_reason(status, is_active)` returns why a lead must be left alone, or
+    None to write it; written leads get `outcome`, ids the user doesn't own
+    get NOT_FOUND. Returns {'results': [{'id', 'outcome'}] in request order,
+    'summary': {outcome: count}}.
+    """
+    ids = list(dict.fromkeys(ids))
+    outcomes, targets = {}, []
+    with transaction.atomic():
+        current = {
+            pk: (status, is_active) for pk, status, is_active in
+            Lead.objects.select_for_update().filter(user=user, id__in=ids).values_list('id', 'status', 'is_active')
+        }
+        for pk in ids:
+            if pk not in current:
+                outcomes[pk] = NOT_FOUND
+                continue
+            outcomes[pk] = skip_reason(*current[pk]) or outcome
+            if outcomes[pk] == outcome:
+                targets.append(pk)
+
+        if targets:
+            now = timezone.now()
+            Lead.objects.filter(user=user, id__in=targets).update(**changes, updated_at=now)
+            leads = [
+                Lead(pk=pk, user=user, updated_at=now, status=changes.get('status', current[pk][0]),
+                     is_active=changes.get('is_active', current[pk][1]))
+                for pk in targets
+            ]
+            leads_bulk_updated.send(
+                sender=Lead, leads=leads, fields=set(changes) | {'updated_at'},
+                previous={pk: current[pk] for pk in targets},
+            )
+    return {
+        'results': [{'id': pk, 'outcome': outcomes[pk]} for pk in ids],
+        'summary': dict(Counter(outcomes.values())),
+    }
+
+
+def update_status(user, ids, status):
+    # Like PATCH /api/leads/<id>/, only active leads can be edited
+    return apply(user, ids, {'status': status}, 'updated',
+                 lambda current, is_active: NOT_FOUND if not is_active else 'unchanged' if current == status else None)
+
+
+def destroy(user, ids):
+    # Like DELETE /api/leads/<id>/, an already deleted lead is not found
+    return apply(user, ids, {'is_active': False}, 'deleted',
+                 lambda current, is_active: None if is_active else NOT_FOUND)
+
+
+def restore(user, ids):
+    return apply(user, ids, {'is_active': True}, 'restored',
+                 lambda current, is_active: 'already_active' if is_active else None)
@@ -0,0 +1,300 @@
+"""
+Analytics rollup cube behind /api/analytics/cube/.
+
+LeadCubeCell pre-aggregates a user's active leads by created month, status,
+source and activity type. Cells are partitioned by (user, month): a lead's
+created_at never changes, so any edit to a lead only affects its own
+partition.
+
+Refreshing is incremental. Each user has a watermark; `refresh()` finds the
+leads updated since then, plus the partitions whose activities changed (a
+LeadCubeChange row per partition, upserted by activity writes so the lead
+itself is left alone), and recomputes just those partitions. The last
+WATERMARK_OVERLAP is always re-scanned so rows from transactions that
+committed late are still picked up. Users without a watermark get a full
+`rebuild()`.
+
+The API calls `refresh_if_stale()`: reads of a book that hasn't changed for
+WATERMARK_OVERLAP never write, and within that window they re-check the few
+recently touched partitions. Refreshes of one user are serialized on their
+user row, and cells are upserted, so concurrent refreshes (parallel batch
+GETs, the refresh_lead_cube command) can't trip the unique constraint.
+
+Both paths are set-based: per batch of users or partitions, one
+INSERT ... SELECT ... GROUP BY over leads and one over activities. Nothing is
+aggregated, or even fetched, row by row in Python.
+"""
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Count, DateField, DateTimeField, F, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Activity, Lead, LeadCubeCell, LeadCubeChange, LeadCubeWatermark
+
+DIMENSIONS = ('month', 'status', 'source', 'activity_type')
+WATERMARK_OVERLAP = timedelta(minutes=5)
+PARTITION_BATCH_SIZE = 200
+USER_BATCH_SIZE = 500
+
+
+def month_of(value):
+    """First day of the (current time zone) month containing datetime `value`"""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _month_bounds(month):
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    return start, timezone.make_aware(datetime.combine(next_month(month), time.min))
+
+
+class MonthStart(TruncMonth):
+    """TruncMonth to a date that stays in SQL on SQLite (TruncMonth calls a Python function per row there)"""
+    output_field = DateField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        if self.get_tzname() not in (None, 'UTC'):
+            return super().as_sql(compiler, connection, **extra_context)
+        sql, params = compiler.compile(self.lhs)
+        return f"date({sql}, 'start of month')", params
+
+
+def _partition_q(partitions, prefix=''):
+    # is_active is repeated in every term so each one can use the partial
+    # (user, created_at) index on active leads.
+    query = Q()
+    for user_id, month in partitions:
+        start, end = _month_bounds(month)
+        query |= Q(**{
+            f'{prefix}user_id': user_id, f'{prefix}is_active': True,
+            f'{prefix}created_at__gte': start, f'{prefix}created_at__lt': end,
+        })
+    return query
+
+
+def _lead_rows(lead_q):
+    return (
+        Lead.objects.filter(lead_q, is_active=True).order_by()
+        .annotate(month=MonthStart('created_at'))
+        .values('user_id', 'month', 'status', 'source')
+        .annotate(cell_type=Value(''), n_leads=Count('id'), n_activities=Value(0))
+    )
+
+
+def _activity_rows(activity_q):
+    return (
+        Activity.objects.filter(activity_q, lead__is_active=True).order_by()
+        .annotate(
+            owner=F('lead__user_id'),
+            month=MonthStart('lead__created_at'),
+            lead_status=F('lead__status'),
+            lead_source=F('lead__source'),
+        )
+        .values('owner', 'month', 'lead_status', 'lead_source', 'activity_type')
+        .annotate(n_leads=Count('lead_id', distinct=True), n_activities=Count('id'))
+    )
+
+
+# Query output name -> LeadCubeCell column, for both row sources above
+CELL_COLUMNS = {
+    'user_id': 'user_id', 'owner': 'user_id', 'month': 'month',
+    'status': 'status', 'lead_status': 'status', 'source': 'source', 'lead_source': 'source',
+    'cell_type': 'activity_type', 'activity_type': 'activity_type',
+    'n_leads': 'leads', 'n_activities': 'activities',
+}
+
+
+def _upsert(model, rows, columns, unique, update):
+    """INSERT INTO <model> ... SELECT <rows> ON CONFLICT (unique) DO UPDATE, so no row leaves the database"""
+    connection = connections[rows.db]
+    quote = connection.ops.quote_name
+    names = [*rows.query.values_select, *rows.query.annotation_select]
+    select_sql, params = rows.query.sql_with_params()
+    # Select by alias from a derived table so the column order can't drift from `names`.
+    # SQLite needs the WHERE to tell the upsert's ON from a join's.
+    sql = (
+        'INSERT INTO {table} ({columns}) SELECT {aliases} FROM ({select}) cube_rows WHERE true '
+        'ON CONFLICT ({unique}) DO UPDATE SET {update}'
+    ).format(
+        table=quote(model._meta.db_table),
+        columns=', '.join(quote(columns[name]) for name in names),
+        aliases=', '.join(quote(name) for name in names),
+        select=select_sql,
+        unique=', '.join(quote(column) for column in unique),
+        update=', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in update),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _insert_cells(rows):
+    # A concurrent refresh of the same partition may have inserted the cell first
+    _upsert(LeadCubeCell, rows, CELL_COLUMNS,
+            unique=['user_id', 'month', 'status', 'source', 'activity_type'], update=['leads', 'activities'])
+
+
+def _write_cells(lead_q, activity_q):
+    _insert_cells(_lead_rows(lead_q))
+    _insert_cells(_activity_rows(activity_q))
+
+
+def refresh_partitions(partitions, batch_size=PARTITION_BATCH_SIZE):
+    """Recompute the cells of the given (user_id, month) partitions"""
+    partitions = sorted(set(partitions))
+    for start in range(0, len(partitions), batch_size):
+        batch = partitions[start:start + batch_size]
+        cells_q = Q()
+        for user_id, month in batch:
+            cells_q |= Q(user_id=user_id, month=month)
+        with transaction.atomic():
+            LeadCubeCell.objects.filter(cells_q).delete()
+            _write_cells(_partition_q(batch), _partition_q(batch, prefix='lead__'))
+
+
+def rebuild(user_ids=None, batch_size=USER_BATCH_SIZE):
+    """Recompute every cell for `user_ids` (default: all users) and reset their watermarks"""
+    started = timezone.now()
+    if user_ids is None:
+        # One sequential pass over both tables beats per-user index lookups
+        with transaction.atomic():
+            LeadCubeCell.objects.all().delete()
+            _write_cells(Q(), Q())
+            _set_watermarks(get_user_model().objects.values_list('id', flat=True), started)
+        return
+
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            LeadCubeCell.objects.filter(user_id__in=batch).delete()
+            _write_cells(Q(user_id__in=batch), Q(lead__user_id__in=batch))
+            _set_watermarks(batch, started)
+
+
+def refresh(user_ids=None):
+    """Bring the cube up to date for `user_ids` (default: all users); returns partitions refreshed"""
+    started = timezone.now()
+    watermarks = LeadCubeWatermark.objects.all()
+    if user_ids is not None:
+        watermarks = watermarks.filter(user_id__in=user_ids)
+    watermarks = dict(watermarks.values_list('user_id', 'refreshed_at'))
+
+    if user_ids is None:
+        unbuilt = Lead.objects.exclude(user_id__in=watermarks).order_by().values_list('user_id', flat=True).distinct()
+    else:
+        unbuilt = [user_id for user_id in user_ids if user_id not in watermarks]
+    unbuilt = list(unbuilt)
+    if unbuilt:
+        rebuild(unbuilt)
+
+    changed, marked = Q(), Q()
+    for user_id, refreshed_at in watermarks.items():
+        changed |= Q(user_id=user_id, updated_at__gte=refreshed_at - WATERMARK_OVERLAP)
+        marked |= Q(user_id=user_id, changed_at__gte=refreshed_at - WATERMARK_OVERLAP)
+    partitions = []
+    if watermarks:
+        partitions = {
+            *Lead.objects.filter(changed).order_by()
+            .annotate(month=MonthStart('created_at'))
+            .values_list('user_id', 'month').distinct(),
+            *LeadCubeChange.objects.filter(marked).values_list('user_id', 'month'),
+        }
+        refresh_partitions(partitions)
+        _set_watermarks(watermarks, started)
+    return len(partitions)
+
+
+def is_stale(user_id):
+    """Whether `refresh()` would have anything to do for the user; reads only"""
+    refreshed_at = LeadCubeWatermark.objects.filter(user_id=user_id).values_list('refreshed_at', flat=True).first()
+    if refreshed_at is None:
+        return True
+    # The same overlap as refresh(), for rows that committed after it with an older timestamp
+    since = refreshed_at - WATERMARK_OVERLAP
+    return (
+        Lead.objects.filter(user_id=user_id, updated_at__gte=since).exists()
+        or LeadCubeChange.objects.filter(user_id=user_id, changed_at__gte=since).exists()
+    )
+
+
+def refresh_if_stale(user_id):
+    """refresh() the user's cube if is_stale(), one caller per user at a time; returns whether it did"""
+    if not is_stale(user_id):
+        return False
+    with transaction.atomic():
+        # FOR NO KEY UPDATE: a second reader of the same stale cube waits here, while
+        # inserts referencing the user (FOR KEY SHARE) don't. SQLite serializes writes anyway.
+        list(get_user_model().objects.select_for_update(no_key=True).filter(pk=user_id).values_list('pk'))
+        refresh([user_id])
+    return True
+
+
+def _set_watermarks(user_ids, refreshed_at):
+    LeadCubeWatermark.objects.bulk_create(
+        [LeadCubeWatermark(user_id=user_id, refreshed_at=refreshed_at) for user_id in user_ids],
+        update_conflicts=True, unique_fields=['user'], update_fields=['refreshed_at'],
+    )
+
+
+def mark_activities_changed(lead_id):
+    """Record that activities of the lead's partition changed, in one statement and without writing the lead"""
+    rows = (
+        Lead.objects.filter(pk=lead_id).order_by()
+        .annotate(month=MonthStart('created_at'), changed_at=Value(timezone.now(), output_field=DateTimeField()))
+        .values('user_id', 'month', 'changed_at')
+    )
+    _upsert(LeadCubeChange, rows, {'user_id': 'user_id', 'month': 'month', 'changed_at': 'changed_at'},
+            unique=['user_id', 'month'], update=['changed_at'])
+
+
+def query(user_id, dims, filters=None):
+    """
+    Roll the user's cells up to `dims` and return one dict per group.
+
+    `filters` may hold lists for status/source/activity_type and month_from /
+    month_to dates. When activity_type is grouped or filtered on, `leads`
+    counts the leads touched by those activities (once per activity type).
+    """
+    filters = filters or {}
+    cells = LeadCubeCell.objects.filter(user_id=user_id)
+    for name in ('status', 'source', 'activity_type'):
+        if filters.get(name):
+            cells = cells.filter(**{f'{name}__in': filters[name]})
+    if filters.get('month_from'):
+        cells = cells.filter(month__gte=filters['month_from'])
+    if filters.get('month_to'):
+        cells = cells.filter(month__lte=filters['month_to'])
+
+    lead_measures = {'lead_total': Sum('leads'), 'closed_total': Sum('leads', filter=Q(status='closed'))}
+    if 'activity_type' in dims or filters.get('activity_type'):
+        groups = cells.exclude(activity_type='').values(*dims).annotate(
+            **lead_measures, activity_total=Sum('activities'),
+        ).order_by(*dims)
+    else:
+        groups = cells.filter(activity_type='').values(*dims).annotate(**lead_measures).order_by(*dims)
+        activity_totals = {
+            tuple(row[dim] for dim in dims): row['activity_total']
+            for row in cells.exclude(activity_type='').values(*dims).annotate(activity_total=Sum('activities'))
+        }
+        groups = [
+            {**row, 'activity_total': activity_totals.get(tuple(row[dim] for dim in dims))} for row in groups
+        ]
+
+    results = []
+    for row in groups:
+        leads, closed = row['lead_total'] or 0, row['closed_total'] or 0
+        cell = {dim: row[dim] for dim in dims}
+        if 'month' in cell:
+            cell['month'] = cell['month'].strftime('%Y-%m')
+        cell.update(
+            leads=leads, closed=closed, activities=row['activity_total'] or 0,
+            conversion_rate=round(closed / leads, 4) if leads else None,
+        )
+        results.append(cell)
+    return results
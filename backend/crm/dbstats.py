@@ -0,0 +1,68 @@
+"""
+Per-process database connection statistics (GET /api/system/db/).
+
+Counts connections opened since the process started (Django's
+connection_created signal, see crm/signals.py) next to the settings that
+decide how often that happens. With persistent connections the count should
+level off at about one per worker thread; without them it grows by one per
+request. With DB_POOL every checkout from the pool counts, so the pool's own
+counters (connections_num, requests_waiting, ...) are included as well.
+
+Long-lived thread pools (crm/aio.py, crm/batch.py) never see request_finished
+and call `release_connections` after each unit of work instead.
+"""
+import os
+import threading
+from collections import Counter
+
+from django.db import connections
+
+_opened = Counter()
+_lock = threading.Lock()
+
+
+def connection_opened(alias):
+    with _lock:
+        _opened[alias] += 1
+
+
+def opened():
+    with _lock:
+        return dict(_opened)
+
+
+def reset():
+    with _lock:
+        _opened.clear()
+
+
+def snapshot():
+    """Settings and counters for every configured database alias in this process"""
+    counts = opened()
+    databases = {}
+    for alias in connections:
+        connection = connections[alias]
+        pool = getattr(connection, 'pool', None)  # PostgreSQL with OPTIONS['pool'] only
+        databases[alias] = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'pooled': pool is not None,
+            'connections_opened': counts.get(alias, 0),
+            'pool': pool.get_stats() if pool is not None else None,
+        }
+    return {'pid': os.getpid(), 'databases': databases}
+
+
+def release_connections():
+    """After work on a pool thread, do what request_finished does for a request thread
+
+    Connections past CONN_MAX_AGE are closed: with 0 (the ASGI profile) or
+    DB_POOL that is every one, so a pooled connection goes back to the pool
+    instead of staying with an idle thread. Persistent ones are kept, and
+    broken ones closed.
+    """
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close_if_unusable_or_obsolete()
+
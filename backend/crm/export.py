@@ -0,0 +1,114 @@
+"""
+Streaming CSV / NDJSON exports (/api/leads/export/, /api/leads/<id>/activities/export/).
+
+Rows are read with `values_list(...).iterator(chunk_size=...)`, which uses a
+server-side cursor on PostgreSQL, and encoded one at a time into a
+StreamingHttpResponse. A worker therefore holds one chunk of rows in memory
+no matter how large the export is.
+
+Under ASGI Django would read a sync iterator through `sync_to_async(list)`,
+building the whole export before the first byte. There the response gets an
+async iterator instead, which fetches and encodes one chunk at a time on the
+request's own sync thread (so the same connection and server-side cursor).
+
+The renderers only take part in content negotiation (?format=csv|ndjson or
+an Accept header) and render error bodies; the export body itself never goes
+through DRF's Response.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Leads export LeadSerializer.Meta.fields; activities drop the serializer's nested lead/user objects
+ACTIVITY_EXPORT_FIELDS = [
+    'id', 'lead_id', 'user_id', 'activity_type', 'title', 'notes', 'duration', 'activity_date', 'created_at',
+]
+
+# Export columns that aren't model columns: name -> (source columns, function of their values)
+COMPUTED_COLUMNS = {
+    'full_name': (('first_name', 'last_name'), lambda first, last: f"{first} {last}".strip()),
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def encode_rows(self, columns, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([
+                '' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in row
+            ])
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Error bodies, e.g. {"fields": "Unknown field(s): ..."}
+        return ''.join(self.encode_rows(list(data), [list(data.values())])).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def encode_rows(self, columns, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode(self.charset)
+
+
+EXPORT_RENDERERS = [CSVRenderer, NDJSONRenderer]
+
+
+def export_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one list of values per row of `queryset`, in `columns` order"""
+    fetch = []
+    for column in columns:
+        fetch.extend(COMPUTED_COLUMNS[column][0] if column in COMPUTED_COLUMNS else [column])
+    fetch = list(dict.fromkeys(fetch))
+    for row in queryset.values_list(*fetch).iterator(chunk_size=chunk_size):
+        values = dict(zip(fetch, row))
+        yield [
+            COMPUTED_COLUMNS[column][1](*(values[source] for source in COMPUTED_COLUMNS[column][0]))
+            if column in COMPUTED_COLUMNS else values[column]
+            for column in columns
+        ]
+
+
+async def _chunks(lines, chunk_size):
+    """Drive a sync iterator of encoded rows from the event loop, one chunk of rows per thread hop"""
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def stream_export(request, queryset, columns, filename):
+    renderer = request.accepted_renderer
+    # Rows are read after the view has returned; fix the database (replica or not) now
+    queryset = queryset.using(queryset.db)
+    lines = renderer.encode_rows(columns, export_rows(queryset, columns))
+    if isinstance(request._request, ASGIRequest):
+        lines = _chunks(lines, EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(lines, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{renderer.format}"'
+    return response
@@ -0,0 +1,94 @@
+"""
+Sparse fieldsets: `?fields=a,b` / `?omit=c` on read endpoints.
+
+Serializers using SparseFieldsetSerializerMixin drop unselected fields from
+their output. Each serializer also declares in `Meta.field_sources` which
+model columns a field reads, so views can narrow the SELECT with `only()` and
+skip `select_related` joins that no selected field needs.
+"""
+from rest_framework import serializers
+
+
+def parse_field_list(value):
+    """Split a comma-separated query parameter; a missing or blank value means "no selection" """
+    if not value:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return names or None
+
+
+def select_names(available, fields=None, omit=None):
+    """Apply a fields/omit selection to `available`, keeping its order; unknown names are a 400"""
+    unknown = (set(fields or ()) | set(omit or ())) - set(available)
+    if unknown:
+        raise serializers.ValidationError(
+            {'fields': f"Unknown field(s): {', '.join(sorted(unknown))}"}
+        )
+    return [
+        name for name in available
+        if (fields is None or name in fields) and name not in (omit or ())
+    ]
+
+
+class SparseFieldsetSerializerMixin:
+    """Accept `fields=` / `omit=` serializer kwargs and prune `self.fields` accordingly"""
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and omit is None:
+            return
+        selected = set(self.select_fields(fields, omit))
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def select_fields(cls, fields=None, omit=None):
+        return select_names(cls.Meta.fields, fields, omit)
+
+    @classmethod
+    def required_columns(cls, selected):
+        """Model columns (Django `only()` paths) needed to render `selected` fields"""
+        sources = getattr(cls.Meta, 'field_sources', {})
+        columns = set()
+        for name in selected:
+            columns.update(sources.get(name, (name,)))
+        return columns
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin applying `?fields=` / `?omit=` to GET requests.
+
+    Write requests always use the full serializer so no field silently becomes
+    read-only. `sparse_always_load` lists columns that must stay loaded even
+    when not rendered, e.g. pagination ordering keys.
+    """
+    sparse_always_load = ('id',)
+
+    def get_sparse_fieldset(self):
+        if self.request.method != 'GET':
+            return {}
+        fields = parse_field_list(self.request.query_params.get('fields'))
+        omit = parse_field_list(self.request.query_params.get('omit'))
+        if fields is None and omit is None:
+            return {}
+        return {'fields': fields, 'omit': omit}
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_sparse_fieldset())
+        return super().get_serializer(*args, **kwargs)
+
+    def narrow_queryset(self, queryset, serializer_class=None):
+        """Load only the columns (and joins) the selected fields read"""
+        fieldset = self.get_sparse_fieldset()
+        if not fieldset:
+            return queryset
+        serializer_class = serializer_class or self.get_serializer_class()
+        selected = serializer_class.select_fields(**fieldset)
+        columns = serializer_class.required_columns(selected) | set(self.sparse_always_load)
+        related = {column.split('__')[0] for column in columns if '__' in column}
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*(columns | related))
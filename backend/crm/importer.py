@@ -0,0 +1,250 @@
+"""
+Bulk lead import (POST /api/leads/import/, `manage.py import_leads`).
+
+Uploads are parsed as a stream: CSV and NDJSON line by line, JSON arrays one
+element at a time, so memory is bounded by the batch size rather than by the
+file. Every row goes through LeadSerializer's field validation; valid rows are
+inserted with one `bulk_create` per batch, each batch in its own transaction,
+and invalid ones are reported by row number (1-based, header excluded).
+
+bulk_create skips Lead.save and its post_save receivers, so each batch sends
+`leads_bulk_created` (see crm/signals.py) to update the search documents,
+suggest keys, pipeline counters and cached responses in the same transaction.
+
+Feed syncs (POST /api/leads/sync/, `import_leads --sync`) upsert instead, on
+the (user, source, external_id) key: see `sync_batch`. Re-sending an
+unchanged feed costs one SELECT per batch and no writes.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Lead
+from .serializers import LeadSerializer, LeadSyncSerializer
+from .signals import leads_bulk_created, leads_bulk_updated
+
+FORMATS = ('csv', 'json', 'ndjson')
+MAX_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+JSON_READ_SIZE = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    """The upload can't be read as the declared format"""
+
+
+def default_batch_size():
+    return getattr(settings, 'LEAD_IMPORT_BATCH_SIZE', 1000)
+
+
+def detect_format(filename, declared=None):
+    """Pick the format from an explicit value or the file extension"""
+    file_format = (declared or os.path.splitext(filename or '')[1].lstrip('.')).lower()
+    if file_format == 'jsonl':
+        file_format = 'ndjson'
+    if file_format not in FORMATS:
+        raise ImportFormatError(f"Unsupported format {file_format!r}; use one of: {', '.join(FORMATS)}.")
+    return file_format
+
+
+def read_csv(stream):
+    # Blank cells mean "not provided", so optional fields fall back to their defaults
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')):
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def read_ndjson(stream):
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ImportFormatError(f"Invalid JSON line: {exc.msg}.") from exc
+
+
+def read_json(stream, read_size=JSON_READ_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole document"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    decoder = json.JSONDecoder()
+    buffer, position, expect = '', 0, '['
+
+    def more():
+        nonlocal buffer, position
+        chunk = text.read(read_size)
+        buffer, position = buffer[position:] + chunk, 0
+        return bool(chunk)
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer):
+            if not more():
+                raise ImportFormatError("Unexpected end of JSON array.")
+            continue
+        char = buffer[position]
+        if expect == '[':
+            if char != '[':
+                raise ImportFormatError("Expected a JSON array of lead objects.")
+            position, expect = position + 1, 'first'
+        elif char == ']' and expect in ('first', ','):
+            return
+        elif expect == ',':
+            if char != ',':
+                raise ImportFormatError("Expected ',' or ']' between JSON array elements.")
+            position, expect = position + 1, 'value'
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                # Most likely the element continues in the next chunk
+                if not more():
+                    raise ImportFormatError(f"Invalid JSON: {exc.msg}.") from exc
+                continue
+            if end == len(buffer) and more():
+                continue  # a bare number may have been cut off; decode again with more text
+            yield value
+            position, expect = end, ','
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'ndjson': read_ndjson}
+
+
+def read_rows(stream, file_format):
+    try:
+        yield from READERS[file_format](stream)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFormatError(f"Can't read the file as {file_format}: {exc}.") from exc
+
+
+def insert_batch(user, rows):
+    """Insert validated rows for `user` and update everything derived from leads"""
+    leads = [Lead(user=user, **attrs) for attrs in rows]
+    with transaction.atomic():
+        Lead.objects.bulk_create(leads)
+        leads_bulk_created.send(sender=Lead, leads=leads)
+    return leads
+
+
+def content_hash(attrs):
+    return hashlib.sha256(json.dumps(attrs, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+
+
+def sync_batch(user, rows):
+    """
+    Upsert validated feed rows on (user, source, external_id).
+
+    One SELECT fetches the stored hashes; rows whose hash matches are skipped
+    and the rest go out in one INSERT ... ON CONFLICT DO UPDATE per set of
+    provided fields (feeds are uniform, so normally one). Fields a row leaves
+    out are never overwritten. Returns (created, updated, unchanged).
+    """
+    incoming = {}
+    for attrs in rows:
+        incoming[(attrs['source'], attrs['external_id'])] = attrs  # a later duplicate wins
+    stored = {
+        (source, external_id): (digest, status, is_active)
+        for source, external_id, digest, status, is_active in Lead.objects.filter(
+            user=user,
+            source__in={source for source, _ in incoming},
+            external_id__in={external_id for _, external_id in incoming},
+        ).values_list('source', 'external_id', 'content_hash', 'status', 'is_active')
+    }
+
+    groups, created, updated, previous = {}, [], [], {}
+    for key, attrs in incoming.items():
+        digest = content_hash(attrs)
+        lead = Lead(user=user, content_hash=digest, **attrs)
+        if key in stored:
+            old_digest, status, is_active = stored[key]
+            if old_digest == digest:
+                continue
+            # Keep the in-memory state true to the row for the signal receivers
+            lead.is_active = is_active
+            lead.status = attrs.get('status', status)
+            previous[key] = (status, is_active)
+            updated.append(lead)
+        else:
+            created.append(lead)
+        groups.setdefault(frozenset(attrs), []).append(lead)
+
+    if not groups:
+        return 0, 0, len(incoming)
+    with transaction.atomic():
+        for fields, leads in groups.items():
+            Lead.objects.bulk_create(
+                leads, update_conflicts=True, unique_fields=['user', 'source', 'external_id'],
+                update_fields=sorted(fields - {'source', 'external_id'}) + ['content_hash', 'updated_at'],
+            )
+        if created:
+            leads_bulk_created.send(sender=Lead, leads=created)
+        if updated:
+            leads_bulk_updated.send(
+                sender=Lead, leads=updated,
+                fields=set().union(*(fields for fields in groups)) | {'content_hash', 'updated_at'},
+                previous={lead.pk: previous[(lead.source, lead.external_id)] for lead in updated},
+            )
+    return len(created), len(updated), len(incoming) - len(created) - len(updated)
+
+
+def import_leads(user, stream, file_format, batch_size=None, dry_run=False, sync=False):
+    """
+    Validate and insert (or with `sync`, upsert) every row of `stream` as a lead owned by `user`.
+
+    A file that stops parsing part-way keeps the batches already written and
+    reports the problem as an error on the row where reading stopped.
+    """
+    return import_rows(user, read_rows(stream, file_format), batch_size, dry_run, sync)
+
+
+def import_rows(user, rows, batch_size=None, dry_run=False, sync=False):
+    """
+    Validate and write an iterable of row dicts; see `import_leads`.
+
+    Returns {'rows', 'created', 'failed', 'errors'}, plus 'updated' and
+    'unchanged' when syncing; `errors` lists up to MAX_REPORTED_ERRORS
+    {'row': n, 'errors': {...}} entries.
+    """
+    batch_size = min(max(batch_size or default_batch_size(), 1), MAX_BATCH_SIZE)
+    validator = LeadSyncSerializer() if sync else LeadSerializer()
+    result = {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+    if sync:
+        result.update(updated=0, unchanged=0)
+    batch = []
+
+    def fail(row_number, errors):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'row': row_number, 'errors': errors})
+
+    def flush():
+        if batch and not dry_run:
+            if sync:
+                created, updated, unchanged = sync_batch(user, batch)
+                result['created'] += created
+                result['updated'] += updated
+                result['unchanged'] += unchanged
+            else:
+                result['created'] += len(insert_batch(user, batch))
+        batch.clear()
+
+    try:
+        for row in rows:
+            result['rows'] += 1
+            try:
+                batch.append(validator.run_validation(row))
+            except serializers.ValidationError as exc:
+                fail(result['rows'], exc.detail)
+                continue
+            if len(batch) >= batch_size:
+                flush()
+    except ImportFormatError as exc:
+        fail(result['rows'] + 1, {'file': [str(exc)]})
+    flush()
+    return result
@@ -0,0 +1,80 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.test.client import RequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from crm import dbstats, importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the lead list through the WSGI handler with the connection settings this process was "
+        "started with, and report requests/s and connections opened. Compare runs such as "
+        "DB_CONN_MAX_AGE=0, the default persistent connections and DB_POOL=true (PostgreSQL + psycopg 3). "
+        "--connect-latency adds a delay to every new connection to stand in for a TCP/TLS handshake."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=4, help="Concurrent worker threads.")
+        parser.add_argument('--connect-latency', type=float, default=0.0, help="Milliseconds per new connection.")
+        parser.add_argument('--path', default='/api/leads/?page_size=10')
+
+    def handle(self, *args, **options):
+        latency = options['connect_latency'] / 1000
+
+        def slow_connect(sender, connection, **kwargs):
+            time.sleep(latency)
+
+        user = User.objects.create(username='bench-connections@example.com')
+        try:
+            importer.insert_batch(user, [
+                {'first_name': f'Bench{i}', 'last_name': 'Lead', 'email': f'bench{i}@example.com'} for i in range(50)
+            ])
+            token = str(RefreshToken.for_user(user).access_token)
+            connections.close_all()
+            dbstats.reset()
+            if latency:
+                connection_created.connect(slow_connect)
+            with override_settings(ALLOWED_HOSTS=['*'], RESPONSE_CACHE_ENABLED=False):
+                elapsed, latencies = self.run(options['path'], token, options)
+        finally:
+            connection_created.disconnect(slow_connect)
+            connections.close_all()
+            user.delete()
+
+        database = dbstats.snapshot()['databases']['default']
+        mode = 'pool' if database['pooled'] else f"conn_max_age={database['conn_max_age']}"
+        latencies.sort()
+        self.stdout.write(
+            f"{database['vendor']} {mode} health_checks={database['health_checks']}: "
+            f"{len(latencies) / elapsed:.0f} req/s, p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, "
+            f"{database['connections_opened']} connection(s) opened for {len(latencies)} requests"
+        )
+        if database['pool']:
+            self.stdout.write(f"pool: {database['pool']}")
+
+    def run(self, path, token, options):
+        handler = WSGIHandler()
+        environ = RequestFactory().get(path, HTTP_AUTHORIZATION=f'Bearer {token}').environ
+
+        def request(_):
+            started = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers: None)
+            assert response.status_code == 200, response.content[:200]
+            response.close()  # request_finished: closes or keeps the connection per CONN_MAX_AGE
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            latencies = list(pool.map(request, range(options['requests'])))
+        return time.perf_counter() - started, latencies
@@ -0,0 +1,146 @@
+import asyncio
+import random
+import statistics
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.test.client import RequestFactory
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from crm import importer
+from crm.models import Activity
+
+ENDPOINTS = ('/api/dashboard/', '/api/analytics/', '/api/activities/recent/')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the dashboard endpoints in-process: sync WSGI workers (one request at a time each) "
+        "against one ASGI worker serving concurrent requests. Seeds a throwaway user and deletes it afterwards. "
+        "--db-latency adds a sleep to every query to stand in for a network round trip to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help="Requests in flight at once (clients).")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Sync WSGI workers to compare against one ASGI worker.")
+        parser.add_argument('--db-latency', type=float, default=2.0, help="Milliseconds added to every query.")
+        parser.add_argument('--conn-max-age', type=int, default=None,
+                            help="Override CONN_MAX_AGE, e.g. to compare against a pooled/persistent setup.")
+        parser.add_argument('--leads', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        latency = options['db_latency'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+
+        user = User.objects.create(username='bench-dashboard@example.com')
+        try:
+            self.seed(user, options['leads'])
+            token = str(RefreshToken.for_user(user).access_token)
+            connections.close_all()
+            if options['conn_max_age'] is not None:
+                settings.DATABASES['default']['CONN_MAX_AGE'] = options['conn_max_age']
+            connection_created.connect(add_latency)
+            with override_settings(ALLOWED_HOSTS=['*'], RESPONSE_CACHE_ENABLED=False):
+                self.stdout.write(f"{'endpoint':>24} {'server':>12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+                for path in ENDPOINTS:
+                    self.report(path, f"wsgi x{options['workers']}", *self.run_wsgi(path, token, options))
+                    self.report(path, 'asgi x1', *self.run_asgi(path, token, options))
+        finally:
+            connection_created.disconnect(add_latency)
+            connections.close_all()
+            user.delete()
+
+    def seed(self, user, count):
+        rng = random.Random(42)
+        statuses = ['new', 'contacted', 'qualified', 'negotiation', 'closed', 'lost']
+        leads = importer.insert_batch(user, [
+            {'first_name': f'Bench{i}', 'last_name': 'Lead', 'email': f'bench{i}@example.com',
+             'status': rng.choice(statuses)}
+            for i in range(count)
+        ])
+        now = timezone.now()
+        Activity.objects.bulk_create([
+            Activity(lead=rng.choice(leads), user=user, activity_type=rng.choice(['call', 'email', 'meeting']),
+                     title=f'Touch {i}', activity_date=now - timedelta(hours=i))
+            for i in range(count)
+        ])
+
+    def run_wsgi(self, path, token, options):
+        handler = WSGIHandler()
+        environ = RequestFactory().get(path, HTTP_AUTHORIZATION=f'Bearer {token}').environ
+
+        def request(_):
+            started = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers: None)
+            assert response.status_code == 200, response.content[:200]
+            response.close()  # request_finished: releases the worker's connection like a real server
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            latencies = list(pool.map(request, range(options['requests'])))
+        return time.perf_counter() - started, latencies
+
+    def run_asgi(self, path, token, options):
+        application = get_asgi_application()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+
+        async def request(semaphore):
+            async with semaphore:
+                received, statuses = False, []
+
+                async def receive():
+                    nonlocal received
+                    if received:
+                        await asyncio.Event().wait()  # the client never disconnects
+                    received = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        statuses.append(message['status'])
+
+                started = time.perf_counter()
+                await application(dict(scope), receive, send)
+                assert statuses == [200], statuses
+                return time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(request(semaphore) for _ in range(options['requests'])))
+
+        started = time.perf_counter()
+        latencies = asyncio.run(main())
+        return time.perf_counter() - started, latencies
+
+    def report(self, path, server, elapsed, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{path:>24} {server:>12} {len(latencies) / elapsed:>8.0f} "
+            f"{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f}"
+        )
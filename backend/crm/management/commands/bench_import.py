@@ -0,0 +1,82 @@
+import csv
+import io
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from crm import importer
+from crm.serializers import LeadSerializer
+
+STATUSES = ['new', 'contacted', 'qualified', 'negotiation', 'closed', 'lost']
+SOURCES = ['website', 'referral', 'zillow', 'other']
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure bulk import throughput (rows/s) for CSV, JSON and NDJSON uploads against "
+        "one-at-a-time LeadSerializer.create. Runs inside a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, action='append', dest='batch_sizes',
+                            help="Batch size to measure (repeatable; default 1000).")
+        parser.add_argument('--baseline-rows', type=int, default=2000,
+                            help="Rows created one at a time for the comparison.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = [self.random_row(i, rng) for i in range(options['rows'])]
+        files = {'csv': self.as_csv(rows), 'json': self.as_json(rows), 'ndjson': self.as_ndjson(rows)}
+
+        with transaction.atomic():
+            user = User.objects.create(username='bench-import@example.com')
+            self.report('serializer.create', options['baseline_rows'], self.baseline(user, rows[:options['baseline_rows']]))
+            for file_format, data in files.items():
+                for batch_size in options['batch_sizes'] or [1000]:
+                    started = time.perf_counter()
+                    result = importer.import_leads(user, io.BytesIO(data), file_format, batch_size=batch_size)
+                    assert result['created'] == len(rows), result['errors'][:5]
+                    self.report(f'{file_format} batch={batch_size}', len(rows), time.perf_counter() - started)
+            transaction.set_rollback(True)
+
+    def random_row(self, i, rng):
+        budget = rng.randrange(100, 2000) * 1000
+        return {
+            'first_name': f'First{i}', 'last_name': f'Last{rng.randrange(5000)}',
+            'email': f'lead{i}@example.com', 'phone': f'555{rng.randrange(10**7):07d}',
+            'status': rng.choice(STATUSES), 'source': rng.choice(SOURCES),
+            'budget_min': budget, 'budget_max': budget + 250_000,
+            'property_interest': rng.choice(['3 bed condo downtown', 'Family home near schools', '']),
+        }
+
+    def as_csv(self, rows):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return out.getvalue().encode()
+
+    def as_json(self, rows):
+        return ('[\n' + ',\n'.join(map(importer.json.dumps, rows)) + '\n]').encode()
+
+    def as_ndjson(self, rows):
+        return ''.join(importer.json.dumps(row) + '\n' for row in rows).encode()
+
+    def baseline(self, user, rows):
+        request = APIRequestFactory().post('/api/leads/')
+        request.user = user
+        started = time.perf_counter()
+        for row in rows:
+            serializer = LeadSerializer(data=row, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return time.perf_counter() - started
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:>22}: {count} rows in {elapsed:.2f}s = {count / elapsed:,.0f} rows/s")
@@ -0,0 +1,82 @@
+import statistics
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from crm.models import Lead
+from crm.pagination import LargePageNumberPagination, LeadCursorPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare page-N latency of page-number vs keyset pagination on /api/leads/. "
+        "Seeds a throwaway user inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows, page_size = options['rows'], options['page_size']
+        with transaction.atomic():
+            user = User.objects.create(username='bench-pagination@example.com')
+            self.seed(user, rows, options['batch_size'])
+            queryset = Lead.objects.filter(user=user, is_active=True)
+
+            self.stdout.write(f"{'page':>10} {'offset ms':>12} {'cursor ms':>12}")
+            page = 1
+            while (page - 1) * page_size < rows:
+                offset_ms = self.time_page_number(queryset, page, page_size, options['repeat'])
+                cursor_ms = self.time_cursor(queryset, page, page_size, options['repeat'])
+                self.stdout.write(f"{page:>10} {offset_ms:>12.2f} {cursor_ms:>12.2f}")
+                page *= 10
+            transaction.set_rollback(True)
+
+    def seed(self, user, rows, batch_size):
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            Lead.objects.bulk_create([
+                Lead(user=user, first_name=f'Bench{i}', last_name='Lead', email=f'bench{i}@example.com')
+                for i in range(start, min(start + batch_size, rows))
+            ])
+        self.stdout.write(f"Seeded {rows} leads in {time.perf_counter() - started:.1f}s")
+
+    def time_page_number(self, queryset, page, page_size, repeat):
+        request = Request(APIRequestFactory().get('/api/leads/', {'page': page, 'page_size': page_size}, HTTP_HOST='localhost'))
+        ordered = queryset.order_by('-created_at', '-id')
+
+        def run():
+            list(LargePageNumberPagination().paginate_queryset(ordered, request))
+        return self.median_ms(run, repeat)
+
+    def time_cursor(self, queryset, page, page_size, repeat):
+        params = {'pagination': 'cursor', 'page_size': page_size}
+        if page > 1:
+            # Build the cursor a client would hold after paging page-1 times (untimed).
+            boundary = queryset.order_by('-created_at', '-id')[(page - 1) * page_size - 1]
+            paginator = LeadCursorPagination()
+            paginator.base_url = 'http://localhost/api/leads/'
+            position = paginator._get_position_from_instance(boundary, paginator.ordering)
+            link = paginator._encode(position, reverse=False)
+            params['cursor'] = parse_qs(urlparse(link).query)['cursor'][0]
+        request = Request(APIRequestFactory().get('/api/leads/', params, HTTP_HOST='localhost'))
+
+        def run():
+            LeadCursorPagination().paginate_queryset(queryset, request)
+        return self.median_ms(run, repeat)
+
+    def median_ms(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
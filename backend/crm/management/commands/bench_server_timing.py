@@ -0,0 +1,74 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.test.client import RequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from crm import importer, profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the cost of ServerTimingMiddleware on the lead list through the WSGI handler: first with "
+        "SERVER_TIMING_ENABLED off (nothing installed), then alternating requests with and without the middleware "
+        "once its wrappers are installed. Seeds a throwaway user and deletes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--path', default='/api/leads/?page_size=20')
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username='bench-server-timing@example.com')
+        try:
+            importer.insert_batch(user, [
+                {'first_name': f'Bench{i}', 'last_name': 'Lead', 'email': f'bench{i}@example.com'} for i in range(50)
+            ])
+            environ = RequestFactory().get(
+                options['path'], HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}'
+            ).environ
+            with override_settings(ALLOWED_HOSTS=['*'], RESPONSE_CACHE_ENABLED=False):
+                with override_settings(SERVER_TIMING_ENABLED=False):
+                    off_handler = WSGIHandler()
+                    self.run([off_handler], environ, options['requests'])  # warm-up
+                    off = self.run([off_handler], environ, options['requests'])[0]
+                with override_settings(SERVER_TIMING_ENABLED=True):
+                    on_handler = WSGIHandler()  # installs the wrappers
+                # Interleave idle and timed requests so both see the same machine noise
+                profiling.logger.disabled = True  # keep the log lines out of the output
+                idle, on = self.run([off_handler, on_handler], environ, options['requests'])
+                profiling.logger.disabled = False
+
+            self.stdout.write(f"{'profiling':>28} {'mean us':>9} {'p50 us':>8} {'p95 us':>8}")
+            self.report('disabled (nothing installed)', off)
+            self.report('installed, middleware off', idle)
+            self.report('enabled', on)
+            self.stdout.write(
+                f"overhead of enabling: {(statistics.median(on) / statistics.median(idle) - 1) * 100:+.1f}% (p50), "
+                f"{(statistics.mean(on) / statistics.mean(idle) - 1) * 100:+.1f}% (mean)"
+            )
+        finally:
+            user.delete()
+
+    def run(self, handlers, environ, requests):
+        """Send `requests` requests to each handler in turn; one list of timings per handler"""
+        timings = [[] for _ in handlers]
+        for _ in range(requests):
+            for handler, samples in zip(handlers, timings):
+                started = time.perf_counter()
+                response = handler(dict(environ), lambda status, headers: None)
+                assert response.status_code == 200, response.content[:200]
+                response.close()
+                samples.append(time.perf_counter() - started)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        self.stdout.write(
+            f"{label:>28} {statistics.mean(timings) * 1e6:>9.0f} {statistics.median(timings) * 1e6:>8.0f} "
+            f"{timings[int(len(timings) * 0.95) - 1] * 1e6:>8.0f}"
+        )
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from crm import importer, sqlite
+from crm.models import Activity, Lead
+
+SQLITE_DEFAULTS = {'journal_mode': 'DELETE'}  # what a fresh database file uses
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write load from several worker processes (like gunicorn workers) against a copy of the "
+        "SQLite database, first with SQLite's defaults and then with the SQLITE_PRAGMAS profile. Reports "
+        "operations/s and 'database is locked' failures. The configured database is only read, via VACUUM INTO."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10.0, help="Duration of each run.")
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Share of operations that write.")
+        parser.add_argument('--leads', type=int, default=500)
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if not sqlite.is_file_database(connection):
+            raise CommandError("The default database is not a SQLite file.")
+        settings_dict = connection.settings_dict
+        original_name, original_options = settings_dict['NAME'], dict(settings_dict['OPTIONS'])
+        copy = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [copy])
+        connections.close_all()
+        settings_dict['NAME'] = copy
+        try:
+            user = User.objects.create(username='bench-sqlite@example.com')
+            importer.insert_batch(user, [
+                {'first_name': f'Bench{i}', 'last_name': 'Lead', 'email': f'bench{i}@example.com'}
+                for i in range(options['leads'])
+            ])
+            lead_ids = list(Lead.objects.filter(user=user).values_list('id', flat=True))
+
+            self.stdout.write(f"{options['workers']} workers, {options['write_ratio']:.0%} writes, "
+                              f"{options['seconds']:.0f}s per run")
+            self.stdout.write(f"{'profile':>9} {'ops/s':>7} {'reads/s':>8} {'writes/s':>9} "
+                              f"{'write p95 ms':>13} {'locked errors':>14}")
+            transaction_mode = {key: value for key, value in original_options.items() if key != 'transaction_mode'}
+            self.run('default', SQLITE_DEFAULTS, transaction_mode, user, lead_ids, options)
+            self.run('tuned', sqlite.pragmas() or None, original_options, user, lead_ids, options)
+        finally:
+            connections.close_all()
+            settings_dict['NAME'], settings_dict['OPTIONS'] = original_name, original_options
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(copy + suffix):
+                    os.remove(copy + suffix)
+
+    def run(self, label, pragmas, db_options, user, lead_ids, options):
+        if pragmas is None:
+            self.stdout.write(f"{label:>9} skipped: SQLITE_TUNED is off")
+            return
+        connections.close_all()  # children must not share the parent's connection
+        connections['default'].settings_dict['OPTIONS'] = db_options
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            connections['default'].ensure_connection()  # journal_mode is stored in the file; switch it here
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            deadline = time.time() + options['seconds']
+            workers = [
+                context.Process(target=work, args=(seed, deadline, user.id, lead_ids, options['write_ratio'], results))
+                for seed in range(options['workers'])
+            ]
+            for worker in workers:
+                worker.start()
+            totals = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+
+        reads = sum(total['reads'] for total in totals)
+        writes = [timing for total in totals for timing in total['writes']]
+        locked = sum(total['locked'] for total in totals)
+        writes.sort()
+        p95 = writes[int(len(writes) * 0.95) - 1] * 1000 if writes else 0
+        seconds = options['seconds']
+        self.stdout.write(
+            f"{label:>9} {(reads + len(writes)) / seconds:>7.0f} {reads / seconds:>8.0f} "
+            f"{len(writes) / seconds:>9.0f} {p95:>13.1f} {locked:>14}"
+        )
+
+
+def work(seed, deadline, user_id, lead_ids, write_ratio, results):
+    """One worker process: a random mix of list reads and read-then-write transactions until `deadline`"""
+    rng = random.Random(seed)
+    reads, writes, locked = 0, [], 0
+    try:
+        while time.time() < deadline:
+            try:
+                if rng.random() < write_ratio:
+                    began = time.perf_counter()
+                    with transaction.atomic():
+                        lead = Lead.objects.get(pk=rng.choice(lead_ids))
+                        lead.status = rng.choice(['new', 'contacted', 'qualified'])
+                        lead.save(update_fields=['status', 'updated_at'])
+                        Activity.objects.create(lead=lead, user_id=user_id, activity_type='note',
+                                                title='bench', activity_date=timezone.now())
+                    writes.append(time.perf_counter() - began)
+                else:
+                    list(Lead.objects.filter(user_id=user_id, is_active=True).order_by('-created_at')[:20])
+                    Activity.objects.filter(lead__user_id=user_id).count()
+                    reads += 1
+            except OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                locked += 1
+    finally:
+        connections.close_all()
+        results.put({'reads': reads, 'writes': writes, 'locked': locked})
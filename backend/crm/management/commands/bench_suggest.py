@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from crm import suggest
+from crm.models import Lead
+from crm.views import LeadViewSet
+
+FIRST_NAMES = ['james', 'mary', 'john', 'patricia', 'robert', 'jennifer', 'michael', 'linda', 'william',
+               'elizabeth', 'david', 'barbara', 'richard', 'susan', 'joseph', 'jessica', 'thomas', 'sarah',
+               'maria', 'jose', 'luis', 'ana', 'wei', 'mohammed', 'fatima', 'olga', 'yuki', 'priya']
+LAST_NAMES = ['smith', 'johnson', 'williams', 'brown', 'jones', 'garcia', 'miller', 'davis', 'rodriguez',
+              'martinez', 'hernandez', 'lopez', 'gonzalez', 'wilson', 'anderson', 'thomas', 'taylor', 'moore',
+              'jackson', 'martin', 'lee', 'perez', 'thompson', 'white', 'harris', 'sanchez', 'clark', 'nguyen']
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /api/leads/suggest/ latency (p50/p99) for one user with a large book, "
+        "with and without the in-process prefix cache. Runs inside a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leads', type=int, default=100_000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            user = User.objects.create(username='bench-suggest@example.com')
+            self.seed(user, options['leads'], rng)
+            queries = [self.random_prefix(rng) for _ in range(options['requests'])]
+
+            with override_settings(SUGGEST_CACHE_ENABLED=False):
+                self.report('no cache', self.run(user, queries))
+            with override_settings(SUGGEST_CACHE_ENABLED=True):
+                suggest.cache.clear()
+                self.report('cache (cold+warm)', self.run(user, queries))
+            transaction.set_rollback(True)
+
+    def seed(self, user, count, rng):
+        started = time.perf_counter()
+        batch_size = 5000
+        for start in range(0, count, batch_size):
+            leads = Lead.objects.bulk_create([
+                Lead(
+                    user=user,
+                    first_name=rng.choice(FIRST_NAMES).title(),
+                    last_name=rng.choice(LAST_NAMES).title(),
+                    email=f'lead{i}@example.com',
+                    phone=f'555{rng.randrange(10**7):07d}',
+                )
+                for i in range(start, min(start + batch_size, count))
+            ])
+            suggest.index_leads([lead.pk for lead in leads])
+        self.stdout.write(f"Seeded and indexed {count} leads in {time.perf_counter() - started:.1f}s")
+
+    def random_prefix(self, rng):
+        source = rng.choice([FIRST_NAMES, LAST_NAMES, ['lead1', 'lead42', '5551', '55512']])
+        word = rng.choice(source)
+        return word[:rng.randint(1, len(word))]
+
+    def run(self, user, queries):
+        factory = APIRequestFactory()
+        view = LeadViewSet.as_view({'get': 'suggest'})
+        samples = []
+        for q in queries:
+            request = factory.get('/api/leads/suggest/', {'q': q}, HTTP_HOST='localhost')
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def report(self, label, samples):
+        samples = sorted(samples)
+        p99 = samples[int(len(samples) * 0.99) - 1]
+        self.stdout.write(
+            f"{label:>18}: p50 {statistics.median(samples):.2f}ms  p99 {p99:.2f}ms  max {samples[-1]:.2f}ms"
+        )
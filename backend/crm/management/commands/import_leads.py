@@ -0,0 +1,52 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from crm import importer
+
+
+class Command(BaseCommand):
+    help = "Import (or with --sync, upsert) leads for one user from a CSV, JSON array or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Owner's user id or username.")
+        parser.add_argument('--format', choices=importer.FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per bulk_create / transaction (default: LEAD_IMPORT_BATCH_SIZE).")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; insert nothing.")
+        parser.add_argument('--sync', action='store_true',
+                            help="Upsert on (source, external_id) instead of always inserting.")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        try:
+            file_format = importer.detect_format(options['path'], options['format'])
+        except importer.ImportFormatError as exc:
+            raise CommandError(str(exc))
+
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as stream:
+            result = importer.import_leads(
+                user, stream, file_format, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                sync=options['sync'],
+            )
+        elapsed = time.perf_counter() - started
+
+        for error in result['errors']:
+            self.stdout.write(f"row {error['row']}: {error['errors']}")
+        synced = f"{result['updated']} updated, {result['unchanged']} unchanged, " if options['sync'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} row(s): {result['created']} created, {synced}{result['failed']} failed "
+            f"in {elapsed:.2f}s ({result['rows'] / elapsed if elapsed else 0:.0f} rows/s)."
+        ))
+        if result['failed']:
+            raise CommandError(f"{result['failed']} row(s) could not be imported.")
+
+    def get_user(self, value):
+        lookup = {'pk': value} if value.isdigit() else {'username': value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {value!r}.")
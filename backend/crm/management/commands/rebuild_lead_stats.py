@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm import stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild LeadStats pipeline counters from a GROUP BY over leads, or verify them with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only compare counters with the leads table; exit non-zero on drift.")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Limit to this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if options['verify']:
+            mismatches = stats.drift(user_ids)
+            for user_id, status, held, actual in mismatches:
+                self.stdout.write(f"user {user_id} {status}: stored {held}, actual {actual}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} lead stats counter(s) out of date.")
+            self.stdout.write(self.style.SUCCESS("Lead stats match the leads table."))
+            return
+
+        stats.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS("Rebuilt lead stats."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from crm import search
+from crm.models import Lead
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for leads (all of them, or only missing ones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help="Only index leads without a document.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        leads = Lead.objects.order_by('id')
+        if options['missing']:
+            leads = leads.filter(search_document__isnull=True)
+        lead_ids = list(leads.values_list('id', flat=True))
+        search.index_leads(lead_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(lead_ids)} leads."))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from crm import cube
+
+
+class Command(BaseCommand):
+    help = "Refresh the analytics cube from each user's watermark, or rebuild it from scratch with --full."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every cell instead of changed partitions.")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Limit to this user id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=cube.USER_BATCH_SIZE,
+                            help="Users per GROUP BY batch for --full.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['full']:
+            cube.rebuild(options['user_ids'], batch_size=options['batch_size'])
+            message = "Rebuilt analytics cube"
+        else:
+            partitions = cube.refresh(options['user_ids'])
+            message = f"Refreshed {partitions} cube partition(s)"
+        self.stdout.write(self.style.SUCCESS(f"{message} in {time.perf_counter() - started:.2f}s."))
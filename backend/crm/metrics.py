@@ -0,0 +1,153 @@
+"""
+Prometheus metrics, served in the text format at GET /metrics.
+
+MetricsMiddleware records, per request and labelled by the resolved URL name
+(`lead-list`, `lead-activities`, `analytics`, `login`, ...; `unmatched` for
+404s so random paths can't blow up the label set):
+
+- crm_http_request_duration_seconds: latency histogram
+- crm_http_requests_total: responses by status code, for error rates
+- crm_http_response_size_bytes: body size histogram (streamed bodies skipped)
+- crm_http_request_db_queries / crm_http_request_db_duration_seconds: SQL
+  statements and SQL time per request, counted on every connection the
+  request uses (including aio.gather's threads)
+- crm_response_cache_requests_total: response cache hits and misses, read
+  from the X-Cache header crm/response_cache.py sets
+
+gunicorn forks several workers, each with its own counters. When
+PROMETHEUS_MULTIPROC_DIR is set (both gunicorn configs set it when
+METRICS_ENABLED), prometheus_client keeps every value in mmap'd files there
+and the endpoint merges all workers' files, so a scrape sees the whole
+service whichever worker answers. Without it (runserver, tests) the endpoint
+reports the answering process.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from . import queryobserver
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_LATENCY = Histogram(
+    'crm_http_request_duration_seconds', 'Request latency by resolved URL name.',
+    ['route', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter('crm_http_requests', 'Responses by route, method and status code.', ['route', 'method', 'status'])
+RESPONSE_SIZE = Histogram(
+    'crm_http_response_size_bytes', 'Response body size.', ['route'], buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'crm_http_request_db_queries', 'SQL statements per request.', ['route'], buckets=QUERY_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    'crm_http_request_db_duration_seconds', 'Time spent in SQL per request.', ['route'], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_CACHE = Counter('crm_response_cache_requests', 'Response cache lookups.', ['route', 'result'])
+
+_current = ContextVar('metrics_request', default=None)
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def registry():
+    """The registry to expose: every worker's mmap files in multiprocess mode, else this process"""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged)
+    return merged
+
+
+def exposition():
+    """(body, content type) of the current metrics in the Prometheus text format"""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+class RequestStats:
+    """SQL statements and time of one request, possibly from several threads"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.queries += 1
+            self.sql_seconds += seconds
+
+
+def _count_sql(sql, params, many, seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.add_query(seconds)
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or 'unnamed'
+
+
+def observe(request, response, seconds, stats):
+    route = route_of(request)
+    REQUEST_LATENCY.labels(route, request.method).observe(seconds)
+    REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+    if not response.streaming:
+        RESPONSE_SIZE.labels(route).observe(len(response.content))
+    REQUEST_QUERIES.labels(route).observe(stats.queries)
+    REQUEST_SQL_SECONDS.labels(route).observe(stats.sql_seconds)
+    if response.has_header('X-Cache'):
+        RESPONSE_CACHE.labels(route, response['X-Cache'].lower()).inc()
+
+
+class MetricsMiddleware:
+    """Record per-route request metrics (METRICS_ENABLED)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        queryobserver.subscribe(_count_sql)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        observe(request, response, time.perf_counter() - started, stats)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_lead_user_alter_lead_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['lead', '-activity_date', '-created_at', '-id'], name='activity_lead_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-created_at', '-id'], name='lead_user_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'status', '-created_at'], name='lead_user_active_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['user', '-created_at'], name='lead_user_deleted_idx'),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='lead',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='crm.lead'),
+        ),
+    ]
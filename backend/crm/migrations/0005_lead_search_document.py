@@ -0,0 +1,130 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:09
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE crm_leadsearchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(interest, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(activities, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX crm_leadsearch_vector_idx ON crm_leadsearchdocument USING gin (search_vector)',
+]
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS crm_leadsearch_vector_idx',
+    'ALTER TABLE crm_leadsearchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+# FTS5 shadow table over crm_leadsearchdocument (external content), kept in sync by triggers.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE crm_leadsearch_fts USING fts5(
+        name, interest, activities,
+        content='crm_leadsearchdocument', content_rowid='lead_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER crm_leadsearch_ai AFTER INSERT ON crm_leadsearchdocument BEGIN
+        INSERT INTO crm_leadsearch_fts(rowid, name, interest, activities)
+        VALUES (new.lead_id, new.name, new.interest, new.activities);
+    END
+    """,
+    """
+    CREATE TRIGGER crm_leadsearch_ad AFTER DELETE ON crm_leadsearchdocument BEGIN
+        INSERT INTO crm_leadsearch_fts(crm_leadsearch_fts, rowid, name, interest, activities)
+        VALUES ('delete', old.lead_id, old.name, old.interest, old.activities);
+    END
+    """,
+    """
+    CREATE TRIGGER crm_leadsearch_au AFTER UPDATE ON crm_leadsearchdocument BEGIN
+        INSERT INTO crm_leadsearch_fts(crm_leadsearch_fts, rowid, name, interest, activities)
+        VALUES ('delete', old.lead_id, old.name, old.interest, old.activities);
+        INSERT INTO crm_leadsearch_fts(rowid, name, interest, activities)
+        VALUES (new.lead_id, new.name, new.interest, new.activities);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS crm_leadsearch_au',
+    'DROP TRIGGER IF EXISTS crm_leadsearch_ad',
+    'DROP TRIGGER IF EXISTS crm_leadsearch_ai',
+    'DROP TABLE IF EXISTS crm_leadsearch_fts',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+def backfill_documents(apps, schema_editor):
+    # Same layout as crm.search.build_document, frozen here for the migration.
+    Lead = apps.get_model('crm', 'Lead')
+    Activity = apps.get_model('crm', 'Activity')
+    LeadSearchDocument = apps.get_model('crm', 'LeadSearchDocument')
+    db = schema_editor.connection.alias
+
+    batch = []
+    for lead in Lead.objects.using(db).order_by('id').iterator(chunk_size=1000):
+        email = lead.email or ''
+        name = ' '.join(filter(None, [
+            lead.first_name, lead.last_name, email, email.replace('@', ' ').replace('.', ' '),
+            lead.phone, re.sub(r'\D', '', lead.phone or ''),
+        ]))
+        activities = '\n'.join(
+            ' '.join(filter(None, [title, notes]))
+            for title, notes in Activity.objects.using(db).filter(lead_id=lead.id).order_by('id').values_list('title', 'notes')
+        )
+        batch.append(LeadSearchDocument(
+            lead_id=lead.id, name=name,
+            interest=' '.join(filter(None, [lead.property_interest, lead.source])),
+            activities=activities,
+        ))
+        if len(batch) >= 1000:
+            LeadSearchDocument.objects.using(db).bulk_create(batch)
+            batch = []
+    LeadSearchDocument.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_lead_activity_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadSearchDocument',
+            fields=[
+                ('lead', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='crm.lead')),
+                ('name', models.TextField(blank=True)),
+                ('interest', models.TextField(blank=True)),
+                ('activities', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
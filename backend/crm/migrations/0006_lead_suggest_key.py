@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:12
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        # varchar_pattern_ops lets `key LIKE 'abc%'` use the index under any collation
+        schema_editor.execute(
+            'CREATE INDEX crm_leadsuggestkey_prefix_idx ON crm_leadsuggestkey (user_id, key varchar_pattern_ops)'
+        )
+    else:
+        schema_editor.execute('CREATE INDEX crm_leadsuggestkey_prefix_idx ON crm_leadsuggestkey (user_id, key)')
+
+
+def drop_prefix_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS crm_leadsuggestkey_prefix_idx')
+
+
+def _normalize(text):
+    # Frozen copy of crm.suggest.normalize
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[^a-z0-9@.+_ -]', '', text.lower())
+    return ' '.join(text.split())
+
+
+def backfill_keys(apps, schema_editor):
+    Lead = apps.get_model('crm', 'Lead')
+    LeadSuggestKey = apps.get_model('crm', 'LeadSuggestKey')
+    db = schema_editor.connection.alias
+
+    batch = []
+    for lead in Lead.objects.using(db).order_by('id').iterator(chunk_size=2000):
+        keys = {
+            _normalize(lead.first_name), _normalize(lead.last_name),
+            _normalize(f"{lead.first_name} {lead.last_name}"), _normalize(lead.email),
+        }
+        digits = re.sub(r'\D', '', lead.phone or '')
+        if len(digits) >= 3:
+            keys.add(digits)
+        batch.extend(LeadSuggestKey(user_id=lead.user_id, lead_id=lead.id, key=key[:255]) for key in keys if key)
+        if len(batch) >= 5000:
+            LeadSuggestKey.objects.using(db).bulk_create(batch)
+            batch = []
+    LeadSuggestKey.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_lead_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadSuggestKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggest_keys', to='crm.lead')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_stats(apps, schema_editor):
+    Lead = apps.get_model('crm', 'Lead')
+    LeadStats = apps.get_model('crm', 'LeadStats')
+    rows = (
+        Lead.objects.filter(is_active=True).order_by()
+        .values('user_id', 'status').annotate(total=Count('id'))
+    )
+    LeadStats.objects.bulk_create([
+        LeadStats(user_id=row['user_id'], status=row['status'], count=row['total']) for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_lead_suggest_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'New'), ('contacted', 'Contacted'), ('qualified', 'Qualified'), ('negotiation', 'Negotiation'), ('closed', 'Closed'), ('lost', 'Lost')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='lead_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'status'), name='leadstats_user_status_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('crm', '0007_lead_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadCubeCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('new', 'New'), ('contacted', 'Contacted'), ('qualified', 'Qualified'), ('negotiation', 'Negotiation'), ('closed', 'Closed'), ('lost', 'Lost')], max_length=20)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('activity_type', models.CharField(blank=True, choices=[('call', 'Call'), ('email', 'Email'), ('meeting', 'Meeting'), ('note', 'Note')], max_length=20)),
+                ('leads', models.IntegerField(default=0)),
+                ('activities', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeadCubeWatermark',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['user', 'updated_at'], name='lead_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='leadcubecell',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='leadcubecell',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'status', 'source', 'activity_type'), name='leadcube_cell_uniq'),
+        ),
+    ]
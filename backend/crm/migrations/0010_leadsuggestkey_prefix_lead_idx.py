@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 09:40
+
+from django.db import migrations
+
+
+def replace_prefix_index(apps, schema_editor):
+    # lead_id as the last column lets `ORDER BY key, lead_id LIMIT n` stop after n index entries.
+    # On PostgreSQL the key is indexed, filtered and ordered with the "C" collation: the
+    # default collation may not be byte order, and varchar_pattern_ops can't serve ORDER BY.
+    schema_editor.execute('DROP INDEX IF EXISTS crm_leadsuggestkey_prefix_idx')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX crm_leadsuggestkey_prefix_idx ON crm_leadsuggestkey '
+            '(user_id, key COLLATE "C", lead_id)'
+        )
+    else:
+        schema_editor.execute('CREATE INDEX crm_leadsuggestkey_prefix_idx ON crm_leadsuggestkey (user_id, key, lead_id)')
+
+
+def restore_prefix_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS crm_leadsuggestkey_prefix_idx')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX crm_leadsuggestkey_prefix_idx ON crm_leadsuggestkey (user_id, key varchar_pattern_ops)'
+        )
+    else:
+        schema_editor.execute('CREATE INDEX crm_leadsuggestkey_prefix_idx ON crm_leadsuggestkey (user_id, key)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0009_lead_external_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_prefix_index, restore_prefix_index),
+    ]
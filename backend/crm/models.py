@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 # Create your models here.
@@ -22,13 +22,41 @@ class Lead(models.Model):
     budget_min = models.IntegerField(null=True, blank=True)
     budget_max = models.IntegerField(null=True, blank=True)
     property_interest = models.TextField(blank=True)
+    # Feed sync (/api/leads/sync/): the lead's id at `source`. NULL for leads entered by hand;
+    # NULLs never collide, so only synced leads are bound by the unique key below.
+    external_id = models.CharField(max_length=100, null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)  # of the last synced payload
 
     is_active = models.BooleanField(default=True)  # soft delete
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Lead list / cursor pages: WHERE user_id = ? AND is_active ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], condition=models.Q(is_active=True),
+                         name='lead_user_active_created_idx'),
+            # ?status= filter and per-status analytics over the active book
+            models.Index(fields=['user', 'status', '-created_at'], condition=models.Q(is_active=True),
+                         name='lead_user_active_status_idx'),
+            # Deleted Leads page (?is_active=false) stays small, so keep it separate
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_active=False),
+                         name='lead_user_deleted_idx'),
+            # Analytics cube refresh: leads a user changed since the last watermark
+            models.Index(fields=['user', 'updated_at'], name='lead_user_updated_idx'),
+        ]
+        constraints = [
+            # Upsert target for feed syncs: ON CONFLICT (user_id, source, external_id)
+            models.UniqueConstraint(fields=['user', 'source', 'external_id'], name='lead_user_source_external_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
+
+    def save(self, *args, **kwargs):
+        # LeadStats is adjusted by a post_save receiver; keep both writes in one transaction
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
     
 class Activity(models.Model):
     TYPE_CHOICES = [
@@ -38,7 +66,8 @@ class Activity(models.Model):
         ('note', 'Note'),
     ]
 
-    lead = models.ForeignKey('crm.Lead', on_delete=models.CASCADE, related_name='activities')
+    # Lookups by lead are served by the timeline index below, so skip the plain FK index
+    lead = models.ForeignKey('crm.Lead', on_delete=models.CASCADE, related_name='activities', db_index=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # who created it
     activity_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     title = models.CharField(max_length=200)
@@ -50,6 +79,103 @@ class Activity(models.Model):
 
     class Meta:
         ordering = ['-activity_date','-created_at']
+        indexes = [
+            # Lead timeline: WHERE lead_id = ? ORDER BY activity_date DESC, created_at DESC, id DESC
+            models.Index(fields=['lead', '-activity_date', '-created_at', '-id'], name='activity_lead_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.activity_type} - {self.title} ({self.lead_id})"
+
+class LeadSearchDocument(models.Model):
+    # Denormalized searchable text for one lead. The full-text index itself is
+    # database specific and created in migration 0005 (see crm/search.py).
+    lead = models.OneToOneField('crm.Lead', on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.TextField(blank=True)  # names, email, phone
+    interest = models.TextField(blank=True)  # property_interest, source
+    activities = models.TextField(blank=True)  # activity titles and notes
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for lead {self.lead_id}"
+
+
+class LeadSuggestKey(models.Model):
+    # Normalized prefix keys (names, email, phone digits) for /api/leads/suggest/.
+    # The (user_id, key, lead_id) prefix index is created per database in migrations 0006 and 0010.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    lead = models.ForeignKey('crm.Lead', on_delete=models.CASCADE, related_name='suggest_keys')
+    key = models.CharField(max_length=255)
+
+    def __str__(self):
+        return f"{self.key} -> lead {self.lead_id}"
+
+
+class LeadStats(models.Model):
+    # Per-user count of active leads in each status, maintained on every lead
+    # write (see crm/stats.py) so /api/analytics/ never scans the lead table.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='lead_stats',
+                             db_index=False)  # covered by the unique (user, status) index
+    status = models.CharField(max_length=20, choices=Lead.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'status'], name='leadstats_user_status_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.status}: {self.count}"
+
+
+class LeadCubeCell(models.Model):
+    # One cell of the analytics rollup (see crm/cube.py): active leads of a user
+    # created in `month`, grouped by status and source. Rows with a blank
+    # activity_type count leads; the others count activities of that type and
+    # the distinct leads they touched.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    month = models.DateField()  # first day of the lead's created_at month
+    status = models.CharField(max_length=20, choices=Lead.STATUS_CHOICES)
+    source = models.CharField(max_length=50, blank=True)
+    activity_type = models.CharField(max_length=20, choices=Activity.TYPE_CHOICES, blank=True)
+    leads = models.IntegerField(default=0)
+    activities = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves refreshes and queries, which always filter by user (and month)
+            models.UniqueConstraint(fields=['user', 'month', 'status', 'source', 'activity_type'],
+                                    name='leadcube_cell_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.month:%Y-%m}/{self.status}/{self.source}/{self.activity_type}"
+
+
+class LeadCubeChange(models.Model):
+    # Activities of this (user, month) cube partition changed at `changed_at`.
+    # Activities have no updated_at of their own, and bumping the lead's would
+    # change what users see as the lead's last edit.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    month = models.DateField()  # first day of the lead's created_at month
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Upsert target for activity writes; also serves the per-user refresh lookups
+            models.UniqueConstraint(fields=['user', 'month'], name='leadcube_change_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.month:%Y-%m} changed at {self.changed_at}"
+
+
+class LeadCubeWatermark(models.Model):
+    # Leads updated (and LeadCubeChange rows marked) after `refreshed_at` may not be
+    # reflected in the user's cube yet
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    refreshed_at = models.DateTimeField()
 
     def __str__(self):
-        return f"{self.activity_type} - {self.title} ({self.lead.id})"
\ No newline at end of file
+        return f"Cube for user {self.user_id} refreshed at {self.refreshed_at}"
@@ -0,0 +1,166 @@
+"""
+N+1 query detection for development and test runs.
+
+Every SELECT run while a scope is open (a request through
+NPlusOneMiddleware, or `with detect():`) is reduced to its shape: Django
+already leaves parameters out of the SQL text, and the normalizer also
+folds literals and `IN (...)` lists of any length. When one shape runs
+N_PLUS_ONE_THRESHOLD times with different parameters, the scope records it
+with the project frames of the stack that ran it, typically a serializer
+field or __str__ following a foreign key per row.
+
+N_PLUS_ONE_DETECTION picks what happens at the end of the scope: 'log'
+warns on the crm.nplusone logger (the default with DEBUG), 'raise' raises
+NPlusOneError (the test suite's default, see conftest.py) and 'off' removes
+the middleware at startup so nothing is installed.
+"""
+import logging
+import re
+import threading
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import queryobserver
+
+logger = logging.getLogger('crm.nplusone')
+
+_current = ContextVar('nplusone_scope', default=None)
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR))
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def mode():
+    return getattr(settings, 'N_PLUS_ONE_DETECTION', 'off')
+
+
+def threshold():
+    return getattr(settings, 'N_PLUS_ONE_THRESHOLD', 3)
+
+
+@lru_cache(maxsize=1024)
+def normalize(sql):
+    """The query's shape: literals become ?, IN lists collapse to IN (...)"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def project_stack():
+    """Frames of the current stack that belong to this project, outermost first"""
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(PROJECT_ROOT) and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+
+
+class Scope:
+    """Query shapes seen during one request or `detect()` block"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.shapes = {}  # shape -> set of parameter tuples
+        self.findings = {}  # shape -> (executions, stack) for repeated shapes
+        self._lock = threading.Lock()
+
+    def record(self, sql, params):
+        if not sql.lstrip()[:6].upper() == 'SELECT':
+            return
+        shape = normalize(sql)
+        with self._lock:
+            seen = self.shapes.setdefault(shape, set())
+            seen.add(repr(params))
+            if len(seen) < threshold():
+                return
+            if shape in self.findings:
+                self.findings[shape] = (len(seen), self.findings[shape][1])
+                return
+            # First time over the threshold: keep the stack that got it there
+            self.findings[shape] = (len(seen), project_stack())
+
+    def report(self):
+        lines = []
+        for shape, (executions, stack) in self.findings.items():
+            where = f' during {self.label}' if self.label else ''
+            lines.append(f"N+1 query: {executions} executions of `{shape}`{where}")
+            lines.extend(f"  {frame.filename}:{frame.lineno} in {frame.name}" for frame in stack[-5:])
+        return '\n'.join(lines)
+
+
+def _record_query(sql, params, many, seconds):
+    scope = _current.get()
+    if scope is not None and not many:
+        scope.record(sql, params)
+
+
+def finish(scope, action):
+    if not scope.findings or action == 'off':
+        return
+    if action == 'raise':
+        raise NPlusOneError(scope.report())
+    logger.warning(scope.report())
+
+
+@contextmanager
+def detect(label='', action=None):
+    """Check the block for N+1 queries; `action` defaults to N_PLUS_ONE_DETECTION"""
+    queryobserver.subscribe(_record_query)
+    scope = Scope(label)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+    finish(scope, action or mode())
+
+
+@contextmanager
+def separate_scope(label=''):
+    """Give a nested unit of work (a batch sub-request) its own scope when detection is active"""
+    if _current.get() is None:
+        yield
+        return
+    with detect(label):
+        yield
+
+
+class NPlusOneMiddleware:
+    """Run each request in a detection scope (N_PLUS_ONE_DETECTION = 'log' or 'raise')"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if mode() == 'off':
+            raise MiddlewareNotUsed
+        queryobserver.subscribe(_record_query)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with detect(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with detect(f'{request.method} {request.path}'):
+            return await self.get_response(request)
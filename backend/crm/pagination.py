@@ -1,6 +1,156 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 
 class LargePageNumberPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 10000  # Allow very large page sizes
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset ("seek") pagination over a unique, multi-column ordering.
+
+    DRF's CursorPagination only seeks on the first ordering column and falls
+    back to an OFFSET for ties. Here the cursor carries the full key of the
+    boundary row, so every page is a `WHERE (a, b, id) < (...) LIMIT n` range
+    scan and costs the same no matter how deep the client has paged.
+    The final ordering column must be unique (normally `id`).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    template = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, self.cursor.position))
+
+        # Fetch one extra row to find out whether there is anything beyond this page.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def _seek_filter(self, ordering, position):
+        # Expand the row comparison `(a, b, c) > (x, y, z)` into
+        # `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`,
+        # which every backend can plan as an index range scan.
+        names = [order.lstrip('-') for order in ordering]
+        seek = Q()
+        for i, order in enumerate(ordering):
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            term = Q(**{f'{names[i]}__{lookup}': position[i]})
+            for j in range(i):
+                term &= Q(**{names[j]: position[j]})
+            seek |= term
+        # Redundant bound on the leading column so the planner sees a plain range.
+        leading = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{names[0]}__{leading}': position[0]}) & seek
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+        return self._encode(position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self._encode(position, reverse=True)
+
+    def link_after(self, base_url, instance):
+        """Cursor link to the page following `instance`, for first pages built outside paginate_queryset"""
+        self.base_url = base_url
+        return self._encode(self._get_position_from_instance(instance, self.ordering), reverse=False)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            raw_position = tokens['p']
+            if len(raw_position) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.model._meta.get_field(order.lstrip('-')).to_python(value)
+                for order, value in zip(self.ordering, raw_position)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=bool(tokens.get('r')), position=position)
+
+    def _encode(self, position, reverse):
+        tokens = {'p': position}
+        if reverse:
+            tokens['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(tokens, separators=(',', ':')).encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for order in ordering:
+            name = order.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+
+class LeadCursorPagination(KeysetCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ActivityCursorPagination(KeysetCursorPagination):
+    ordering = ('-activity_date', '-created_at', '-id')
+
+
+class CursorPaginationOptInMixin:
+    """
+    Let clients opt into keyset pagination with `?pagination=cursor` (or by
+    following a `cursor` link) while the default stays page-number based.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.cursor_pagination_class is not None:
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+def _reverse_ordering(ordering):
+    return tuple(order[1:] if order.startswith('-') else f'-{order}' for order in ordering)
@@ -0,0 +1,178 @@
+"""
+Per-request phase timings, emitted as a Server-Timing header and a JSON log line.
+
+Opt-in with SERVER_TIMING_ENABLED. When it is off the middleware raises
+MiddlewareNotUsed at startup and nothing below is installed, so requests pay
+nothing. When it is on, `install()` wraps a few DRF and ORM entry points once
+per process, and each wrapper is a context variable lookup unless a request
+is being timed:
+
+- auth: APIView.perform_authentication (token verification, user lookup)
+- orm: QuerySet evaluation, including building model instances
+- sql: time in the database driver, with the statement count, for every
+  connection the request touches (including aio.gather's threads)
+- serialize: Serializer.data / ListSerializer.data
+- render: Response.rendered_content
+- total: the request as seen by the middleware
+
+Phases nest (sql inside orm; lazy querysets are evaluated inside serialize)
+and work on several threads is summed, so they don't add up to total.
+Streaming responses are timed up to the first byte.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models.query import QuerySet
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer, Serializer
+from rest_framework.views import APIView
+
+from . import queryobserver
+
+logger = logging.getLogger('crm.profiling')
+
+PHASES = ('auth', 'orm', 'sql', 'serialize', 'render')
+
+_current = ContextVar('server_timing', default=None)
+_installed = False
+_install_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'SERVER_TIMING_ENABLED', False)
+
+
+class Timings:
+    """Accumulated phase durations (seconds) of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.queries = 0
+        self._lock = threading.Lock()
+        self._depth = threading.local()
+
+    def enter(self, phase):
+        """Count a phase entry on this thread; True for the outermost, the only one timed"""
+        depth = getattr(self._depth, phase, 0)
+        setattr(self._depth, phase, depth + 1)
+        return depth == 0
+
+    def exit(self, phase, seconds):
+        setattr(self._depth, phase, getattr(self._depth, phase) - 1)
+        if seconds is not None:
+            with self._lock:
+                self.durations[phase] += seconds
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.durations['sql'] += seconds
+            self.queries += 1
+
+    def header(self, total):
+        metrics = []
+        for phase in PHASES:
+            if phase in self.durations:
+                metric = f'{phase};dur={self.durations[phase] * 1000:.2f}'
+                if phase == 'sql':
+                    metric += f';desc="{self.queries} queries"'
+                metrics.append(metric)
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_dict(self, total):
+        return {
+            'total_ms': round(total * 1000, 2),
+            **{f'{phase}_ms': round(self.durations[phase] * 1000, 2) for phase in PHASES},
+            'queries': self.queries,
+        }
+
+
+def timed(phase, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter() if timings.enter(phase) else None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.exit(phase, None if started is None else time.perf_counter() - started)
+    return wrapper
+
+
+def _time_sql(sql, params, many, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add_query(seconds)
+
+
+def install():
+    """Wrap the timed entry points; idempotent, and only ever called when profiling is enabled"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        APIView.perform_authentication = timed('auth', APIView.perform_authentication)
+        QuerySet._fetch_all = timed('orm', QuerySet._fetch_all)
+        Serializer.data = property(timed('serialize', Serializer.data.fget))
+        ListSerializer.data = property(timed('serialize', ListSerializer.data.fget))
+        Response.rendered_content = property(timed('render', Response.rendered_content.fget))
+        queryobserver.subscribe(_time_sql)
+        _installed = True
+
+
+class ServerTimingMiddleware:
+    """Time each request's phases; add a Server-Timing header and log them (SERVER_TIMING_ENABLED)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.header(total)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **timings.as_dict(total),
+            }))
+        return response
@@ -0,0 +1,58 @@
+"""
+One SQL execute wrapper shared by everything that watches queries.
+
+profiling.py (Server-Timing sql), metrics.py (per-route SQL histograms) and
+nplusone.py (query shapes) each subscribe a listener instead of installing
+their own wrapper, so a statement is timed once however many of them are on.
+Listeners are called as `listener(sql, params, many, seconds)` after every
+statement on every connection, including connections opened later on other
+threads (aio.gather, batch workers); each one checks its own context variable
+and returns straight away outside a request it is tracking.
+
+Nothing is installed until the first `subscribe()`, so with every consumer
+disabled queries run without a wrapper.
+"""
+import threading
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_listeners = ()
+_lock = threading.Lock()
+
+
+def _observe(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        for listener in _listeners:
+            listener(sql, params, many, seconds)
+
+
+def _add_observer(sender, connection, **kwargs):
+    if _observe not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe)
+
+
+def subscribe(listener):
+    """Call `listener` after every SQL statement from now on; idempotent"""
+    global _listeners
+    if listener in _listeners:
+        return
+    with _lock:
+        if listener in _listeners:
+            return
+        if not _listeners:
+            connection_created.connect(_add_observer, dispatch_uid='crm.queryobserver')
+            for connection in connections.all(initialized_only=True):
+                _add_observer(None, connection)
+        _listeners = (*_listeners, listener)
+
+
+def unsubscribe(listener):
+    global _listeners
+    with _lock:
+        _listeners = tuple(other for other in _listeners if other != listener)
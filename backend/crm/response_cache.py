@@ -0,0 +1,137 @@
+"""
+Versioned per-user cache for GET responses.
+
+Every user has a generation counter in the cache. Response keys embed it, so
+bumping the counter on any Lead/Activity write (see crm/signals.py) orphans
+all of that user's cached responses in O(1), without scanning or deleting
+keys; the orphans simply age out after RESPONSE_CACHE_TIMEOUT.
+
+Runs on Django's cache framework (CACHES['default']): locmem in development
+and tests, a shared backend such as Redis in production so every worker sees
+the same generations.
+"""
+import hashlib
+import threading
+from collections import Counter
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+GENERATION_KEY = 'crm:gen:{user_id}'
+RESPONSE_KEY = 'crm:resp:{user_id}:{generation}:{view}:{digest}'
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+
+
+def generation(user_id):
+    key = GENERATION_KEY.format(user_id=user_id)
+    value = cache.get(key)
+    if value is None:
+        # add() so two first requests can't reset a counter a write just bumped
+        cache.add(key, 1, timeout=None)
+        value = cache.get(key, 1)
+    return value
+
+
+def bump(user_id):
+    key = GENERATION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No counter yet: nothing can be cached under the implicit generation 1
+        cache.add(key, 2, timeout=None)
+
+
+def invalidate_user(user_id):
+    """Bump now, and again after commit so a read that raced the write can't stay cached"""
+    bump(user_id)
+    transaction.on_commit(lambda: bump(user_id))
+
+
+def _record(outcome):
+    with _counters_lock:
+        _counters[outcome] += 1
+
+
+def stats():
+    """Hit/miss counts for this process since start (or the last reset)"""
+    with _counters_lock:
+        return {'hits': _counters['hit'], 'misses': _counters['miss']}
+
+
+def reset_stats():
+    with _counters_lock:
+        _counters.clear()
+
+
+def response_key(request, view_name):
+    # Query parameters are sorted so ?a=1&b=2 and ?b=2&a=1 share an entry
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.sha1(f'{request.path}?{query}'.encode()).hexdigest()
+    return RESPONSE_KEY.format(
+        user_id=request.user.id, generation=generation(request.user.id), view=view_name, digest=digest,
+    )
+
+
+def _hit(data):
+    _record('hit')
+    response = Response(data)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def cache_response(view_method):
+    """Cache successful responses of a DRF view method (sync or async) per user; sets X-Cache: HIT/MISS"""
+    if iscoroutinefunction(view_method):
+        return _cache_async_response(view_method)
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not enabled() or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        # Take the key (and generation) before running the view, like crm/suggest.py
+        key = response_key(request, f'{type(self).__name__}.{view_method.__name__}')
+        data = cache.get(key)
+        if data is not None:
+            return _hit(data)
+
+        _record('miss')
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
+
+
+def _cache_async_response(view_method):
+    @wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        if not enabled() or not request.user.is_authenticated:
+            return await view_method(self, request, *args, **kwargs)
+
+        key = await sync_to_async(response_key)(request, f'{type(self).__name__}.{view_method.__name__}')
+        data = await cache.aget(key)
+        if data is not None:
+            return _hit(data)
+
+        _record('miss')
+        response = await view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
@@ -0,0 +1,108 @@
+"""
+Read-replica routing.
+
+With DATABASE_REPLICA_URL set, settings adds a `replica` alias and
+`ReplicaRouter` sends reads to it, but only inside views that opt in with
+`ReplicaReadsMixin` (lead list/retrieve/export, analytics, recent activities,
+the dashboard and activity exports) and only for safe methods. Everything
+else, including authentication and all writes, stays on `default`.
+
+Replicas lag, so a user who has just written reads from the primary for
+REPLICA_PIN_SECONDS: every Lead/Activity write pins its owner (see
+crm/signals.py). Pins live in Django's cache, so with a shared backend such as
+Redis they hold across workers.
+
+The routing decision travels in a context variable, which follows a request
+through sync_to_async and into aio.gather's worker threads.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'crm:replica-pin:{user_id}'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_alias():
+    """The configured replica alias, or None when reads aren't routed"""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def _set_pin(user_id):
+    cache.set(PIN_KEY.format(user_id=user_id), True, pin_seconds())
+
+
+def pin(user_id):
+    """Keep a user's reads on the primary; again after commit, when the replica starts catching up"""
+    if replica_alias() is None:
+        return
+    _set_pin(user_id)
+    transaction.on_commit(lambda: _set_pin(user_id))
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id=user_id)) is not None
+
+
+class ReplicaRouter:
+    """Route reads to the replica while a ReplicaReadsMixin view handles a request"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit: without a router Django saves an instance back to the alias it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica takes its schema from the primary
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    Serve a view's safe requests from the replica unless the user is pinned.
+    Viewsets name the actions that may in `replica_actions`.
+    """
+    replica_actions = None
+
+    def reads_from_replica(self, request):
+        if request.method not in SAFE_METHODS or replica_alias() is None:
+            return False
+        if self.replica_actions is not None and getattr(self, 'action', None) not in self.replica_actions:
+            return False
+        return not is_pinned(request.user.pk)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permission checks above run on the primary
+        super().initial(request, *args, **kwargs)
+        if self.reads_from_replica(request):
+            self._replica_reads_before = _replica_reads.get()
+            _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if hasattr(self, '_replica_reads_before'):
+            # Worker threads serve many requests; don't leak the decision into the next one
+            _replica_reads.set(self._replica_reads_before)
+            del self._replica_reads_before
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,305 @@
+"""
+Full-text search over leads and their activities.
+
+Each lead has one LeadSearchDocument row holding its searchable text in three
+weighted columns. The database-specific index is built from that table:
+
+* PostgreSQL: a generated `tsvector` column with a GIN index, ranked with
+  `ts_rank_cd` and highlighted with `ts_headline`.
+* SQLite: an FTS5 external-content table kept in sync by triggers, ranked
+  with `bm25` and highlighted with `snippet`.
+
+Other backends fall back to a LIKE scan over the document table.
+
+Search runs in two phases: `search()` returns ranked lead ids for the caller's
+already-filtered queryset (`SearchResults` pages through them in the
+database), and `snippets()` highlights only the page that is actually
+rendered.
+"""
+import re
+from collections import namedtuple
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Activity, Lead, LeadSearchDocument
+
+MAX_TERMS = 8
+SNIPPET_START = '**'
+SNIPPET_END = '**'
+
+# Lead fields that feed the document; saves touching only other fields skip reindexing.
+INDEXED_LEAD_FIELDS = {'first_name', 'last_name', 'email', 'phone', 'source', 'property_interest'}
+
+SearchHit = namedtuple('SearchHit', ['lead_id', 'rank'])
+
+SQLITE_FTS_TABLE = 'crm_leadsearch_fts'
+
+
+def parse_terms(query):
+    """Split user input into lowercase word terms; punctuation never reaches the engine"""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def build_document(lead, activities=()):
+    """Return the LeadSearchDocument column values for a lead and its (title, notes) pairs"""
+    email = lead.email or ''
+    phone_digits = re.sub(r'\D', '', lead.phone or '')
+    name = ' '.join(filter(None, [
+        lead.first_name, lead.last_name, email,
+        # Index the email's parts too so "example" finds "john@example.com"
+        email.replace('@', ' ').replace('.', ' '),
+        lead.phone, phone_digits,
+    ]))
+    interest = ' '.join(filter(None, [lead.property_interest, lead.source]))
+    activity_text = '\n'.join(
+        ' '.join(filter(None, [title, notes])) for title, notes in activities
+    )
+    return {'name': name, 'interest': interest, 'activities': activity_text}
+
+
+def index_lead(lead, with_activities=True):
+    """Create or refresh the search document for one lead"""
+    activities = ()
+    if with_activities:
+        activities = Activity.objects.filter(lead_id=lead.pk).order_by('id').values_list('title', 'notes')
+    LeadSearchDocument.objects.update_or_create(lead_id=lead.pk, defaults=build_document(lead, activities))
+
+
+def index_lead_id(lead_id):
+    lead = Lead.objects.filter(pk=lead_id).first()
+    if lead is not None:
+        index_lead(lead)
+
+
+def index_new_leads(leads):
+    """Create documents for freshly inserted leads, which can't have activities yet"""
+    LeadSearchDocument.objects.bulk_create(
+        [LeadSearchDocument(lead_id=lead.pk, **build_document(lead)) for lead in leads], batch_size=500,
+    )
+
+
+def index_leads(lead_ids, batch_size=500):
+    """Rebuild documents for many leads with a fixed number of queries per batch"""
+    lead_ids = list(lead_ids)
+    for start in range(0, len(lead_ids), batch_size):
+        batch = lead_ids[start:start + batch_size]
+        activities = {}
+        for lead_id, title, notes in (
+            Activity.objects.filter(lead_id__in=batch).order_by('lead_id', 'id')
+            .values_list('lead_id', 'title', 'notes')
+        ):
+            activities.setdefault(lead_id, []).append((title, notes))
+        documents = [
+            LeadSearchDocument(lead_id=lead.pk, **build_document(lead, activities.get(lead.pk, ())))
+            for lead in Lead.objects.filter(pk__in=batch)
+        ]
+        LeadSearchDocument.objects.filter(lead_id__in=batch).delete()
+        LeadSearchDocument.objects.bulk_create(documents)
+
+
+def search(queryset, query, limit=None, offset=0):
+    """Return SearchHits from `queryset` ordered by relevance: all of them, or `limit` from `offset`"""
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    return get_backend(queryset.db).search(queryset, terms, limit, offset)
+
+
+def filter_matching(queryset, query):
+    """Narrow `queryset` to every lead matching `query`, unranked, through a subquery on the index"""
+    terms = parse_terms(query)
+    if not terms:
+        return queryset.none()
+    return queryset.filter(id__in=get_backend(queryset.db).matching_ids(queryset, terms))
+
+
+class SearchResults:
+    """
+    Every hit of a query, ranked, as a sequence a paginator can count and
+    slice: each page is a LIMIT/OFFSET query, so no hit is cut off and only
+    the requested page's ids are fetched.
+    """
+
+    def __init__(self, queryset, query):
+        self.queryset = queryset
+        self.terms = parse_terms(query)
+        self.backend = get_backend(queryset.db)
+
+    def count(self):
+        return self.backend.count(self.queryset, self.terms) if self.terms else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('SearchResults only supports slicing')
+        offset = index.start or 0
+        limit = None if index.stop is None else max(index.stop - offset, 0)
+        if not self.terms or limit == 0:
+            return []
+        return self.backend.search(self.queryset, self.terms, limit, offset)
+
+
+def snippets(lead_ids, query, using=DEFAULT_DB_ALIAS):
+    """Return {lead_id: highlighted snippet} for the given leads"""
+    terms = parse_terms(query)
+    if not terms or not lead_ids:
+        return {}
+    return get_backend(using).snippets(list(lead_ids), terms)
+
+
+def _filtered_ids_sql(queryset):
+    return queryset.order_by().values('id').query.sql_with_params()
+
+
+class SearchBackend:
+    def __init__(self, using):
+        self.connection = connections[using]
+
+
+class PostgresSearchBackend(SearchBackend):
+    headline_options = (
+        'MaxFragments=2, MaxWords=14, MinWords=5, FragmentDelimiter=" … ", '
+        f'StartSel="{SNIPPET_START}", StopSel="{SNIPPET_END}"'
+    )
+
+    def tsquery(self, terms):
+        """
+        SQL and params for a tsquery matching every term as a prefix. The name
+        column is indexed with the 'simple' config and the rest with 'english',
+        so each term is looked up both ways: as typed for names ("Emily",
+        "Will") and stemmed, without stop words, for the other text.
+        """
+        clause = "(to_tsquery('simple', %s) || to_tsquery('english', %s))"
+        return ' && '.join([clause] * len(terms)), [f'{term}:*' for term in terms for _ in range(2)]
+
+    def matches(self, queryset, terms):
+        """FROM and WHERE clauses, with their params, for the documents of `queryset` matching `terms`"""
+        ids_sql, ids_params = _filtered_ids_sql(queryset)
+        query_sql, query_params = self.tsquery(terms)
+        sql = f"""
+            FROM crm_leadsearchdocument d, (SELECT {query_sql} AS q) query
+            WHERE d.search_vector @@ q AND d.lead_id IN ({ids_sql})
+        """
+        return sql, [*query_params, *ids_params]
+
+    def matching_ids(self, queryset, terms):
+        matches, params = self.matches(queryset, terms)
+        return RawSQL(f'SELECT d.lead_id {matches}', params)
+
+    def search(self, queryset, terms, limit, offset):
+        matches, params = self.matches(queryset, terms)
+        sql = f"""
+            SELECT d.lead_id, ts_rank_cd(d.search_vector, q) AS rank {matches}
+            ORDER BY rank DESC, d.lead_id DESC
+            LIMIT %s OFFSET %s
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [*params, limit, offset])  # LIMIT NULL is no limit
+            return [SearchHit(lead_id, float(rank)) for lead_id, rank in cursor.fetchall()]
+
+    def count(self, queryset, terms):
+        matches, params = self.matches(queryset, terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) {matches}', params)
+            return cursor.fetchone()[0]
+
+    def snippets(self, lead_ids, terms):
+        query_sql, query_params = self.tsquery(terms)
+        sql = f"""
+            SELECT lead_id, ts_headline('english', concat_ws(' … ', name, interest, activities), {query_sql}, %s)
+            FROM crm_leadsearchdocument
+            WHERE lead_id = ANY(%s)
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [*query_params, self.headline_options, lead_ids])
+            return dict(cursor.fetchall())
+
+
+class SqliteSearchBackend(SearchBackend):
+    # bm25 column weights for (name, interest, activities)
+    weights = (10.0, 4.0, 1.0)
+
+    def match(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def matches(self, queryset, terms):
+        """FROM and WHERE clauses, with their params, for the documents of `queryset` matching `terms`"""
+        ids_sql, ids_params = _filtered_ids_sql(queryset)
+        sql = f"""
+            FROM {SQLITE_FTS_TABLE}
+            WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid IN ({ids_sql})
+        """
+        return sql, [self.match(terms), *ids_params]
+
+    def matching_ids(self, queryset, terms):
+        matches, params = self.matches(queryset, terms)
+        return RawSQL(f'SELECT rowid {matches}', params)
+
+    def search(self, queryset, terms, limit, offset):
+        matches, params = self.matches(queryset, terms)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        # bm25() is "lower is better"; negate it so callers always sort rank descending.
+        sql = f"""
+            SELECT rowid, -bm25({SQLITE_FTS_TABLE}, {weights}) AS rank {matches}
+            ORDER BY rank DESC, rowid DESC
+            LIMIT %s OFFSET %s
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [*params, -1 if limit is None else limit, offset])  # LIMIT -1 is no limit
+            return [SearchHit(lead_id, rank) for lead_id, rank in cursor.fetchall()]
+
+    def count(self, queryset, terms):
+        matches, params = self.matches(queryset, terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) {matches}', params)
+            return cursor.fetchone()[0]
+
+    def snippets(self, lead_ids, terms):
+        placeholders = ', '.join(['%s'] * len(lead_ids))
+        sql = f"""
+            SELECT rowid, snippet({SQLITE_FTS_TABLE}, -1, %s, %s, ' … ', 14)
+            FROM {SQLITE_FTS_TABLE}
+            WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid IN ({placeholders})
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [SNIPPET_START, SNIPPET_END, self.match(terms), *lead_ids])
+            return dict(cursor.fetchall())
+
+
+class FallbackSearchBackend(SearchBackend):
+    """Unindexed LIKE search for databases without a full-text engine"""
+
+    def matches(self, queryset, terms):
+        documents = LeadSearchDocument.objects.using(queryset.db).filter(lead__in=queryset.order_by())
+        for term in terms:
+            documents = documents.filter(
+                Q(name__icontains=term) | Q(interest__icontains=term) | Q(activities__icontains=term)
+            )
+        return documents
+
+    def matching_ids(self, queryset, terms):
+        return self.matches(queryset, terms).values('lead_id')
+
+    def search(self, queryset, terms, limit, offset):
+        ids = self.matches(queryset, terms).order_by('-lead_id').values_list('lead_id', flat=True)
+        ids = ids[offset:] if limit is None else ids[offset:offset + limit]
+        return [SearchHit(lead_id, 0.0) for lead_id in ids]
+
+    def count(self, queryset, terms):
+        return self.matches(queryset, terms).count()
+
+    def snippets(self, lead_ids, terms):
+        return {}
+
+
+def get_backend(using=DEFAULT_DB_ALIAS):
+    vendor = connections[using].vendor
+    if vendor == 'postgresql':
+        return PostgresSearchBackend(using)
+    if vendor == 'sqlite':
+        return SqliteSearchBackend(using)
+    return FallbackSearchBackend(using)
@@ -1,10 +1,14 @@
 from rest_framework import serializers
 from .models import Lead
 from .models import Activity
+from .fieldsets import SparseFieldsetSerializerMixin
+from .bulk import MAX_IDS as MAX_BULK_IDS
+from . import batch
 
-class LeadSerializer(serializers.ModelSerializer):
+class LeadSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField(read_only=True)
-    user_id = serializers.IntegerField(source='user.id', read_only=True)
+    # Read the FK column directly; source='user.id' would load the User row per lead
+    user_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Lead
@@ -15,6 +19,11 @@ class LeadSerializer(serializers.ModelSerializer):
             'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'user_id', 'is_active', 'created_at', 'updated_at', 'full_name']
+        # Columns each non-column field reads, for ?fields= narrowing (see crm/fieldsets.py)
+        field_sources = {
+            'user_id': ('user',),
+            'full_name': ('first_name', 'last_name'),
+        }
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip()
@@ -24,11 +33,52 @@ class LeadSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class ActivitySerializer(serializers.ModelSerializer):
+class LeadSearchResultSerializer(LeadSerializer):
+    # Extra read-only fields for ranked ?q= search results
+    search_rank = serializers.FloatField(read_only=True)
+    search_snippet = serializers.CharField(read_only=True)
+
+    class Meta(LeadSerializer.Meta):
+        fields = LeadSerializer.Meta.fields + ['search_rank', 'search_snippet']
+        field_sources = {**LeadSerializer.Meta.field_sources, 'search_rank': (), 'search_snippet': ()}
+
+class LeadSyncSerializer(LeadSerializer):
+    # Feed rows for /api/leads/sync/: (source, external_id) identifies the lead to upsert
+    source = serializers.CharField(max_length=50)
+    external_id = serializers.CharField(max_length=100)
+
+    class Meta(LeadSerializer.Meta):
+        fields = LeadSerializer.Meta.fields + ['external_id']
+
+class LeadBulkSerializer(serializers.Serializer):
+    # Body of the bulk lead actions; see crm/bulk.py
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=MAX_BULK_IDS)
+
+class LeadBulkStatusSerializer(LeadBulkSerializer):
+    status = serializers.ChoiceField(choices=Lead.STATUS_CHOICES)
+
+class BatchSubRequestSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=100)  # echoed back to match responses
+    method = serializers.ChoiceField(choices=batch.METHODS, default='GET')
+    path = serializers.CharField(max_length=2000)  # may carry a query string
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith(batch.PATH_PREFIX) or value.split('?')[0].rstrip('/') == '/api/batch':
+            raise serializers.ValidationError(f"Must be an API path under {batch.PATH_PREFIX} other than /api/batch/.")
+        return value
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(child=BatchSubRequestSerializer(), allow_empty=False,
+                                     max_length=batch.MAX_REQUESTS)
+    parallel = serializers.BooleanField(default=False)  # run consecutive GETs concurrently
+
+class ActivitySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # read-only fields to show who/which lead
-    lead_id = serializers.IntegerField(source='lead.id', read_only=True)
+    lead_id = serializers.IntegerField(read_only=True)
     lead = serializers.SerializerMethodField(read_only=True)
-    user_id = serializers.IntegerField(source='user.id', read_only=True)
+    user_id = serializers.IntegerField(read_only=True)
     user = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -39,10 +89,17 @@ class ActivitySerializer(serializers.ModelSerializer):
             'created_at'
         ]
         read_only_fields = ['id', 'lead_id', 'lead', 'user_id', 'user', 'created_at']
+        field_sources = {
+            'lead_id': ('lead',),
+            'lead': ('lead__first_name', 'lead__last_name'),
+            'user_id': ('user',),
+            'user': ('user__username',),
+        }
 
+    # get_lead/get_user dereference the relations, so querysets must select_related('lead', 'user')
     def get_lead(self, obj):
         return {
-            'id': obj.lead.id,
+            'id': obj.lead_id,
             'first_name': obj.lead.first_name,
             'last_name': obj.lead.last_name,
             'full_name': f"{obj.lead.first_name} {obj.lead.last_name}".strip()
@@ -50,7 +107,7 @@ class ActivitySerializer(serializers.ModelSerializer):
 
     def get_user(self, obj):
         return {
-            'id': obj.user.id,
+            'id': obj.user_id,
             'username': obj.user.username
         }
 
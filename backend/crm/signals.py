@@ -0,0 +1,195 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from . import cube, dbstats, response_cache, routers, search, sqlite, stats, suggest
+from .models import Activity, Lead
+
+# Sent with `leads` (saved instances) after Lead.objects.bulk_create, which skips post_save
+leads_bulk_created = Signal()
+# Sent after a bulk write to existing leads (upsert, QuerySet.update) with `leads` in their
+# new state, the changed `fields` and `previous`: {pk: (status, is_active) before the write}.
+# Writers must set updated_at so the cube watermark finds the rows.
+leads_bulk_updated = Signal()
+
+
+def _deleted_directly(origin, model):
+    # post_delete also fires for rows removed by a cascade (e.g. deleting a
+    # lead or a user); only react when the delete started at `model` itself.
+    return getattr(origin, 'model', type(origin)) is model
+
+
+@receiver(post_save, sender=Lead)
+def index_lead_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Soft delete/restore only touch is_active, which the document doesn't contain
+    if raw or (update_fields and not search.INDEXED_LEAD_FIELDS.intersection(update_fields)):
+        return
+    # A brand-new lead cannot have activities yet
+    search.index_lead(instance, with_activities=not created)
+
+
+@receiver(post_save, sender=Lead)
+def refresh_suggest_keys(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # Even an is_active-only save changes which leads may be suggested
+    suggest.cache.invalidate_user(instance.user_id)
+    if update_fields and not suggest.KEYED_LEAD_FIELDS.intersection(update_fields):
+        return
+    suggest.index_lead(instance, created=created)
+
+
+@receiver(post_delete, sender=Lead)
+def invalidate_suggestions_on_delete(sender, instance, **kwargs):
+    suggest.cache.invalidate_user(instance.user_id)
+
+
+@receiver(pre_save, sender=Lead)
+def lock_lead_stats_key(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    # Lead.save wraps pre_save, the write and post_save in one transaction
+    if not raw:
+        stats.lock_stored_key(instance, using, update_fields)
+
+
+@receiver(post_save, sender=Lead)
+def update_lead_stats_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        stats.lead_saved(instance, created, update_fields)
+
+
+@receiver(pre_delete, sender=Lead)
+def lock_lead_stats_key_on_delete(sender, instance, origin=None, using=None, **kwargs):
+    # The delete collector sends pre_delete, deletes and sends post_delete in one transaction
+    if _deleted_directly(origin, Lead):
+        stats.lock_stored_key(instance, using)
+
+
+@receiver(post_delete, sender=Lead)
+def update_lead_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # Deleting a user cascades to their LeadStats rows as well, so skip that case
+    if _deleted_directly(origin, Lead):
+        stats.lead_deleted(instance)
+
+
+@receiver(post_save, sender=Activity)
+def index_lead_on_activity_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_lead_id(instance.lead_id)
+
+
+@receiver(post_delete, sender=Activity)
+def index_lead_on_activity_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Activity):
+        search.index_lead_id(instance.lead_id)
+
+
+@receiver(post_delete, sender=Lead)
+def refresh_cube_on_lead_delete(sender, instance, origin=None, **kwargs):
+    # A hard-deleted lead leaves no updated_at behind for the cube watermark to find
+    if _deleted_directly(origin, Lead):
+        cube.refresh_partitions([(instance.user_id, cube.month_of(instance.created_at))])
+
+
+@receiver(post_save, sender=Activity)
+def mark_cube_partition_on_activity_save(sender, instance, raw=False, **kwargs):
+    # Activities have no updated_at; a LeadCubeChange row lets the cube refresh find the change
+    if not raw:
+        cube.mark_activities_changed(instance.lead_id)
+
+
+@receiver(post_delete, sender=Activity)
+def mark_cube_partition_on_activity_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Activity):
+        cube.mark_activities_changed(instance.lead_id)
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Activity)
+def invalidate_cached_responses_on_save(sender, instance, raw=False, **kwargs):
+    # An activity's user is always the owner of its lead
+    if not raw:
+        response_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Activity)
+def invalidate_cached_responses_on_delete(sender, instance, origin=None, **kwargs):
+    # One bump covers a whole cascade; deleting a user leaves nothing to serve
+    if _deleted_directly(origin, sender):
+        response_cache.invalidate_user(instance.user_id)
+
+
+@receiver(leads_bulk_created)
+def index_bulk_created_leads(sender, leads, **kwargs):
+    search.index_new_leads(leads)
+
+
+@receiver(leads_bulk_created)
+def add_suggest_keys_for_bulk_created_leads(sender, leads, **kwargs):
+    suggest.index_new_leads(leads)
+    for user_id in {lead.user_id for lead in leads}:
+        suggest.cache.invalidate_user(user_id)
+
+
+@receiver(leads_bulk_created)
+def update_lead_stats_on_bulk_create(sender, leads, **kwargs):
+    # The cube needs nothing: new rows carry a fresh updated_at for its watermark
+    stats.leads_created(leads)
+
+
+@receiver(leads_bulk_updated)
+def reindex_bulk_updated_leads(sender, leads, fields, **kwargs):
+    if search.INDEXED_LEAD_FIELDS.intersection(fields):
+        search.index_leads([lead.pk for lead in leads])
+
+
+@receiver(leads_bulk_updated)
+def refresh_suggest_keys_for_bulk_updated_leads(sender, leads, fields, **kwargs):
+    for user_id in {lead.user_id for lead in leads}:
+        suggest.cache.invalidate_user(user_id)
+    if suggest.KEYED_LEAD_FIELDS.intersection(fields):
+        suggest.index_leads([lead.pk for lead in leads])
+
+
+@receiver(leads_bulk_updated)
+def update_lead_stats_on_bulk_update(sender, leads, previous, **kwargs):
+    stats.leads_updated(leads, previous)
+
+
+@receiver(leads_bulk_created)
+@receiver(leads_bulk_updated)
+def invalidate_cached_responses_on_bulk_write(sender, leads, **kwargs):
+    for user_id in {lead.user_id for lead in leads}:
+        response_cache.invalidate_user(user_id)
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Activity)
+def pin_reads_to_primary_on_save(sender, instance, raw=False, **kwargs):
+    # The owner reads their own write from the primary until the replica has it
+    if not raw:
+        routers.pin(instance.user_id)
+
+
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Activity)
+def pin_reads_to_primary_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, sender):
+        routers.pin(instance.user_id)
+
+
+@receiver(leads_bulk_created)
+@receiver(leads_bulk_updated)
+def pin_reads_to_primary_on_bulk_write(sender, leads, **kwargs):
+    for user_id in {lead.user_id for lead in leads}:
+        routers.pin(user_id)
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    dbstats.connection_opened(connection.alias)
+
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    sqlite.configure(connection)
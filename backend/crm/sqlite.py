@@ -0,0 +1,57 @@
+"""
+SQLite profile for single-node deployments (no DATABASE_URL).
+
+SQLite's defaults (rollback journal, synchronous=FULL, deferred
+transactions) let one writer block every reader, and a deferred transaction
+that reads and then writes fails with "database is locked" instead of
+waiting when another worker holds the write lock. The profile:
+
+- WAL journal: readers never block the writer or each other;
+- synchronous=NORMAL: fsync at checkpoints rather than every commit, which
+  is durable across application crashes (a power loss can roll back the
+  last commits, never corrupt the file);
+- busy_timeout, cache_size, mmap_size and an in-memory temp store;
+- BEGIN IMMEDIATE for atomic blocks (settings, OPTIONS['transaction_mode']),
+  so writers queue on busy_timeout up front.
+
+`configure` runs on every new connection (connection_created, see
+crm/signals.py). WAL files only shrink at checkpoints and the planner's
+statistics go stale, so schedule `python manage.py sqlite_maintenance`.
+"""
+from django.conf import settings
+
+
+def pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', {})
+
+
+def is_file_database(connection):
+    return connection.vendor == 'sqlite' and not connection.is_in_memory_db()
+
+
+def configure(connection):
+    """Apply SQLITE_PRAGMAS to a new SQLite connection; other databases are left alone"""
+    if not is_file_database(connection) or not pragmas():
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def settings_in_effect(connection):
+    """Current values of the profile's pragmas on `connection`"""
+    with connection.cursor() as cursor:
+        values = {}
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'):
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+        return values
+
+
+def maintain(connection):
+    """PRAGMA optimize, then fold the WAL back into the database and truncate it"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA optimize')
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        busy, log_frames, checkpointed = cursor.fetchone()
+    return {'busy': bool(busy), 'log_frames': log_frames, 'checkpointed': checkpointed}
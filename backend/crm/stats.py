@@ -0,0 +1,158 @@
+"""
+Per-user pipeline counters behind /api/analytics/.
+
+LeadStats keeps one row per (user, status) with the number of active leads in
+that status. Lead saves and deletes adjust it by +/-1 in the same transaction
+(see the receivers in crm/signals.py). Both diff against the row as stored,
+read under a lock in pre_save / pre_delete, not the instance's loaded state.
+So reading a user's pipeline touches at most one row per status no matter how
+large the book is.
+
+`rebuild()` recomputes counters from a GROUP BY over crm_lead and `drift()`
+reports rows that disagree with it; both back the rebuild_lead_stats command.
+Writes that bypass Lead.save must keep the counters right themselves:
+bulk writers send `leads_bulk_created` / `leads_bulk_updated`, whose receivers
+call `leads_created()` / `leads_updated()`; anything else calls `rebuild()`
+for the users it touches.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Lead, LeadStats
+
+# Lead fields that move a lead between counters
+STATS_FIELDS = {'status', 'is_active'}
+
+
+def apply_delta(user_id, status, delta):
+    if not delta:
+        return
+    updated = LeadStats.objects.filter(user_id=user_id, status=status).update(count=F('count') + delta)
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            LeadStats.objects.create(user_id=user_id, status=status, count=delta)
+    except IntegrityError:
+        # Another transaction created the row between our UPDATE and INSERT
+        LeadStats.objects.filter(user_id=user_id, status=status).update(count=F('count') + delta)
+
+
+def lock_stored_key(lead, using, update_fields=None):
+    """
+    Before a save or delete: read the lead's stored (status, is_active) and
+    lock its row until the transaction ends. The in-memory state from when the
+    instance was loaded may be stale by now, and two concurrent writes diffing
+    against it would both move the same old counter. With the row locked (on
+    SQLite, the IMMEDIATE write transaction) the second write waits and sees
+    the first.
+    """
+    lead._stored_stats_key = None
+    if lead.pk is None or (update_fields and not STATS_FIELDS.intersection(update_fields)):
+        return
+    lead._stored_stats_key = (
+        Lead.objects.using(using).select_for_update().filter(pk=lead.pk)
+        .values_list('status', 'is_active').first()
+    )
+
+
+def lead_saved(lead, created, update_fields=None):
+    if update_fields and not STATS_FIELDS.intersection(update_fields):
+        return
+    old = None if created else getattr(lead, '_stored_stats_key', None)
+    if old is None and not created:
+        # Previous state unknown (saved without lock_stored_key): recount
+        rebuild([lead.user_id])
+        return
+    # Fields left out of update_fields keep their stored values, whatever the instance holds
+    new = tuple(
+        getattr(lead, field) if old is None or not update_fields or field in update_fields else old[index]
+        for index, field in enumerate(('status', 'is_active'))
+    )
+    if old == new:
+        return
+    if old is not None and old[1]:
+        apply_delta(lead.user_id, old[0], -1)
+    if new[1]:
+        apply_delta(lead.user_id, new[0], 1)
+
+
+def lead_deleted(lead):
+    key = getattr(lead, '_stored_stats_key', None)
+    if key is None:
+        # Never locked, or the row was already gone: recount
+        rebuild([lead.user_id])
+    elif key[1]:
+        apply_delta(lead.user_id, key[0], -1)
+
+
+def leads_created(leads):
+    """Count freshly inserted leads (e.g. from bulk_create) in with one UPDATE per (user, status)"""
+    created = Counter((lead.user_id, lead.status) for lead in leads if lead.is_active)
+    for (user_id, status), total in sorted(created.items()):
+        apply_delta(user_id, status, total)
+
+
+def leads_updated(leads, previous):
+    """Move bulk-updated leads between counters; `previous` maps pk -> (status, is_active) before the write"""
+    deltas = Counter()
+    for lead in leads:
+        old, new = previous[lead.pk], (lead.status, lead.is_active)
+        if old == new:
+            continue
+        if old[1]:
+            deltas[(lead.user_id, old[0])] -= 1
+        if new[1]:
+            deltas[(lead.user_id, new[0])] += 1
+    for (user_id, status), delta in sorted(deltas.items()):
+        apply_delta(user_id, status, delta)
+
+
+def counts(user_ids=None):
+    """Return {(user_id, status): active lead count} computed from crm_lead"""
+    leads = Lead.objects.filter(is_active=True)
+    if user_ids is not None:
+        leads = leads.filter(user_id__in=user_ids)
+    rows = leads.order_by().values('user_id', 'status').annotate(total=Count('id'))
+    return {(row['user_id'], row['status']): row['total'] for row in rows}
+
+
+def stored(user_ids=None):
+    """Return {(user_id, status): count} as currently held in LeadStats, skipping zeros"""
+    rows = LeadStats.objects.exclude(count=0)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return {(user_id, status): count for user_id, status, count in rows.values_list('user_id', 'status', 'count')}
+
+
+def drift(user_ids=None):
+    """Return sorted (user_id, status, stored, actual) tuples for counters that are wrong"""
+    actual, held = counts(user_ids), stored(user_ids)
+    return sorted(
+        (user_id, status, held.get((user_id, status), 0), actual.get((user_id, status), 0))
+        for user_id, status in set(actual) | set(held)
+        if held.get((user_id, status), 0) != actual.get((user_id, status), 0)
+    )
+
+
+def rebuild(user_ids=None):
+    """Replace LeadStats rows (for `user_ids`, or everyone) with fresh GROUP BY counts"""
+    with transaction.atomic():
+        existing = LeadStats.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        LeadStats.objects.bulk_create([
+            LeadStats(user_id=user_id, status=status, count=total)
+            for (user_id, status), total in counts(user_ids).items()
+        ])
+
+
+def summary(user_id):
+    """Return (total, {status: count}) for a user's active leads"""
+    by_status = dict(
+        LeadStats.objects.filter(user_id=user_id, count__gt=0).values_list('status', 'count')
+    )
+    return sum(by_status.values()), by_status
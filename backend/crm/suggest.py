@@ -0,0 +1,205 @@
+"""
+Prefix typeahead for lead pickers (/api/leads/suggest/).
+
+Every lead owns a handful of LeadSuggestKey rows: its normalized first name,
+last name, full name, email and phone digits. A lookup is one range scan on
+the (user_id, key, lead_id) index joined to crm_lead by primary key, so its
+cost depends on the number of suggestions returned rather than on the book
+size. Each kept row is checked against the lead's other keys so a lead that
+matches on several of them is returned once.
+
+An optional in-process cache (SUGGEST_CACHE_ENABLED) keeps recent answers per
+user. Writes to a user's leads bump that user's generation, which orphans
+their cached entries in O(1); entries also expire after SUGGEST_CACHE_TTL
+seconds so other worker processes converge quickly.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Collate
+
+from .models import Lead, LeadSuggestKey
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 25
+
+# Lead fields that produce keys; saves touching only other fields keep their keys.
+KEYED_LEAD_FIELDS = {'first_name', 'last_name', 'email', 'phone'}
+
+_PHONE_QUERY = re.compile(r'[\d\s().+-]+')
+
+
+def normalize(text):
+    """Lowercase, strip accents and drop everything except letters, digits, spaces and @.+_-"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[^a-z0-9@.+_ -]', '', text.lower())
+    return ' '.join(text.split())
+
+
+def normalize_query(query):
+    query = (query or '').strip()
+    if _PHONE_QUERY.fullmatch(query) and re.search(r'\d', query):
+        return re.sub(r'\D', '', query)
+    return normalize(query)
+
+
+def keys_for(lead):
+    keys = {
+        normalize(lead.first_name),
+        normalize(lead.last_name),
+        normalize(f"{lead.first_name} {lead.last_name}"),
+        normalize(lead.email),
+    }
+    digits = re.sub(r'\D', '', lead.phone or '')
+    if len(digits) >= 3:
+        keys.add(digits)
+    return sorted(key[:255] for key in keys if key)
+
+
+def index_lead(lead, created=False):
+    """Bring the lead's keys in line with its fields, writing only the keys that changed"""
+    keys = set(keys_for(lead))
+    if not created:
+        stored = set(LeadSuggestKey.objects.filter(lead_id=lead.pk).values_list('key', flat=True))
+        if stale := stored - keys:
+            LeadSuggestKey.objects.filter(lead_id=lead.pk, key__in=stale).delete()
+        keys -= stored
+    if keys:
+        LeadSuggestKey.objects.bulk_create([
+            LeadSuggestKey(user_id=lead.user_id, lead_id=lead.pk, key=key) for key in sorted(keys)
+        ])
+
+
+def index_new_leads(leads):
+    """Insert keys for freshly created leads (bulk import), which have none to replace"""
+    # ~5 keys per lead: one executemany skips building and compiling a model instance per key
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}, {}, {}) VALUES (%s, %s, %s)'.format(
+        quote(LeadSuggestKey._meta.db_table), quote('user_id'), quote('lead_id'), quote('key'),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(lead.user_id, lead.pk, key) for lead in leads for key in keys_for(lead)])
+
+
+def index_leads(lead_ids, batch_size=1000):
+    lead_ids = list(lead_ids)
+    for start in range(0, len(lead_ids), batch_size):
+        batch = lead_ids[start:start + batch_size]
+        LeadSuggestKey.objects.filter(lead_id__in=batch).delete()
+        LeadSuggestKey.objects.bulk_create([
+            LeadSuggestKey(user_id=lead.user_id, lead_id=lead.pk, key=key)
+            for lead in Lead.objects.filter(pk__in=batch).only('user_id', 'first_name', 'last_name', 'email', 'phone')
+            for key in keys_for(lead)
+        ], batch_size=batch_size)
+
+
+def _sort_key():
+    if connection.vendor == 'postgresql':
+        # Byte order whatever the database collation, matching the "C" index from migration 0010
+        return Collate(F('key'), 'C')
+    # SQLite compares with BINARY, which is already byte order
+    return F('key')
+
+
+def _prefix_range(prefix):
+    # Every key starting with `prefix` sorts in [prefix, successor) in byte order
+    successor = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return {'sort_key__gte': prefix, 'sort_key__lt': successor}
+
+
+def lookup(user_id, query, limit=DEFAULT_LIMIT):
+    """Return up to `limit` {id, full_name, email} dicts whose keys start with `query`"""
+    prefix = normalize_query(query)
+    if not prefix:
+        return []
+
+    # Take the cache key before querying so a concurrent write can't be cached as fresh
+    cache_key = cache.key(user_id, prefix, limit)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # One lead can match on several keys; keep only its first matching one so the
+    # LIMIT counts leads. The range scan still stops after `limit` kept rows.
+    match = _prefix_range(prefix)
+    earlier_match = (
+        LeadSuggestKey.objects.alias(sort_key=_sort_key())
+        .filter(lead_id=OuterRef('lead_id'), **match)
+        .filter(sort_key__lt=OuterRef('sort_key'))
+    )
+    rows = (
+        LeadSuggestKey.objects.alias(sort_key=_sort_key())
+        .filter(user_id=user_id, lead__is_active=True, **match)
+        .filter(~Exists(earlier_match))
+        .order_by('sort_key', 'lead_id')
+        .values_list('lead_id', 'lead__first_name', 'lead__last_name', 'lead__email')[:limit]
+    )
+    suggestions = [
+        {'id': lead_id, 'full_name': f"{first_name} {last_name}".strip(), 'email': email}
+        for lead_id, first_name, last_name, email in rows
+    ]
+
+    cache.set(cache_key, suggestions)
+    return suggestions
+
+
+class SuggestCache:
+    """Bounded per-process LRU of suggestion lists with per-user generations"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'SUGGEST_CACHE_ENABLED', False)
+
+    def key(self, user_id, prefix, limit):
+        return (user_id, self._generations.get(user_id, 0), prefix, limit)
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+cache = SuggestCache(
+    max_entries=getattr(settings, 'SUGGEST_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'SUGGEST_CACHE_TTL', 30),
+)
@@ -0,0 +1,143 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import aio, dbstats
+from .models import Lead
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class DashboardTest(APITestCase):
+    """Test the async dashboard endpoint"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        now = timezone.now()
+        lead = LeadFactory(user=self.user, status='new')
+        LeadFactory(user=self.user, status='closed')
+        LeadFactory(user=self.user, status='lost', is_active=False)
+        ActivityFactory(lead=lead, activity_type='call', activity_date=now)
+        ActivityFactory(lead=lead, activity_type='call', activity_date=now - timedelta(days=1))
+        ActivityFactory(lead=lead, activity_type='email', activity_date=now - timedelta(days=60))
+        ActivityFactory(lead=LeadFactory(user=UserFactory()), activity_type='note', activity_date=now)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_dashboard(self):
+        """Test counters, windowed activity counts and the recent feed"""
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['leads'], {'total': 2, 'by_status': {'new': 1, 'closed': 1}, 'new': 2})
+        self.assertEqual(response.data['activities'], {'total': 2, 'by_type': {'call': 2}})
+        self.assertEqual(len(response.data['recent_activities']), 3)
+
+        response = self.client.get(reverse('dashboard'), {'days': 90})
+        self.assertEqual(response.data['activities'], {'total': 3, 'by_type': {'call': 2, 'email': 1}})
+        self.assertEqual(self.client.get(reverse('dashboard'), {'days': 'x'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_auth_errors(self):
+        """Test DRF's exception handling still applies to async views"""
+        self.client.credentials()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer nonsense')
+        self.assertEqual(self.client.get(reverse('analytics')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(AIO_MAX_WORKERS=2)
+class ConcurrentQueriesTest(APITransactionTestCase):
+    """Test independent queries overlap under ASGI when no transaction is open"""
+
+    def setUp(self):
+        self.token = aio.serving_asgi.set(True)
+        self.reset_pool()  # sized from AIO_MAX_WORKERS on first use
+
+    def tearDown(self):
+        aio.serving_asgi.reset(self.token)
+        self.reset_pool()
+
+    def reset_pool(self):
+        if aio._pool is not None:
+            aio._pool.shutdown()
+            aio._pool = None
+
+    def query_rounds(self, rounds):
+        """Run `rounds` gathers of two queries; both pool threads take part in every round"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def query():
+            barrier.wait()
+            return User.objects.count()
+
+        for _ in range(rounds):
+            self.assertEqual(async_to_sync(aio.gather)(query, query), [0, 0])
+
+    def test_gather_runs_calls_concurrently(self):
+        """Test both calls are in flight at once (a barrier of two would time out if run in turn)"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait():
+            barrier.wait()
+            return threading.get_ident()
+
+        first, second = async_to_sync(aio.gather)(wait, wait)
+        self.assertNotEqual(first, second)
+
+    @skipIf(connection.settings_dict['CONN_MAX_AGE'] == 0, 'persistent connections only')
+    def test_pool_threads_keep_their_connections(self):
+        """Test with persistent connections a second round of queries on the pool opens no connections"""
+        self.query_rounds(1)
+        dbstats.reset()
+        self.query_rounds(3)
+        self.assertEqual(dbstats.opened(), {})
+
+    def test_pool_threads_close_connections_without_max_age(self):
+        """Test with CONN_MAX_AGE=0 (the ASGI profile) every call closes its connection"""
+        wrapper = type(connections['default'])
+        with mock.patch.dict(connections.settings['default'], CONN_MAX_AGE=0), \
+                mock.patch.object(wrapper, 'close', autospec=True, side_effect=wrapper.close) as close:
+            self.query_rounds(3)
+        self.assertEqual(close.call_count, 6)
+
+    @skipUnless('pool' in connection.settings_dict['OPTIONS'], 'DB_POOL=True on PostgreSQL')
+    def test_pool_threads_return_pooled_connections(self):
+        """Test idle pool threads hold none of DB_POOL's connections"""
+        self.query_rounds(3)
+        stats = connections['default'].pool.get_stats()
+        held_here = 0 if connection.connection is None else 1
+        self.assertEqual(stats['pool_size'] - stats['pool_available'], held_here)
+        self.assertEqual(stats.get('requests_waiting', 0), 0)
+
+    @skipIf(connection.settings_dict['CONN_MAX_AGE'] == 0, 'persistent connections only')
+    def test_in_turn_under_wsgi(self):
+        """Test a WSGI request runs the dashboard's queries on its own thread and connection"""
+        aio.serving_asgi.set(False)
+        user = UserFactory()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            self.client.get(reverse('dashboard'))
+            dbstats.reset()
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(dbstats.opened(), {})
+
+    async def test_dashboard_over_asgi(self):
+        """Test the dashboard through Django's ASGI handler"""
+        user = await User.objects.acreate(username='asgi@example.com')
+        await Lead.objects.acreate(user=user, first_name='A', last_name='B', email='a@example.com', status='qualified')
+        token = RefreshToken.for_user(user).access_token
+        response = await AsyncClient().get(reverse('dashboard'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['leads'], {'total': 1, 'by_status': {'qualified': 1}, 'new': 1})
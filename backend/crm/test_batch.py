@@ -0,0 +1,146 @@
+import threading
+from unittest import mock, skipIf, skipUnless
+
+from django.db import connection, connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import batch
+from .models import Lead
+from .factories import LeadFactory, ActivityFactory
+from .test_profiling import parse_server_timing
+from accounts.factories import UserFactory
+
+DASHBOARD = [
+    {'id': 'me', 'path': '/api/auth/me/'},
+    {'id': 'analytics', 'path': '/api/analytics/'},
+    {'id': 'recent', 'path': '/api/activities/recent/'},
+    {'id': 'leads', 'path': '/api/leads/?page_size=5&status=new'},
+]
+
+
+class BatchTestMixin:
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user, status='new')
+        ActivityFactory(lead=self.lead, user=self.user)
+        LeadFactory(user=UserFactory())
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def batch(self, requests, **options):
+        return self.client.post(reverse('batch'), {'requests': requests, **options}, format='json')
+
+    def assertDashboard(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = {item['id']: item for item in response.data['responses']}
+        self.assertEqual(list(responses), ['me', 'analytics', 'recent', 'leads'])
+        self.assertTrue(all(item['status'] == 200 for item in responses.values()))
+        self.assertTrue(all(item['duration_ms'] >= 0 for item in responses.values()))
+        self.assertEqual(responses['me']['body']['id'], self.user.id)
+        self.assertEqual(responses['analytics']['body']['leads']['total'], 1)
+        self.assertEqual(len(responses['recent']['body']), 1)
+        self.assertEqual([lead['id'] for lead in responses['leads']['body']['results']], [self.lead.id])
+
+
+class BatchTest(BatchTestMixin, APITestCase):
+    """Test the /api/batch/ multiplexing endpoint"""
+
+    def test_dashboard_in_one_round_trip(self):
+        """Test independent GETs return together, each as its own view would answer"""
+        self.assertDashboard(self.batch(DASHBOARD))
+
+    def test_auth_runs_once(self):
+        """Test the JWT user lookup runs once for the batch, not per sub-request"""
+        with self.assertNumQueries(1):
+            response = self.batch([{'path': '/api/auth/me/'}] * 3)
+        self.assertEqual([item['status'] for item in response.data['responses']], [200] * 3)
+
+    def test_writes_run_in_order(self):
+        """Test a write is visible to a later GET and errors stay per sub-request"""
+        # parallel is ignored inside the test transaction, so this also covers the fallback
+        response = self.batch([
+            {'method': 'PATCH', 'path': f'/api/leads/{self.lead.id}/', 'body': {'status': 'qualified'}},
+            {'path': f'/api/leads/{self.lead.id}/'},
+            {'method': 'POST', 'path': '/api/leads/', 'body': {'first_name': 'No email'}},
+            {'path': '/api/leads/999999/'},
+            {'path': '/api/nowhere/'},
+            {'path': '/api/leads/export/'},
+        ], parallel=True)
+        self.assertEqual([item['status'] for item in response.data['responses']], [200, 200, 400, 404, 404, 406])
+        self.assertEqual(response.data['responses'][1]['body']['status'], 'qualified')
+        self.assertIn('email', response.data['responses'][2]['body'])
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).status, 'qualified')
+
+    def test_validation(self):
+        """Test the batch itself must be authenticated and well formed"""
+        self.assertEqual(self.batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([{'path': '/admin/'}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([{'path': '/api/batch/'}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([{'path': '/api/leads/'}] * 21).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.credentials()
+        self.assertEqual(self.batch(DASHBOARD).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ParallelBatchTest(BatchTestMixin, APITransactionTestCase):
+    """Test concurrent GET sub-requests; rows must be committed for pool threads to see them"""
+
+    @override_settings(BATCH_MAX_WORKERS=4)
+    def test_parallel_dashboard(self):
+        """Test GETs dispatched on the thread pool return the same answers"""
+        self.assertDashboard(self.batch(DASHBOARD, parallel=True))
+
+    def run_lead_batches(self, rounds=3):
+        """Run `rounds` parallel batches of two GETs on fresh pool threads"""
+        batch.get_pool().shutdown()
+        batch._pool = None
+        requests = [{'path': f'/api/leads/{self.lead.id}/'}] * 2
+        with override_settings(RESPONSE_CACHE_ENABLED=False, BATCH_MAX_WORKERS=2):
+            for _ in range(rounds):
+                self.assertEqual(self.batch(requests, parallel=True).status_code, status.HTTP_200_OK)
+
+    @skipIf(connection.settings_dict['CONN_MAX_AGE'] == 0, 'persistent connections only')
+    def test_pool_keeps_persistent_connections(self):
+        """Test with persistent connections pool threads reuse theirs for the next batch"""
+        wrapper = type(connections['default'])
+        with mock.patch.object(wrapper, 'close', autospec=True, side_effect=wrapper.close) as close:
+            self.run_lead_batches(3)
+        close.assert_not_called()
+
+    def test_pool_closes_connections_without_max_age(self):
+        """Test with CONN_MAX_AGE=0 pool threads close their connection after every sub-request"""
+        wrapper = type(connections['default'])
+        real_close = wrapper.close
+        closed_by = []
+
+        def close(conn):
+            closed_by.append(threading.current_thread().name)
+            return real_close(conn)
+
+        with mock.patch.dict(connections.settings['default'], CONN_MAX_AGE=0), \
+                mock.patch.object(wrapper, 'close', autospec=True, side_effect=close):
+            self.run_lead_batches(3)
+        self.assertEqual(len([name for name in closed_by if name.startswith('batch')]), 6)
+
+    @skipUnless('pool' in connection.settings_dict['OPTIONS'], 'DB_POOL=True on PostgreSQL')
+    def test_pool_returns_pooled_connections(self):
+        """Test idle pool threads hold none of DB_POOL's connections"""
+        self.run_lead_batches(3)
+        stats = connections['default'].pool.get_stats()
+        held_here = 0 if connection.connection is None else 1
+        self.assertEqual(stats['pool_size'] - stats['pool_available'], held_here)
+
+    @override_settings(SERVER_TIMING_ENABLED=True, RESPONSE_CACHE_ENABLED=False)
+    def test_pool_threads_share_the_request_context(self):
+        """Test queries of parallel sub-requests are counted in the batch's Server-Timing, as in turn"""
+        requests = [{'path': f'/api/leads/{self.lead.id}/'}, {'path': '/api/activities/recent/'}]
+        # Fresh pool threads, whose connections are opened after the SQL timer is installed
+        batch.get_pool().shutdown()
+        batch._pool = None
+        self.batch(requests)  # caches the batch user's authentication
+        in_turn = self.batch(requests)['Server-Timing']
+        parallel = self.batch(requests, parallel=True)['Server-Timing']
+        self.assertIn('queries', in_turn)
+        self.assertEqual(parse_server_timing(parallel)['sql']['desc'], parse_server_timing(in_turn)['sql']['desc'])
@@ -0,0 +1,89 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import cube, stats, suggest
+from .models import Lead
+from .factories import LeadFactory
+from accounts.factories import UserFactory
+
+
+class BulkLeadActionsTest(APITestCase):
+    """Test bulk status update, soft delete and restore"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.leads = [LeadFactory(user=self.user, first_name=f'Bulk{i}', status='new') for i in range(3)]
+        self.deleted = LeadFactory(user=self.user, status='lost', is_active=False)
+        self.foreign = LeadFactory(user=UserFactory())
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def post(self, name, ids, **data):
+        return self.client.post(reverse(name), {'ids': ids, **data}, format='json')
+
+    def outcomes(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(result['id'], result['outcome']) for result in response.data['results']]
+
+    def test_bulk_update_status(self):
+        """Test per-id outcomes, updated_at and counters for a status move"""
+        first, second, third = self.leads
+        Lead.objects.filter(pk=third.pk).update(status='qualified')
+        stats.rebuild([self.user.id])
+        before = Lead.objects.get(pk=first.pk).updated_at
+
+        ids = [first.id, second.id, third.id, self.deleted.id, self.foreign.id, 999999, first.id]
+        response = self.post('lead-bulk-update-status', ids, status='qualified')
+        self.assertEqual(self.outcomes(response), [
+            (first.id, 'updated'), (second.id, 'updated'), (third.id, 'unchanged'),
+            (self.deleted.id, 'not_found'), (self.foreign.id, 'not_found'), (999999, 'not_found'),
+        ])
+        self.assertEqual(response.data['summary'], {'updated': 2, 'unchanged': 1, 'not_found': 3})
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'qualified')
+        self.assertGreater(first.updated_at, before)
+        self.assertEqual(Lead.objects.get(pk=self.foreign.pk).status, self.foreign.status)
+        self.assertEqual(stats.summary(self.user.id), (3, {'qualified': 3}))
+        self.assertEqual(stats.drift([self.user.id]), [])
+
+    def test_bulk_destroy_and_restore(self):
+        """Test soft delete and restore keep counters, suggestions and the cube right"""
+        cube.refresh([self.user.id])
+        ids = [lead.id for lead in self.leads[:2]]
+        response = self.post('lead-bulk-destroy', ids + [self.deleted.id])
+        self.assertEqual(self.outcomes(response), [(ids[0], 'deleted'), (ids[1], 'deleted'),
+                                                   (self.deleted.id, 'not_found')])
+        self.assertEqual(stats.summary(self.user.id), (1, {'new': 1}))
+        self.assertEqual([s['id'] for s in suggest.lookup(self.user.id, 'bulk')], [self.leads[2].id])
+        self.assertEqual(self.client.get(reverse('lead-list')).data['count'], 1)
+        self.assertEqual(cube.refresh([self.user.id]), 1)
+        self.assertEqual(cube.query(self.user.id, [])[0]['leads'], 1)
+
+        response = self.post('lead-bulk-restore', ids + [self.deleted.id, self.leads[2].id])
+        self.assertEqual(response.data['summary'], {'restored': 3, 'already_active': 1})
+        self.assertEqual(stats.summary(self.user.id), (4, {'new': 3, 'lost': 1}))
+        self.assertEqual(stats.drift([self.user.id]), [])
+        self.assertEqual(self.client.get(reverse('lead-list')).data['count'], 4)
+
+    def test_query_count_is_flat(self):
+        """Test a bulk action costs the same number of queries for 1 or 500 ids"""
+        Lead.objects.bulk_create([Lead(user=self.user, first_name='B', last_name='L', email='b@example.com')
+                                  for _ in range(500)])
+        ids = list(Lead.objects.filter(user=self.user, is_active=True).values_list('id', flat=True))
+        self.post('lead-bulk-update-status', ids[:1], status='contacted')  # creates the 'contacted' counter row
+        with self.assertNumQueries(6):
+            self.post('lead-bulk-update-status', ids[1:2], status='contacted')
+        with self.assertNumQueries(6):
+            self.post('lead-bulk-update-status', ids[2:], status='contacted')
+        self.assertEqual(Lead.objects.filter(user=self.user, status='contacted').count(), len(ids))
+
+    def test_validation(self):
+        """Test malformed bodies are rejected"""
+        self.assertEqual(self.post('lead-bulk-destroy', []).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('lead-bulk-destroy', ['x']).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('lead-bulk-update-status', [self.leads[0].id], status='bogus').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('lead-bulk-restore', list(range(1, 5002))).status_code,
+                         status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import cube
+from .models import Lead, LeadCubeCell, LeadCubeChange, LeadCubeWatermark
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+def aware(year, month, day=15):
+    return timezone.make_aware(datetime(year, month, day, 12))
+
+
+class LeadCubeTest(APITestCase):
+    """Test the analytics rollup cube and /api/analytics/cube/"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.url = reverse('analytics-cube')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        # January: two website leads (one closed), one referral lead
+        self.jan_closed = self.lead(aware(2025, 1), source='website', status='closed')
+        self.jan_open = self.lead(aware(2025, 1), source='website', status='new')
+        self.jan_referral = self.lead(aware(2025, 1), source='referral', status='closed')
+        # February: one website lead
+        self.feb = self.lead(aware(2025, 2), source='website', status='new')
+        ActivityFactory(lead=self.jan_closed, activity_type='call')
+        ActivityFactory(lead=self.jan_closed, activity_type='call')
+        ActivityFactory(lead=self.jan_open, activity_type='call')
+        ActivityFactory(lead=self.feb, activity_type='email')
+
+        # Another user's leads never show up
+        LeadFactory(user=UserFactory(), source='website', status='closed')
+
+    def lead(self, created_at, **kwargs):
+        lead = LeadFactory(user=self.user, **kwargs)
+        Lead.objects.filter(pk=lead.pk).update(created_at=created_at)
+        lead.refresh_from_db()
+        return lead
+
+    def age_book(self):
+        """Move every lead and activity change past the watermark overlap so only later edits count"""
+        Lead.objects.filter(user=self.user).update(updated_at=aware(2025, 3))
+        LeadCubeChange.objects.filter(user=self.user).update(changed_at=aware(2025, 3))
+
+    def get_cells(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.data['cells']
+
+    def test_slice_by_source_and_month(self):
+        """Test grouping by source and month with conversion rates"""
+        cells = self.get_cells(dims='month,source')
+        self.assertEqual(cells, [
+            {'month': '2025-01', 'source': 'referral', 'leads': 1, 'closed': 1, 'activities': 0, 'conversion_rate': 1.0},
+            {'month': '2025-01', 'source': 'website', 'leads': 2, 'closed': 1, 'activities': 3, 'conversion_rate': 0.5},
+            {'month': '2025-02', 'source': 'website', 'leads': 1, 'closed': 0, 'activities': 1, 'conversion_rate': 0.0},
+        ])
+
+    def test_drill_down_with_filters(self):
+        """Test filtering to a slice and drilling into activity types"""
+        cells = self.get_cells(dims='source', **{'from': '2025-01', 'to': '2025-01'}, source='website')
+        self.assertEqual(cells, [
+            {'source': 'website', 'leads': 2, 'closed': 1, 'activities': 3, 'conversion_rate': 0.5},
+        ])
+        cells = self.get_cells(dims='activity_type', source='website')
+        self.assertEqual(cells, [
+            {'activity_type': 'call', 'leads': 2, 'closed': 1, 'activities': 3, 'conversion_rate': 0.5},
+            {'activity_type': 'email', 'leads': 1, 'closed': 0, 'activities': 1, 'conversion_rate': 0.0},
+        ])
+
+    def test_incremental_refresh(self):
+        """Test edits, soft deletes, activity changes and hard deletes reach the cube"""
+        self.get_cells()  # first request builds the cube and sets the watermark
+
+        self.jan_open.status = 'closed'
+        self.jan_open.save()
+        self.client.delete(reverse('lead-detail', kwargs={'pk': self.jan_referral.id}))
+        ActivityFactory(lead=self.feb, activity_type='meeting')
+
+        self.assertEqual(self.get_cells(dims='month'), [
+            {'month': '2025-01', 'leads': 2, 'closed': 2, 'activities': 3, 'conversion_rate': 1.0},
+            {'month': '2025-02', 'leads': 1, 'closed': 0, 'activities': 2, 'conversion_rate': 0.0},
+        ])
+
+        self.feb.delete()
+        self.assertEqual([cell['month'] for cell in self.get_cells(dims='month')], ['2025-01'])
+
+    def test_reads_do_not_write(self):
+        """Test an unchanged cube is served without refreshing it"""
+        self.age_book()
+        self.get_cells()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_cells(dims='source')
+        self.assertFalse([query['sql'] for query in queries if not query['sql'].startswith('SELECT')])
+
+        self.feb.status = 'lost'
+        self.feb.save()
+        self.assertTrue(cube.is_stale(self.user.id))
+        self.assertIn('lost', [cell['status'] for cell in self.get_cells(dims='status')])
+        self.age_book()
+        self.assertFalse(cube.is_stale(self.user.id))
+
+    def test_late_commits_are_stale(self):
+        """Test a change stamped just before the watermark (committed after the refresh) is still found"""
+        self.age_book()
+        cube.refresh([self.user.id])
+        refreshed_at = LeadCubeWatermark.objects.get(user=self.user).refreshed_at
+        Lead.objects.filter(pk=self.feb.pk).update(updated_at=refreshed_at - timedelta(minutes=1))
+        self.assertTrue(cube.is_stale(self.user.id))
+
+    def test_activity_writes_leave_the_lead_alone(self):
+        """Test activity writes mark their partition instead of bumping the lead's updated_at"""
+        self.age_book()
+        cube.refresh([self.user.id])
+        activity = ActivityFactory(lead=self.feb, activity_type='meeting')
+        self.assertEqual(Lead.objects.get(pk=self.feb.pk).updated_at, aware(2025, 3))
+        self.assertEqual(cube.refresh([self.user.id]), 1)
+
+        self.age_book()
+        cube.refresh([self.user.id])
+        activity.delete()
+        self.assertEqual(Lead.objects.get(pk=self.feb.pk).updated_at, aware(2025, 3))
+        self.assertEqual([cell['activities'] for cell in self.get_cells(dims='month')], [3, 1])
+
+    def test_overlapping_refreshes(self):
+        """Test cells written twice for a partition (concurrent refreshes) are upserted, not duplicated"""
+        cube.refresh([self.user.id])
+        expected = sorted(LeadCubeCell.objects.filter(user=self.user).values_list('month', 'status', 'leads'))
+        cube._write_cells(Q(user_id=self.user.id), Q(lead__user_id=self.user.id))
+        self.assertEqual(
+            sorted(LeadCubeCell.objects.filter(user=self.user).values_list('month', 'status', 'leads')), expected,
+        )
+
+    def test_refresh_only_touches_changed_partitions(self):
+        """Test a refresh recomputes only the months whose leads changed"""
+        self.age_book()
+        cube.refresh([self.user.id])
+        self.feb.status = 'lost'
+        self.feb.save()
+        self.assertEqual(cube.refresh([self.user.id]), 1)
+
+    def test_invalid_parameters(self):
+        """Test unknown dimensions and malformed months are rejected"""
+        self.assertEqual(self.client.get(self.url, {'dims': 'city'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'from': '2025'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_full_rebuild_command(self):
+        """Test refresh_lead_cube --full matches an incremental build"""
+        cube.refresh([self.user.id])
+        expected = sorted(LeadCubeCell.objects.filter(user=self.user).values_list(
+            'month', 'status', 'source', 'activity_type', 'leads', 'activities'))
+        call_command('refresh_lead_cube', '--full', stdout=StringIO())
+        self.assertEqual(sorted(LeadCubeCell.objects.filter(user=self.user).values_list(
+            'month', 'status', 'source', 'activity_type', 'leads', 'activities')), expected)
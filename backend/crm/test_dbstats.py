@@ -0,0 +1,50 @@
+import threading
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import dbstats
+from accounts.factories import UserFactory
+
+
+class DatabaseStatsTest(APITestCase):
+    """Test connection counting and the system/db endpoint"""
+
+    def authenticate(self, user):
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_new_connection_is_counted(self):
+        """Test a connection opened in another thread increments the counter"""
+        before = dbstats.opened().get('default', 0)
+
+        def connect():
+            connection.ensure_connection()
+            connection.close()
+
+        thread = threading.Thread(target=connect)
+        thread.start()
+        thread.join()
+        self.assertEqual(dbstats.opened()['default'], before + 1)
+
+    def test_snapshot_for_staff(self):
+        """Test staff users see the settings and counters of the answering process"""
+        self.authenticate(UserFactory(is_staff=True))
+        response = self.client.get(reverse('system-db'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        database = response.data['databases']['default']
+        self.assertEqual(database['vendor'], connection.vendor)
+        self.assertEqual(database['conn_max_age'], connection.settings_dict['CONN_MAX_AGE'])
+        pooled = 'pool' in connection.settings_dict['OPTIONS']
+        self.assertEqual(database['pooled'], pooled)
+        self.assertEqual(database['pool'] is not None, pooled)
+        self.assertIn('connections_opened', database)
+        self.assertIn('pid', response.data)
+
+    def test_snapshot_requires_staff(self):
+        """Test non-staff users are refused"""
+        self.authenticate(UserFactory())
+        response = self.client.get(reverse('system-db'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
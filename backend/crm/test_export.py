@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+from unittest import mock
+
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import export
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class ExportTest(APITestCase):
+    """Test streaming CSV / NDJSON exports"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.john = LeadFactory(user=self.user, first_name='John', last_name='Doe', status='new')
+        self.jane = LeadFactory(user=self.user, first_name='Jane', last_name='Roe', status='closed')
+        LeadFactory(user=self.user, is_active=False)
+        LeadFactory(user=UserFactory())
+        self.activities = [ActivityFactory(lead=self.john, user=self.user) for _ in range(3)]
+        refresh = RefreshToken.for_user(self.user)
+        self.authorization = f'Bearer {refresh.access_token}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+        self.url = reverse('lead-export')
+
+    def body(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_lead_csv(self):
+        """Test CSV is the default and covers only the user's active leads"""
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('leads.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.body(response))))
+        self.assertEqual([row['full_name'] for row in rows], ['Jane Roe', 'John Doe'])
+        self.assertEqual(rows[0]['user_id'], str(self.user.id))
+
+    def test_lead_ndjson_with_filters_and_fields(self):
+        """Test NDJSON honours list filters, search and ?fields="""
+        response = self.client.get(self.url, {'format': 'ndjson', 'status': 'new', 'fields': 'id,full_name'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(lines, [{'id': self.john.id, 'full_name': 'John Doe'}])
+
+        response = self.client.get(self.url, {'format': 'ndjson', 'search': 'Jane', 'omit': 'property_interest'})
+        lines = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [self.jane.id])
+        self.assertNotIn('property_interest', lines[0])
+
+    def test_full_text_search(self):
+        """Test ?q= exports every matching lead through a subquery on the search index"""
+        harbors = [LeadFactory(user=self.user, first_name='Harbor', status='new') for _ in range(3)]
+        with self.assertNumQueries(2):  # the user lookup, then the export with its search subquery
+            body = self.body(self.client.get(self.url, {'format': 'ndjson', 'q': 'harbor', 'fields': 'id'}))
+        self.assertEqual({json.loads(line)['id'] for line in body.splitlines()}, {lead.id for lead in harbors})
+        self.assertEqual(self.body(self.client.get(self.url, {'format': 'ndjson', 'q': '!!'})), '')
+
+    @mock.patch.object(export, 'EXPORT_CHUNK_SIZE', 1)
+    async def test_streams_under_asgi(self):
+        """Test under ASGI the export is an async stream sent a chunk of rows at a time"""
+        response = await AsyncClient().get(self.url, {'format': 'ndjson', 'fields': 'id'},
+                                           headers={'Authorization': self.authorization})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual([json.loads(chunk) for chunk in chunks], [{'id': self.jane.id}, {'id': self.john.id}])
+
+    def test_deleted_leads(self):
+        """Test ?is_active=false exports the Deleted Leads view"""
+        rows = list(csv.DictReader(io.StringIO(self.body(self.client.get(self.url, {'is_active': 'false'})))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['is_active'], 'False')
+
+    def test_activity_export(self):
+        """Test a lead's activities export in timeline order"""
+        url = reverse('lead-activities-export', kwargs={'lead_id': self.john.id})
+        rows = list(csv.DictReader(io.StringIO(self.body(self.client.get(url)))))
+        expected = sorted(self.activities, key=lambda activity: (activity.activity_date, activity.created_at, activity.id),
+                          reverse=True)
+        self.assertEqual([int(row['id']) for row in rows], [activity.id for activity in expected])
+        self.assertEqual(set(rows[0]), {'id', 'lead_id', 'user_id', 'activity_type', 'title', 'notes',
+                                        'duration', 'activity_date', 'created_at'})
+
+        response = self.client.get(url, {'format': 'ndjson', 'fields': 'id,title'})
+        self.assertEqual(len(self.body(response).splitlines()), 3)
+
+    def test_errors(self):
+        """Test unknown fields and other users' leads are rejected"""
+        response = self.client.get(self.url, {'fields': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other = LeadFactory(user=UserFactory())
+        response = self.client.get(reverse('lead-activities-export', kwargs={'lead_id': other.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
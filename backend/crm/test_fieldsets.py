@@ -0,0 +1,97 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class SparseFieldsetTest(APITestCase):
+    """Test ?fields= / ?omit= trim both the JSON and the SQL"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user, first_name='John', last_name='Doe', property_interest='Big house')
+        self.activity = ActivityFactory(lead=self.lead, user=self.user, title='Intro call')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def get_with_sql(self, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        # Only the queries against crm tables; the first one is the JWT user lookup
+        sql = [query['sql'] for query in captured.captured_queries if 'FROM "crm_' in query['sql']]
+        return response, sql
+
+    def test_lead_list_fields(self):
+        """Test ?fields= on the lead list narrows output and selected columns"""
+        response, sql = self.get_with_sql(reverse('lead-list'), {'fields': 'id,full_name,status'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'full_name', 'status'})
+        self.assertEqual(response.data['results'][0]['full_name'], 'John Doe')
+        page_sql = sql[-1]
+        self.assertIn('"first_name"', page_sql)
+        self.assertNotIn('"property_interest"', page_sql)
+
+    def test_lead_list_omit(self):
+        """Test ?omit= drops just the named fields"""
+        response, sql = self.get_with_sql(reverse('lead-list'), {'omit': 'property_interest,user_id'})
+        result = response.data['results'][0]
+        self.assertNotIn('property_interest', result)
+        self.assertNotIn('user_id', result)
+        self.assertIn('email', result)
+        self.assertNotIn('"property_interest"', sql[-1])
+
+    def test_lead_list_fields_with_cursor_pagination(self):
+        """Test cursor pages still work when ordering columns are not rendered"""
+        LeadFactory.create_batch(3, user=self.user)
+        response = self.client.get(reverse('lead-list'), {'pagination': 'cursor', 'page_size': 2, 'fields': 'id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([set(result) for result in response.data['results']], [{'id'}, {'id'}])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_lead_retrieve_fields(self):
+        """Test ?fields= on lead retrieve"""
+        response, _ = self.get_with_sql(reverse('lead-detail', kwargs={'pk': self.lead.id}), {'fields': 'email'})
+        self.assertEqual(response.data, {'email': self.lead.email})
+
+    def test_unknown_field(self):
+        """Test unknown field names are rejected"""
+        response = self.client.get(reverse('lead-list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', str(response.data['fields']))
+
+    def test_fields_ignored_on_write(self):
+        """Test ?fields= never turns writable fields read-only on PATCH"""
+        response = self.client.patch(
+            reverse('lead-detail', kwargs={'pk': self.lead.id}) + '?fields=id', {'status': 'contacted'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'contacted')
+
+    def test_activity_fields_skip_joins(self):
+        """Test activity endpoints only join lead/user when nested fields are selected"""
+        timeline = reverse('lead-activities', kwargs={'lead_id': self.lead.id})
+        response, sql = self.get_with_sql(timeline, {'fields': 'id,title,lead_id'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'lead_id'})
+        self.assertEqual(response.data['results'][0]['lead_id'], self.lead.id)
+        self.assertNotIn('JOIN', sql[-1])
+        self.assertNotIn('"notes"', sql[-1])
+
+        response, sql = self.get_with_sql(timeline, {'fields': 'id,lead'})
+        self.assertEqual(response.data['results'][0]['lead']['full_name'], 'John Doe')
+        self.assertIn('JOIN "crm_lead"', sql[-1])
+        self.assertNotIn('auth_user', sql[-1])
+
+        detail = reverse('activity-detail', kwargs={'lead_id': self.lead.id, 'pk': self.activity.id})
+        response, _ = self.get_with_sql(detail, {'omit': 'lead,user,notes'})
+        self.assertNotIn('user', response.data)
+        self.assertEqual(response.data['title'], 'Intro call')
+
+    def test_recent_activities_fields(self):
+        """Test ?fields= on the recent activity feed"""
+        response, sql = self.get_with_sql(reverse('recent-activities'), {'fields': 'id,title,activity_date'})
+        self.assertEqual(set(response.data[0]), {'id', 'title', 'activity_date'})
+        self.assertNotIn('"notes"', sql[-1])
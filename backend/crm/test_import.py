@@ -0,0 +1,192 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import importer, search, stats, suggest
+from .models import Lead
+from .factories import LeadFactory
+from accounts.factories import UserFactory
+
+CSV_FILE = (
+    "first_name,last_name,email,phone,status,source,budget_min,property_interest\n"
+    "John,Doe,john@example.com,555-0100,new,website,250000,Harbor view condo\n"
+    "Jane,Roe,not-an-email,,contacted,,,\n"
+    "Ann,Lee,ann@example.com,,closed,referral,,\n"
+    "Bob,,bob@example.com,,bogus,,,\n"
+)
+
+
+class LeadImportTest(APITestCase):
+    """Test bulk lead import"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('lead-import')
+
+    def upload(self, name, content, **data):
+        return self.client.post(self.url, {'file': SimpleUploadedFile(name, content.encode()), **data})
+
+    def test_csv_import_reports_rows(self):
+        """Test valid rows are created and invalid ones reported by row number"""
+        response = self.upload('leads.csv', CSV_FILE, batch_size=1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['failed']), (4, 2, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertIn('email', response.data['errors'][0]['errors'])
+        self.assertEqual(set(response.data['errors'][1]['errors']), {'last_name', 'status'})
+
+        john = Lead.objects.get(user=self.user, email='john@example.com')
+        self.assertEqual((john.budget_min, john.budget_max, john.phone), (250000, None, '555-0100'))
+        self.assertEqual(Lead.objects.get(email='ann@example.com').source, 'referral')
+
+    def test_derived_data_updated(self):
+        """Test imported leads are searchable, suggestible and counted"""
+        LeadFactory(user=self.user, status='new')
+        self.upload('leads.csv', CSV_FILE)
+        self.assertEqual(stats.summary(self.user.id), (3, {'new': 2, 'closed': 1}))
+        self.assertEqual(stats.drift([self.user.id]), [])
+        john = Lead.objects.get(email='john@example.com')
+        self.assertEqual([hit.lead_id for hit in search.search(Lead.objects.filter(user=self.user), 'harbor')],
+                         [john.id])
+        self.assertEqual([s['id'] for s in suggest.lookup(self.user.id, '555-01')], [john.id])
+
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.data['leads']['total'], 3)
+
+    def test_json_and_ndjson(self):
+        """Test JSON arrays and NDJSON files, with the format taken from the name or field"""
+        rows = [{'first_name': 'A', 'last_name': 'One', 'email': 'a@example.com', 'budget_min': 10},
+                {'first_name': 'B', 'last_name': 'Two', 'email': 'b@example.com', 'budget_min': None}]
+        response = self.upload('leads.json', json.dumps(rows))
+        self.assertEqual(response.data['created'], 2)
+        response = self.upload('export.txt', '\n'.join(map(json.dumps, rows)) + '\n', format='ndjson')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Lead.objects.filter(user=self.user, budget_min=10).count(), 2)
+
+    def test_dry_run_and_bad_requests(self):
+        """Test dry runs insert nothing and unusable uploads are rejected"""
+        response = self.upload('leads.csv', CSV_FILE, dry_run='true')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((response.data['created'], response.data['failed']), (0, 2))
+        self.assertFalse(Lead.objects.exists())
+
+        self.assertEqual(self.upload('leads.xlsx', 'x').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload('leads.csv', CSV_FILE, batch_size='many').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(self.url, {}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_broken_file_keeps_earlier_batches(self):
+        """Test a file that stops parsing keeps committed batches and reports where it stopped"""
+        content = '[{"first_name": "A", "last_name": "One", "email": "a@example.com"}, {"first_name": '
+        response = self.upload('leads.json', content, batch_size=1)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], [{'row': 2, 'errors': {'file': ['Invalid JSON: Expecting value.']}}])
+
+    def test_read_json_across_chunks(self):
+        """Test the streaming JSON reader with elements split over tiny reads"""
+        values = [{'a': 'x' * 20, 'b': [1, 2]}, 12345, 'text', {}, None]
+        stream = io.BytesIO(json.dumps(values, indent=2).encode())
+        self.assertEqual(list(importer.read_json(stream, read_size=3)), values)
+        self.assertEqual(list(importer.read_json(io.BytesIO(b' [ ] '))), [])
+        with self.assertRaises(importer.ImportFormatError):
+            list(importer.read_json(io.BytesIO(b'{"first_name": "A"}')))
+
+    def test_command(self):
+        """Test the import_leads management command"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(CSV_FILE)
+        self.addCleanup(os.remove, handle.name)
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_leads', handle.name, user=self.user.username, stdout=out)
+        self.assertIn('4 row(s): 2 created, 2 failed', out.getvalue())
+        self.assertEqual(Lead.objects.filter(user=self.user).count(), 2)
+
+
+class LeadSyncTest(APITestCase):
+    """Test idempotent feed sync on (source, external_id)"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('lead-sync')
+        self.feed = [
+            {'external_id': f'z-{i}', 'source': 'zillow', 'first_name': f'Lead{i}', 'last_name': 'Feed',
+             'email': f'lead{i}@example.com', 'status': 'new'}
+            for i in range(3)
+        ]
+
+    def sync(self, rows, **params):
+        url = self.url + ('?' + '&'.join(f'{key}={value}' for key, value in params.items()) if params else '')
+        return self.client.post(url, rows, format='json')
+
+    def test_resend_is_idempotent(self):
+        """Test re-sending a feed creates no duplicates and writes nothing"""
+        response = self.sync(self.feed)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+
+        # One SELECT for the stored hashes; no writes at all
+        with self.assertNumQueries(1):
+            result = importer.import_rows(self.user, self.feed, sync=True)
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 0, 3))
+        self.assertEqual(Lead.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(stats.summary(self.user.id), (3, {'new': 3}))
+
+    def test_changed_rows_update(self):
+        """Test only changed rows are written, keeping hand-set fields and soft deletes"""
+        self.sync(self.feed)
+        first, second = (Lead.objects.get(external_id=f'z-{i}') for i in range(2))
+        Lead.objects.filter(pk=first.pk).update(phone='555-0199')
+        second.is_active = False
+        second.save(update_fields=['is_active', 'updated_at'])
+        unchanged_at = Lead.objects.get(external_id='z-2').updated_at
+
+        self.feed[0]['status'] = 'contacted'
+        self.feed[1]['last_name'] = 'Renamed'
+        response = self.sync(self.feed)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['updated'], response.data['unchanged']), (2, 1))
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.phone), ('contacted', '555-0199'))
+        second.refresh_from_db()
+        self.assertEqual((second.last_name, second.is_active), ('Renamed', False))
+        self.assertEqual(Lead.objects.get(external_id='z-2').updated_at, unchanged_at)
+        self.assertEqual(stats.summary(self.user.id), (2, {'new': 1, 'contacted': 1}))
+        self.assertEqual(stats.drift([self.user.id]), [])
+        self.assertEqual([s['id'] for s in suggest.lookup(self.user.id, 'lead1')], [])  # soft-deleted
+
+    def test_key_is_per_user_and_source(self):
+        """Test the same external id from another source or user is a different lead"""
+        self.sync(self.feed[:1])
+        self.sync([{**self.feed[0], 'source': 'website'}])
+        other = UserFactory()
+        importer.import_rows(other, self.feed[:1], sync=True)
+        self.assertEqual(Lead.objects.filter(external_id='z-0').count(), 3)
+
+    def test_row_errors_and_duplicates(self):
+        """Test rows without a key are rejected and in-feed duplicates collapse"""
+        rows = [self.feed[0], {**self.feed[0], 'first_name': 'Latest'}, {'first_name': 'No', 'last_name': 'Key',
+                                                                        'email': 'nokey@example.com'}]
+        response = self.sync(rows, batch_size=10)
+        self.assertEqual((response.data['created'], response.data['unchanged'], response.data['failed']), (1, 0, 1))
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'source', 'external_id'})
+        self.assertEqual(Lead.objects.get(external_id='z-0').first_name, 'Latest')
+
+    def test_upload_sync(self):
+        """Test the sync endpoint also takes the import's file uploads"""
+        content = '\n'.join(map(json.dumps, self.feed))
+        upload = lambda: SimpleUploadedFile('feed.ndjson', content.encode())  # noqa: E731
+        self.assertEqual(self.client.post(self.url, {'file': upload()}).data['created'], 3)
+        self.assertEqual(self.client.post(self.url, {'file': upload()}).data['unchanged'], 3)
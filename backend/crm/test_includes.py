@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class LeadIncludeTest(APITestCase):
+    """Test ?include= sections on lead retrieve"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user)
+        now = timezone.now()
+        self.activities = [
+            ActivityFactory(lead=self.lead, user=self.user, activity_type='call' if i % 3 else 'email',
+                            duration=10 if i % 3 else None, activity_date=now - timedelta(hours=i))
+            for i in range(12)
+        ]
+        ActivityFactory(lead=LeadFactory(user=self.user), user=self.user)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('lead-detail', kwargs={'pk': self.lead.id})
+
+    def test_embedded_activities_match_timeline(self):
+        """Test the embedded page equals the cursor timeline's first page and links to its second"""
+        response = self.client.get(self.url, {'include': 'activities'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.lead.id)
+        self.assertNotIn('stats', response.data)
+
+        timeline_url = reverse('lead-activities', kwargs={'lead_id': self.lead.id})
+        timeline = self.client.get(timeline_url, {'pagination': 'cursor'}).data
+        embedded = response.data['activities']
+        self.assertEqual(embedded['results'], timeline['results'])
+        self.assertEqual(embedded['results'][0]['lead']['id'], self.lead.id)
+
+        second = self.client.get(embedded['next']).data
+        self.assertEqual([a['id'] for a in second['results']], [a.id for a in self.activities[10:]])
+        self.assertIsNone(second['next'])
+
+    def test_stats(self):
+        """Test activity aggregates"""
+        stats = self.client.get(self.url, {'include': 'activities,stats'}).data['stats']
+        self.assertEqual(stats['total'], 12)
+        self.assertEqual(stats['by_type'], {'call': 8, 'email': 4})
+        self.assertEqual(stats['total_duration'], 80)
+        self.assertEqual(stats['last_activity_at'], self.activities[0].activity_date)
+
+    def test_short_timeline_and_errors(self):
+        """Test a lead without activities, unknown includes and other users' leads"""
+        empty = LeadFactory(user=self.user)
+        response = self.client.get(reverse('lead-detail', kwargs={'pk': empty.id}), {'include': 'activities,stats'})
+        self.assertEqual(response.data['activities'], {'next': None, 'previous': None, 'results': []})
+        self.assertEqual(response.data['stats'],
+                         {'total': 0, 'by_type': {}, 'total_duration': 0, 'last_activity_at': None})
+
+        self.assertEqual(self.client.get(self.url, {'include': 'notes'}).status_code, status.HTTP_400_BAD_REQUEST)
+        other = LeadFactory(user=UserFactory())
+        response = self.client.get(reverse('lead-detail', kwargs={'pk': other.id}), {'include': 'activities'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import metrics
+from .factories import LeadFactory
+from accounts.factories import UserFactory
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MiddlewareTest(APITestCase):
+    """Test per-route request metrics"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        LeadFactory(user=self.user, status='new')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_request_is_recorded_under_its_route(self):
+        """Test latency, status, size and SQL are labelled with the URL name"""
+        before = {
+            'latency': sample('crm_http_request_duration_seconds_count', route='lead-list', method='GET'),
+            'ok': sample('crm_http_requests_total', route='lead-list', method='GET', status='200'),
+            'size': sample('crm_http_response_size_bytes_sum', route='lead-list'),
+            'queries': sample('crm_http_request_db_queries_sum', route='lead-list'),
+        }
+        response = self.client.get(reverse('lead-list'), {'page_size': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(sample('crm_http_request_duration_seconds_count', route='lead-list', method='GET'),
+                         before['latency'] + 1)
+        self.assertEqual(sample('crm_http_requests_total', route='lead-list', method='GET', status='200'),
+                         before['ok'] + 1)
+        self.assertEqual(sample('crm_http_response_size_bytes_sum', route='lead-list'),
+                         before['size'] + len(response.content))
+        self.assertGreater(sample('crm_http_request_db_queries_sum', route='lead-list'), before['queries'])
+
+    def test_unresolved_paths_share_a_label(self):
+        """Test 404s for unknown paths don't create a label per path"""
+        before = sample('crm_http_requests_total', route='unmatched', method='GET', status='404')
+        self.client.get('/no-such-page/1')
+        self.client.get('/no-such-page/2')
+        self.assertEqual(sample('crm_http_requests_total', route='unmatched', method='GET', status='404'), before + 2)
+
+    def test_response_cache_hits_and_misses(self):
+        """Test the X-Cache outcome is counted per route"""
+        before = {result: sample('crm_response_cache_requests_total', route='analytics', result=result)
+                  for result in ('hit', 'miss')}
+        self.client.get(reverse('analytics'))
+        self.client.get(reverse('analytics'))
+        self.assertEqual(sample('crm_response_cache_requests_total', route='analytics', result='miss'),
+                         before['miss'] + 1)
+        self.assertEqual(sample('crm_response_cache_requests_total', route='analytics', result='hit'),
+                         before['hit'] + 1)
+
+
+class EndpointTest(APITestCase):
+    """Test GET /metrics"""
+
+    @override_settings(DEBUG=True, METRICS_TOKEN='')
+    def test_open_with_debug(self):
+        """Test the text exposition is served without a token under DEBUG"""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'# TYPE crm_http_request_duration_seconds histogram', response.content)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='')
+    def test_hidden_without_token_in_production(self):
+        """Test the endpoint doesn't exist in production until a token is configured"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(DEBUG=True, METRICS_ENABLED=False)
+    def test_hidden_when_disabled(self):
+        """Test the endpoint doesn't exist unless METRICS_ENABLED, even under DEBUG"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='scrape-secret')
+    def test_token(self):
+        """Test scrapers must send the bearer token"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+
+
+WORKER = """
+from prometheus_client import Counter
+Counter('crm_http_requests', '', ['route', 'method', 'status']).labels('login', 'POST', '200').inc({count})
+"""
+
+
+class MultiprocessTest(APITestCase):
+    """Test workers sharing PROMETHEUS_MULTIPROC_DIR are aggregated"""
+
+    def test_workers_are_summed(self):
+        """Test the exposition adds up counters written by separate processes"""
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+            for count in (2, 3):
+                subprocess.run([sys.executable, '-c', WORKER.format(count=count)], env=env, check=True)
+            os.environ['PROMETHEUS_MULTIPROC_DIR'] = directory
+            try:
+                body, _ = metrics.exposition()
+            finally:
+                del os.environ['PROMETHEUS_MULTIPROC_DIR']
+        self.assertIn(b'crm_http_requests_total{method="POST",route="login",status="200"} 5.0', body)
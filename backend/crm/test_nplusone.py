@@ -0,0 +1,101 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import nplusone
+from .models import Activity
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class NormalizeTest(TestCase):
+    """Test query shapes"""
+
+    def test_literals_and_in_lists_fold(self):
+        """Test IN lists of any length and inline literals share a shape"""
+        self.assertEqual(
+            nplusone.normalize('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'x\' LIMIT 21'),
+            nplusone.normalize('SELECT  *  FROM t WHERE id IN (%s) AND name = \'y\' LIMIT 5'),
+        )
+
+
+class DetectTest(TestCase):
+    """Test N+1 detection in a detect() block"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        for _ in range(3):
+            ActivityFactory(lead=LeadFactory(user=self.user, status='new'), user=self.user)
+
+    def test_per_row_lookup_raises_with_stack(self):
+        """Test following a foreign key per row is reported with the line that did it"""
+        with self.assertRaises(nplusone.NPlusOneError) as raised:
+            with nplusone.detect('activities', action='raise'):
+                [activity.lead.first_name for activity in Activity.objects.all()]
+        self.assertIn('3 executions of `SELECT', raised.exception.args[0])
+        self.assertIn('crm_lead', raised.exception.args[0])
+        self.assertIn('test_nplusone.py', raised.exception.args[0])
+
+    def test_select_related_passes(self):
+        """Test the same loop over a JOIN is not reported"""
+        with nplusone.detect(action='raise') as scope:
+            [activity.lead.first_name for activity in Activity.objects.select_related('lead')]
+            [str(activity) for activity in Activity.objects.all()]
+        self.assertEqual(scope.findings, {})
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=4)
+    def test_below_threshold(self):
+        """Test fewer repeats than N_PLUS_ONE_THRESHOLD are tolerated"""
+        with nplusone.detect(action='raise') as scope:
+            [activity.lead.first_name for activity in Activity.objects.all()]
+        self.assertEqual(len(scope.shapes), 2)
+
+    def test_log_mode(self):
+        """Test 'log' warns instead of raising"""
+        with self.assertLogs('crm.nplusone', level='WARNING'):
+            with nplusone.detect(action='log'):
+                [activity.lead.first_name for activity in Activity.objects.all()]
+
+
+class MiddlewareTest(APITestCase):
+    """Test requests run inside a detection scope (the suite uses N_PLUS_ONE_DETECTION=raise)"""
+
+    def test_batch_sub_requests_are_separate(self):
+        """Test the same lookup in several batch sub-requests is not one N+1"""
+        user = UserFactory()
+        leads = [LeadFactory(user=user) for _ in range(3)]
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'method': 'GET', 'path': f'/api/leads/{lead.id}/'} for lead in leads
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_admin_activity_changelist(self):
+        """Test the activity admin list doesn't query per row"""
+        admin = UserFactory(is_staff=True, is_superuser=True)
+        for _ in range(3):
+            ActivityFactory(lead=LeadFactory(user=admin), user=admin)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:crm_activity_changelist'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_async_chain(self):
+        """Test under ASGI the middleware stays async and still checks the request"""
+        def list_activity_leads():
+            user = UserFactory()
+            for _ in range(3):
+                ActivityFactory(lead=LeadFactory(user=user, status='new'), user=user)
+            return [activity.lead.first_name for activity in Activity.objects.all()]
+
+        async def view(request):
+            await sync_to_async(list_activity_leads)()
+            return HttpResponse()
+
+        middleware = nplusone.NPlusOneMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertRaises(nplusone.NPlusOneError):
+            await middleware(RequestFactory().get('/activities/'))
@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Lead, Activity
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class LeadCursorPaginationTest(APITestCase):
+    """Test opt-in keyset pagination on the lead list"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.other_user = UserFactory()
+        self.leads = [LeadFactory(user=self.user) for _ in range(25)]
+        LeadFactory(user=self.other_user)
+
+        # Give several leads the same created_at so the id tie-breaker matters
+        now = timezone.now()
+        Lead.objects.filter(id__in=[lead.id for lead in self.leads[:12]]).update(created_at=now)
+        Lead.objects.filter(id__in=[lead.id for lead in self.leads[12:]]).update(
+            created_at=now - timedelta(days=1)
+        )
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.leads_url = reverse('lead-list')
+
+    def expected_ids(self):
+        return list(
+            Lead.objects.filter(user=self.user, is_active=True)
+            .order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def test_walk_forward_visits_every_lead_once_in_order(self):
+        """Test following next links returns each lead exactly once"""
+        seen = []
+        response = self.client.get(self.leads_url, {'pagination': 'cursor', 'page_size': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        while True:
+            seen.extend(lead['id'] for lead in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(seen, self.expected_ids())
+
+    def test_previous_link_returns_prior_page(self):
+        """Test previous link walks back to the same rows"""
+        first = self.client.get(self.leads_url, {'pagination': 'cursor'})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertEqual(
+            [lead['id'] for lead in back.data['results']],
+            [lead['id'] for lead in first.data['results']],
+        )
+        self.assertIsNone(back.data['previous'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_cursor_respects_filters(self):
+        """Test cursor pages keep the status filter applied"""
+        response = self.client.get(self.leads_url, {'pagination': 'cursor', 'status': 'new'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(lead['status'] == 'new' for lead in response.data['results']))
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor returns 404"""
+        response = self.client.get(self.leads_url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_is_default(self):
+        """Test the list keeps page-number pagination unless opted in"""
+        response = self.client.get(self.leads_url)
+
+        self.assertEqual(response.data['count'], 25)
+
+
+class ActivityCursorPaginationTest(APITestCase):
+    """Test opt-in keyset pagination on a lead's activity timeline"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user)
+        when = timezone.now()
+        for i in range(15):
+            # Pairs of activities share an activity_date
+            ActivityFactory(lead=self.lead, user=self.user, activity_date=when - timedelta(hours=i // 2))
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('lead-activities', kwargs={'lead_id': self.lead.id})
+
+    def test_walk_timeline(self):
+        """Test following next links returns the full timeline in order"""
+        seen = []
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 4})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(activity['id'] for activity in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(
+            Activity.objects.filter(lead=self.lead)
+            .order_by('-activity_date', '-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
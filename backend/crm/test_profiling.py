@@ -0,0 +1,62 @@
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ServerTimingTest(APITestCase):
+    """Test the opt-in request profiling middleware"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        lead = LeadFactory(user=self.user)
+        ActivityFactory(lead=lead, user=self.user)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    @override_settings(SERVER_TIMING_ENABLED=True)
+    def test_phases_in_header_and_log(self):
+        """Test the lead list reports every phase, the query count and a matching log line"""
+        with self.assertLogs('crm.profiling', level='INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('lead-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(set(metrics), {'auth', 'orm', 'sql', 'serialize', 'render', 'total'})
+        self.assertEqual(metrics['sql']['desc'], f'"{len(queries)} queries"')
+        self.assertGreaterEqual(float(metrics['total']['dur']), float(metrics['render']['dur']))
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['path'], reverse('lead-list'))
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], len(queries))
+
+    @override_settings(SERVER_TIMING_ENABLED=True)
+    def test_async_view(self):
+        """Test queries run by an async view's helpers are counted"""
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertIn('sql', metrics)
+        self.assertIn('serialize', metrics)
+
+    def test_disabled_by_default(self):
+        """Test no header is added when SERVER_TIMING_ENABLED is off"""
+        response = self.client.get(reverse('lead-list'))
+        self.assertNotIn('Server-Timing', response)
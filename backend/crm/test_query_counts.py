@@ -0,0 +1,137 @@
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import stats
+from .models import Lead, Activity
+from accounts.authentication import CachedJWTAuthentication
+from accounts.factories import UserFactory
+
+# Book sizes every endpoint is checked at; the query count must not change between them.
+BOOK_SIZES = (1, 100, 10_000)
+
+
+class EndpointQueryCountTest(APITestCase):
+    """Test every endpoint runs a fixed number of queries regardless of page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = {}
+        for size in BOOK_SIZES:
+            user = UserFactory()
+            # bulk_create skips signals and factories, so 10k rows stay quick to seed
+            leads = Lead.objects.bulk_create([
+                Lead(user=user, first_name=f'Lead{i}', last_name='Count', email=f'lead{i}@example.com')
+                for i in range(size)
+            ])
+            timeline_lead = leads[0]
+            now = timezone.now()
+            Activity.objects.bulk_create([
+                Activity(lead=timeline_lead, user=user, activity_type='call', title=f'Call {i}', activity_date=now)
+                for i in range(size)
+            ])
+            deleted_lead = Lead.objects.create(
+                user=user, first_name='Gone', last_name='Lead', email='gone@example.com', is_active=False
+            )
+            cls.books[size] = (user, timeline_lead, deleted_lead)
+        # bulk_create bypasses the LeadStats receivers, so start from exact counters
+        stats.rebuild()
+
+    def authenticate(self, user, warm=True):
+        """Send `user`'s token; `warm` resolves it once first, as any earlier request would"""
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        if warm:
+            authentication = CachedJWTAuthentication()
+            authentication.get_user(authentication.get_validated_token(token.encode()))
+
+    def assertQueryCount(self, expected, method, url, data=None, rows=None):
+        """Issue the request for every book size and require `expected` queries each time"""
+        for size in BOOK_SIZES:
+            user, timeline_lead, deleted_lead = self.books[size]
+            with self.subTest(size=size):
+                self.authenticate(user)
+                target = url(timeline_lead, deleted_lead) if callable(url) else url
+                params = dict(data or {}, page_size=size) if rows else data
+                with self.assertNumQueries(expected):
+                    response = getattr(self.client, method)(target, params)
+                self.assertLess(response.status_code, 400, response.content)
+                if rows:
+                    self.assertEqual(len(response.data['results']), size)
+
+    # The token and user are already cached (see authenticate), so no count below includes
+    # an auth query; test_cold_auth_cache covers the one lookup a cold cache adds.
+
+    def test_cold_auth_cache(self):
+        """Test a cold auth cache adds the user lookup to the first request only"""
+        user, lead, _ = self.books[BOOK_SIZES[0]]
+        self.authenticate(user, warm=False)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('lead-detail', kwargs={'pk': lead.id}))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('recent-activities'))
+
+    def test_lead_list(self):
+        """Test lead list: count, page"""
+        self.assertQueryCount(2, 'get', reverse('lead-list'), rows=True)
+
+    def test_lead_list_cursor(self):
+        """Test cursor-paginated lead list: page"""
+        for size in BOOK_SIZES:
+            user = self.books[size][0]
+            with self.subTest(size=size):
+                self.authenticate(user)
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse('lead-list'), {'pagination': 'cursor', 'page_size': 1000})
+                self.assertEqual(len(response.data['results']), min(size, 1000))
+
+    def test_lead_retrieve(self):
+        """Test lead retrieve: lead"""
+        self.assertQueryCount(1, 'get', lambda lead, deleted: reverse('lead-detail', kwargs={'pk': lead.id}))
+
+    def test_lead_retrieve_with_includes(self):
+        """Test lead retrieve with ?include=activities,stats: lead, activity page, aggregates"""
+        self.assertQueryCount(
+            3, 'get', lambda lead, deleted: reverse('lead-detail', kwargs={'pk': lead.id}),
+            {'include': 'activities,stats'},
+        )
+
+    def test_lead_restore(self):
+        """Test lead restore: lead, locked stats key, update, stats counter"""
+        self.assertQueryCount(4, 'post', lambda lead, deleted: reverse('lead-restore', kwargs={'pk': deleted.id}))
+
+    def test_lead_destroy(self):
+        """Test soft delete: lead, locked stats key, update, stats counter"""
+        self.assertQueryCount(4, 'delete', lambda lead, deleted: reverse('lead-detail', kwargs={'pk': lead.id}))
+
+    def test_activity_timeline(self):
+        """Test activity timeline: lead, count, page"""
+        self.assertQueryCount(
+            3, 'get', lambda lead, deleted: reverse('lead-activities', kwargs={'lead_id': lead.id}), rows=True
+        )
+
+    def test_activity_detail(self):
+        """Test activity retrieve: activity joined to lead and user"""
+        for size in BOOK_SIZES:
+            user, lead, _ = self.books[size]
+            activity = Activity.objects.filter(lead=lead).first()
+            with self.subTest(size=size):
+                self.authenticate(user)
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        reverse('activity-detail', kwargs={'lead_id': lead.id, 'pk': activity.id})
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_recent_activities(self):
+        """Test recent activities: activities joined to lead and user"""
+        self.assertQueryCount(1, 'get', reverse('recent-activities'))
+
+    def test_analytics(self):
+        """Test analytics: stats counters, recent activities"""
+        self.assertQueryCount(2, 'get', reverse('analytics'))
+
+    def test_dashboard(self):
+        """Test dashboard: stats counters, recent activities, activity counts, new leads"""
+        self.assertQueryCount(4, 'get', reverse('dashboard'))
@@ -0,0 +1,113 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+# SQLite reports a full table walk as "SCAN <table>"; index walks say "SEARCH".
+SQLITE_TABLE_SCAN = re.compile(r'^SCAN (crm_\w+|auth_user)\b')
+
+
+def explain(sql):
+    """Return the query plan for an already-interpolated SQL statement"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Make the planner prove an index path exists instead of picking a
+            # sequential scan just because the test tables are tiny.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def sequential_scans(plan):
+    if connection.vendor == 'postgresql':
+        return [line for line in plan if 'Seq Scan' in line]
+    return [line for line in plan if SQLITE_TABLE_SCAN.match(line)]
+
+
+class EndpointQueryPlanTest(APITestCase):
+    """Capture EXPLAIN output for every query an endpoint runs and reject table scans"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user, first_name='John')
+        self.deleted_lead = LeadFactory(user=self.user, is_active=False)
+        for lead in LeadFactory.create_batch(5, user=self.user):
+            ActivityFactory(lead=lead, user=self.user)
+        self.activity = ActivityFactory(lead=self.lead, user=self.user)
+
+        # Another user's book so the planner has rows it must skip
+        other_user = UserFactory()
+        for lead in LeadFactory.create_batch(5, user=other_user):
+            ActivityFactory(lead=lead, user=other_user)
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def assertEndpointUsesIndexes(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, response.content)
+
+        for query in captured.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(sql)
+            self.assertEqual(
+                sequential_scans(plan), [],
+                f'{method.upper()} {url} ran a sequential scan:\n{sql}\n' + '\n'.join(plan),
+            )
+
+    def test_lead_list(self):
+        """Test the default lead list, its filters and cursor mode use indexes"""
+        url = reverse('lead-list')
+        self.assertEndpointUsesIndexes('get', url)
+        self.assertEndpointUsesIndexes('get', url, {'status': 'new'})
+        self.assertEndpointUsesIndexes('get', url, {'is_active': 'false'})
+        self.assertEndpointUsesIndexes('get', url, {'search': 'John'})
+        self.assertEndpointUsesIndexes('get', url, {'pagination': 'cursor', 'page_size': 2})
+
+    def test_lead_detail_and_restore(self):
+        """Test lead retrieve and restore use indexes"""
+        self.assertEndpointUsesIndexes('get', reverse('lead-detail', kwargs={'pk': self.lead.id}))
+        self.assertEndpointUsesIndexes('post', reverse('lead-restore', kwargs={'pk': self.deleted_lead.id}))
+
+    def test_activity_endpoints(self):
+        """Test activity timeline, detail and recent feed use indexes"""
+        timeline = reverse('lead-activities', kwargs={'lead_id': self.lead.id})
+        self.assertEndpointUsesIndexes('get', timeline)
+        self.assertEndpointUsesIndexes('get', timeline, {'pagination': 'cursor'})
+        self.assertEndpointUsesIndexes(
+            'get', reverse('activity-detail', kwargs={'lead_id': self.lead.id, 'pk': self.activity.id})
+        )
+        self.assertEndpointUsesIndexes('get', reverse('recent-activities'))
+
+    def test_analytics(self):
+        """Test analytics uses indexes"""
+        self.assertEndpointUsesIndexes('get', reverse('analytics'))
+
+    def test_login_and_register(self):
+        """Test email login and the registration duplicate check use the LOWER(email) index"""
+        self.assertEndpointUsesIndexes('post', reverse('login'), {'email': self.user.email.upper(),
+                                                                  'password': 'testpass123'})
+        self.assertEndpointUsesIndexes('post', reverse('register'), {'email': 'New@Example.com',
+                                                                     'password': 'newpass123!'})
+
+    def test_lead_suggest(self):
+        """Test typeahead uses the prefix key index"""
+        self.assertEndpointUsesIndexes('get', reverse('lead-suggest'), {'q': 'jo'})
+
+    def test_analytics_cube(self):
+        """Test the cube build, incremental refresh and slicing use indexes"""
+        url = reverse('analytics-cube')
+        self.assertEndpointUsesIndexes('get', url)  # first request builds the user's cube
+        self.assertEndpointUsesIndexes('get', url, {'dims': 'source,month', 'status': 'new'})
+        self.assertEndpointUsesIndexes('get', url, {'dims': 'activity_type'})
@@ -0,0 +1,54 @@
+import threading
+
+from django.db import connection
+from django.test import TestCase
+from . import metrics, nplusone, profiling, queryobserver
+
+
+class QueryObserverTest(TestCase):
+    """Test the shared SQL execute wrapper"""
+
+    def setUp(self):
+        self.calls = []
+        self.addCleanup(queryobserver.unsubscribe, self.listen)
+
+    def listen(self, sql, params, many, seconds):
+        self.calls.append((sql, seconds))
+
+    def test_one_wrapper_for_every_consumer(self):
+        """Test profiling, metrics and N+1 detection share one wrapper per connection"""
+        profiling.install()
+        queryobserver.subscribe(metrics._count_sql)
+        with nplusone.detect(action='off'):
+            pass
+        connection.ensure_connection()
+
+        self.assertEqual(connection.execute_wrappers.count(queryobserver._observe), 1)
+        self.assertEqual(
+            [wrapper for wrapper in connection.execute_wrappers if wrapper is not queryobserver._observe], [],
+        )
+
+    def test_listeners_see_every_statement(self):
+        """Test a listener is called once per statement, on connections opened later in other threads"""
+        queryobserver.subscribe(self.listen)
+        queryobserver.subscribe(self.listen)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.calls[0][0], 'SELECT 1')
+        self.assertGreaterEqual(self.calls[0][1], 0)
+
+        def query():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 2')
+            connection.close()
+
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+        self.assertEqual([sql for sql, _ in self.calls], ['SELECT 1', 'SELECT 2'])
+
+        queryobserver.unsubscribe(self.listen)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 3')
+        self.assertEqual(len(self.calls), 2)
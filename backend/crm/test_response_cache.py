@@ -0,0 +1,93 @@
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import response_cache
+from .models import Lead
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+
+
+class ResponseCacheTest(APITestCase):
+    """Test the per-user versioned GET response cache"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user, first_name='John', status='new')
+        self.other_user = UserFactory()
+        self.other_lead = LeadFactory(user=self.other_user)
+        self.authenticate(self.user)
+        response_cache.reset_stats()
+
+    def authenticate(self, user):
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_hit_after_miss(self):
+        """Test a repeated GET is served from cache without touching the database"""
+        url = reverse('lead-list')
+        first = self.client.get(url, {'status': 'new', 'page_size': 5})
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        # Same parameters in another order share the entry; the user comes from the auth cache
+        with self.assertNumQueries(0):
+            second = self.client.get(url + '?page_size=5&status=new')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(response_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_lead_write_invalidates(self):
+        """Test lead writes bump the owner's generation"""
+        detail = reverse('lead-detail', kwargs={'pk': self.lead.id})
+        self.client.get(detail)
+        self.client.get(reverse('analytics'))
+        self.client.patch(detail, {'status': 'qualified'})
+
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['status'], 'qualified')
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['leads']['by_status'], {'qualified': 1})
+
+    def test_activity_write_invalidates(self):
+        """Test activity writes invalidate the recent feed"""
+        url = reverse('recent-activities')
+        self.assertEqual(self.client.get(url).data, [])
+        self.client.post(
+            reverse('lead-activities', kwargs={'lead_id': self.lead.id}),
+            {'activity_type': 'call', 'title': 'Intro', 'activity_date': timezone.now().isoformat()},
+        )
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([activity['title'] for activity in response.data], ['Intro'])
+
+    def test_users_are_isolated(self):
+        """Test entries are per user and other users' writes don't invalidate them"""
+        url = reverse('lead-list')
+        self.client.get(url)
+        LeadFactory(user=self.other_user)
+        ActivityFactory(lead=self.other_lead)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        self.authenticate(self.other_user)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_errors_are_not_cached(self):
+        """Test non-200 responses are never stored"""
+        url = reverse('lead-detail', kwargs={'pk': self.other_lead.id})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response_cache.stats(), {'hits': 0, 'misses': 2})
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """Test the cache can be switched off"""
+        response = self.client.get(reverse('lead-list'))
+        self.assertNotIn('X-Cache', response)
+        Lead.objects.filter(pk=self.lead.pk).update(first_name='Jane')
+        self.assertEqual(self.client.get(reverse('lead-list')).data['results'][0]['first_name'], 'Jane')
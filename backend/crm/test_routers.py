@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import routers
+from .models import Lead, LeadStats
+from .factories import LeadFactory
+from accounts.factories import UserFactory
+
+
+@override_settings(REPLICA_DATABASE='replica', RESPONSE_CACHE_ENABLED=False)
+class ReplicaRoutingTest(APITestCase):
+    """Test safe reads go to the replica and writes pin the writer to the primary"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        # Two local databases; the "replica" holds an older copy of the lead
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user, first_name='Primary', status='new')
+        User.objects.using('replica').bulk_create([User(id=self.user.id, username=self.user.username)])
+        Lead.objects.using('replica').bulk_create([Lead(
+            id=self.lead.id, user_id=self.user.id, first_name='Replica', last_name=self.lead.last_name,
+            email=self.lead.email, status='contacted', created_at=self.lead.created_at,
+        )])
+        LeadStats.objects.using('replica').bulk_create([LeadStats(user_id=self.user.id, status='contacted', count=1)])
+        cache.clear()  # creating the lead above pinned the user
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_reads_use_replica(self):
+        """Test list, retrieve, export and analytics are served from the replica"""
+        response = self.client.get(reverse('lead-list'))
+        self.assertEqual(response.data['results'][0]['first_name'], 'Replica')
+        response = self.client.get(reverse('lead-detail', kwargs={'pk': self.lead.id}))
+        self.assertEqual(response.data['first_name'], 'Replica')
+        response = self.client.get(reverse('lead-export') + '?format=csv&fields=first_name')
+        self.assertIn('Replica', b''.join(response.streaming_content).decode())
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.data['leads']['by_status'], {'contacted': 1})
+
+    def test_write_goes_to_primary_and_pins_reads(self):
+        """Test a write lands on the primary and the writer then reads it back from there"""
+        response = self.client.patch(
+            reverse('lead-detail', kwargs={'pk': self.lead.id}), {'first_name': 'Updated'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Lead.objects.using('default').get(id=self.lead.id).first_name, 'Updated')
+        self.assertEqual(Lead.objects.using('replica').get(id=self.lead.id).first_name, 'Replica')
+        self.assertTrue(routers.is_pinned(self.user.id))
+
+        response = self.client.get(reverse('lead-list'))
+        self.assertEqual(response.data['results'][0]['first_name'], 'Updated')
+
+    def test_pin_is_per_user(self):
+        """Test another user's write doesn't pin this user"""
+        LeadFactory(user=UserFactory(), status='new')
+        response = self.client.get(reverse('lead-list'))
+        self.assertEqual(response.data['results'][0]['first_name'], 'Replica')
+
+    def test_routing_ends_with_the_request(self):
+        """Test code outside a replica view keeps reading the primary"""
+        self.client.get(reverse('lead-list'))
+        self.assertEqual(Lead.objects.get(id=self.lead.id).first_name, 'Primary')
+        self.assertEqual(Lead.objects.all().db, 'default')
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_without_replica(self):
+        """Test nothing is routed or pinned when no replica is configured"""
+        response = self.client.get(reverse('lead-list'))
+        self.assertEqual(response.data['results'][0]['first_name'], 'Primary')
+        LeadFactory(user=self.user, status='new')
+        self.assertFalse(routers.is_pinned(self.user.id))
@@ -0,0 +1,139 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import Lead, LeadSearchDocument
+from .factories import LeadFactory, ActivityFactory
+from accounts.factories import UserFactory
+from . import search
+
+
+class LeadSearchIndexTest(APITestCase):
+    """Test the search document stays in sync with leads and activities"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.lead = LeadFactory(user=self.user, first_name='Maria', last_name='Lopez',
+                                property_interest='Waterfront condo')
+
+    def test_document_created_with_lead(self):
+        """Test saving a lead writes its search document"""
+        document = LeadSearchDocument.objects.get(lead=self.lead)
+        self.assertIn('Maria', document.name)
+        self.assertIn('Waterfront', document.interest)
+
+    def test_activity_changes_update_document(self):
+        """Test adding and deleting activities refreshes the document"""
+        activity = ActivityFactory(lead=self.lead, user=self.user, title='Sunset viewing', notes='Loved the dock')
+        self.assertIn('dock', LeadSearchDocument.objects.get(lead=self.lead).activities)
+
+        activity.delete()
+        self.assertNotIn('dock', LeadSearchDocument.objects.get(lead=self.lead).activities)
+
+    def test_hard_delete_removes_document(self):
+        """Test deleting a lead with activities cascades cleanly"""
+        ActivityFactory(lead=self.lead, user=self.user)
+        self.lead.delete()
+        self.assertFalse(LeadSearchDocument.objects.exists())
+
+    def test_rebuild_index(self):
+        """Test index_leads recreates missing documents"""
+        LeadSearchDocument.objects.all().delete()
+        search.index_leads([self.lead.id])
+        self.assertTrue(LeadSearchDocument.objects.filter(lead=self.lead).exists())
+
+
+class LeadSearchAPITest(APITestCase):
+    """Test ranked ?q= search on the lead list"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.other_user = UserFactory()
+        self.name_match = LeadFactory(user=self.user, first_name='Harbor', last_name='Smith',
+                                      property_interest='Townhouse')
+        self.notes_match = LeadFactory(user=self.user, first_name='Ann', last_name='Lee',
+                                       property_interest='Ranch')
+        ActivityFactory(lead=self.notes_match, user=self.user, title='Call',
+                        notes='Wants a harbor view with a boat slip')
+        self.no_match = LeadFactory(user=self.user, first_name='Zed', last_name='Quinn',
+                                    property_interest='Farmland', email='zed@example.com')
+        self.other_users_lead = LeadFactory(user=self.other_user, first_name='Harbor')
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.leads_url = reverse('lead-list')
+
+    def test_search_ranks_name_above_notes(self):
+        """Test name matches outrank activity note matches"""
+        response = self.client.get(self.leads_url, {'q': 'harbor'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [lead['id'] for lead in response.data['results']]
+        self.assertEqual(ids, [self.name_match.id, self.notes_match.id])
+        self.assertEqual(response.data['count'], 2)
+        first, second = response.data['results']
+        self.assertGreater(first['search_rank'], second['search_rank'])
+        self.assertIn('**', second['search_snippet'])
+
+    def test_search_prefix_and_property_interest(self):
+        """Test prefix terms match property_interest"""
+        response = self.client.get(self.leads_url, {'q': 'townh'})
+
+        self.assertEqual([lead['id'] for lead in response.data['results']], [self.name_match.id])
+
+    def test_search_respects_filters_and_soft_delete(self):
+        """Test search only returns active leads that pass the other filters"""
+        self.name_match.is_active = False
+        self.name_match.save(update_fields=['is_active'])
+
+        response = self.client.get(self.leads_url, {'q': 'harbor'})
+        self.assertEqual([lead['id'] for lead in response.data['results']], [self.notes_match.id])
+
+        self.notes_match.status = 'qualified'
+        self.notes_match.save()
+        response = self.client.get(self.leads_url, {'q': 'harbor', 'status': 'closed'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_search_pages_through_every_hit(self):
+        """Test the count covers every match and later pages continue the ranking"""
+        extra = [LeadFactory(user=self.user, first_name='Harbor', status='new') for _ in range(3)]
+        response = self.client.get(self.leads_url, {'q': 'harbor', 'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        name_matches = {self.name_match.id, *(lead.id for lead in extra)}
+        self.assertLessEqual({lead['id'] for lead in response.data['results']}, name_matches)
+
+        # The weaker notes match ranks last
+        response = self.client.get(self.leads_url, {'q': 'harbor', 'page_size': 2, 'page': 3})
+        self.assertEqual([lead['id'] for lead in response.data['results']], [self.notes_match.id])
+        self.assertEqual([hit.lead_id for hit in search.search(Lead.objects.filter(user=self.user), 'harbor', 1, 4)],
+                         [self.notes_match.id])
+
+    def test_search_ignores_query_syntax(self):
+        """Test punctuation in the query cannot break the engine"""
+        response = self.client.get(self.leads_url, {'q': '"harbor* OR) NEAR('})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_email_parts(self):
+        """Test searching by email domain part"""
+        response = self.client.get(self.leads_url, {'q': 'zed@example'})
+
+        self.assertEqual([lead['id'] for lead in response.data['results']], [self.no_match.id])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL text search configs')
+class PostgresNameSearchTest(APITestCase):
+    """Test names, indexed with the 'simple' config, match terms the 'english' config would stem or drop"""
+
+    def test_stemmed_and_stop_word_names(self):
+        """Test "Emily" (stemmed to "emili") and "Will" (a stop word) still find the lead"""
+        user = UserFactory()
+        lead = LeadFactory(user=user, first_name='Emily', last_name='Will', property_interest='Condo')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        for query in ('emily', 'Will', 'emily will', 'emil'):
+            response = self.client.get(reverse('lead-list'), {'q': query})
+            self.assertEqual([result['id'] for result in response.data['results']], [lead.id], query)
+        self.assertIn('**Emily**', response.data['results'][0]['search_snippet'])
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+from . import sqlite
+
+
+class SQLiteProfileTest(TestCase):
+    """Test the SQLite connection profile and maintenance"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'profile.sqlite3')
+        self.addCleanup(shutil.rmtree, directory)
+        # Drop the default database's OPTIONS, which may be PostgreSQL's (e.g. DB_POOL)
+        self.wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path, 'OPTIONS': {}}, alias='sqlite-profile',
+        )
+        self.addCleanup(self.wrapper.close)
+
+    def test_profile_applied_to_new_connections(self):
+        """Test a new connection to a SQLite file gets the configured pragmas"""
+        values = sqlite.settings_in_effect(self.wrapper)
+        self.assertEqual(values['journal_mode'], 'wal')
+        self.assertEqual(values['synchronous'], 1)  # NORMAL
+        self.assertEqual(values['busy_timeout'], sqlite.pragmas()['busy_timeout'])
+        self.assertEqual(values['mmap_size'], sqlite.pragmas()['mmap_size'])
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_profile_disabled(self):
+        """Test SQLITE_TUNED=False leaves SQLite's defaults"""
+        self.assertEqual(sqlite.settings_in_effect(self.wrapper)['journal_mode'], 'delete')
+
+    def test_maintenance_truncates_wal(self):
+        """Test maintenance checkpoints every WAL frame and empties the WAL file"""
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x)')
+            cursor.executemany('INSERT INTO t VALUES (%s)', [(i,) for i in range(100)])
+        self.assertGreater(os.path.getsize(self.path + '-wal'), 0)
+        result = sqlite.maintain(self.wrapper)
+        self.assertFalse(result['busy'])
+        self.assertEqual(result['checkpointed'], result['log_frames'])
+        self.assertEqual(os.path.getsize(self.path + '-wal'), 0)
+
+    def test_maintenance_command_requires_sqlite_file(self):
+        """Test the command refuses in-memory databases"""
+        with self.assertRaises(CommandError):
+            call_command('sqlite_maintenance')
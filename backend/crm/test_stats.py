@@ -0,0 +1,130 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import stats
+from .models import Lead, LeadStats
+from .factories import LeadFactory
+from accounts.factories import UserFactory
+
+
+class LeadStatsTest(APITestCase):
+    """Test LeadStats follows every lead write and backs /api/analytics/"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.other_user = UserFactory()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def counters(self, user=None):
+        user = user or self.user
+        return dict(LeadStats.objects.filter(user=user).exclude(count=0).values_list('status', 'count'))
+
+    def test_create_update_and_delete(self):
+        """Test counters move with create, status change and hard delete"""
+        lead = LeadFactory(user=self.user, status='new')
+        LeadFactory(user=self.user, status='new')
+        LeadFactory(user=self.other_user, status='new')
+        self.assertEqual(self.counters(), {'new': 2})
+
+        lead.status = 'contacted'
+        lead.save()
+        self.assertEqual(self.counters(), {'new': 1, 'contacted': 1})
+
+        # Saving again without a change must not count twice
+        lead.save()
+        self.assertEqual(self.counters(), {'new': 1, 'contacted': 1})
+
+        lead.delete()
+        self.assertEqual(self.counters(), {'new': 1})
+        self.assertEqual(self.counters(self.other_user), {'new': 1})
+
+    def test_api_status_change_destroy_and_restore(self):
+        """Test PATCH, soft delete and restore keep counters in step"""
+        lead = LeadFactory(user=self.user, status='new')
+        detail = reverse('lead-detail', kwargs={'pk': lead.id})
+
+        self.client.patch(detail, {'status': 'qualified'})
+        self.assertEqual(self.counters(), {'qualified': 1})
+
+        response = self.client.delete(detail)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.counters(), {})
+        lead.refresh_from_db()
+        self.assertGreater(lead.updated_at, lead.created_at)
+
+        response = self.client.post(reverse('lead-restore', kwargs={'pk': lead.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counters(), {'qualified': 1})
+
+    def test_saves_of_stale_instances(self):
+        """Test two instances loaded before either saves still move the right counters"""
+        lead = LeadFactory(user=self.user, status='new')
+        first, second = Lead.objects.get(pk=lead.pk), Lead.objects.get(pk=lead.pk)
+        first.status = 'qualified'
+        first.save()
+        second.status = 'closed'
+        second.save()
+        self.assertEqual(self.counters(), {'closed': 1})
+        self.assertEqual(stats.drift([self.user.id]), [])
+
+        # A soft delete through a stale instance takes the stored status out, not the loaded one
+        first.is_active = False
+        first.save(update_fields=['is_active'])
+        self.assertEqual(self.counters(), {})
+        second.is_active = True  # restoring through it keeps the stored status as well
+        second.status = 'new'
+        second.save(update_fields=['is_active'])
+        self.assertEqual(self.counters(), {'closed': 1})
+
+    def test_delete_of_stale_instance(self):
+        """Test a hard delete through an instance loaded before a status change takes the stored status out"""
+        lead = LeadFactory(user=self.user, status='new')
+        LeadFactory(user=self.user, status='new')
+        stale = Lead.objects.get(pk=lead.pk)
+        fresh = Lead.objects.get(pk=lead.pk)
+        fresh.status = 'qualified'
+        fresh.save()
+
+        stale.delete()
+        self.assertEqual(self.counters(), {'new': 1})
+        self.assertEqual(stats.drift([self.user.id]), [])
+
+    def test_save_with_deferred_fields_recounts(self):
+        """Test a save whose previous state was never loaded still moves the stored status"""
+        lead = LeadFactory(user=self.user, status='new')
+        partial = Lead.objects.only('id', 'user_id').get(pk=lead.pk)
+        partial.status = 'lost'
+        partial.save(update_fields=['status'])
+        self.assertEqual(self.counters(), {'lost': 1})
+
+    def test_analytics_reads_counters(self):
+        """Test analytics totals come from LeadStats"""
+        LeadFactory(user=self.user, status='new')
+        LeadFactory(user=self.user, status='closed')
+        LeadFactory(user=self.user, status='closed', is_active=False)
+        LeadFactory(user=self.other_user, status='new')
+
+        response = self.client.get(reverse('analytics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['leads'], {'total': 2, 'by_status': {'new': 1, 'closed': 1}})
+
+    def test_verify_and_rebuild_command(self):
+        """Test rebuild_lead_stats --verify reports drift and a rebuild repairs it"""
+        LeadFactory(user=self.user, status='new')
+        LeadFactory(user=self.user, status='lost')
+        call_command('rebuild_lead_stats', '--verify', stdout=StringIO())
+
+        # QuerySet.update bypasses Lead.save, so the counters drift
+        Lead.objects.filter(user=self.user).update(status='closed')
+        self.assertEqual(len(stats.drift()), 3)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_lead_stats', '--verify', stdout=StringIO())
+
+        call_command('rebuild_lead_stats', '--user', str(self.user.id), stdout=StringIO())
+        self.assertEqual(self.counters(), {'closed': 2})
+        self.assertEqual(stats.drift(), [])
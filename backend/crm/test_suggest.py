@@ -0,0 +1,106 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import LeadSuggestKey
+from .factories import LeadFactory
+from accounts.factories import UserFactory
+from . import suggest
+
+
+class LeadSuggestAPITest(APITestCase):
+    """Test the /api/leads/suggest/ typeahead endpoint"""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.john = LeadFactory(user=self.user, first_name='John', last_name='Doe',
+                                email='jdoe@example.com', phone='(555) 123-4567')
+        self.joan = LeadFactory(user=self.user, first_name='Joan', last_name='Rivers',
+                                email='joan@example.com', phone='')
+        self.jose = LeadFactory(user=self.user, first_name='José', last_name='Núñez',
+                                email='jose@example.com', phone='')
+        LeadFactory(user=UserFactory(), first_name='Johnny', last_name='Other')
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('lead-suggest')
+
+    def suggest_ids(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data]
+
+    def test_prefix_matches_names_email_and_phone(self):
+        """Test prefixes match first name, last name, email and phone digits"""
+        self.assertEqual(set(self.suggest_ids('jo')), {self.john.id, self.joan.id, self.jose.id})
+        self.assertEqual(self.suggest_ids('Riv'), [self.joan.id])
+        self.assertEqual(self.suggest_ids('jdoe@'), [self.john.id])
+        self.assertEqual(self.suggest_ids('555-12'), [self.john.id])
+        self.assertEqual(self.suggest_ids('john d'), [self.john.id])
+
+    def test_accents_are_folded(self):
+        """Test accented names match plain ASCII prefixes"""
+        self.assertEqual(self.suggest_ids('nune'), [self.jose.id])
+
+    def test_response_shape_and_dedup(self):
+        """Test each lead appears once with only id, full_name and email"""
+        response = self.client.get(self.url, {'q': 'joan'})
+
+        self.assertEqual(response.data, [{'id': self.joan.id, 'full_name': 'Joan Rivers', 'email': 'joan@example.com'}])
+
+    def test_limit_and_empty_query(self):
+        """Test the limit parameter and blank queries"""
+        self.assertEqual(len(self.suggest_ids('jo', limit=2)), 2)
+        self.assertEqual(self.suggest_ids(''), [])
+
+    def test_limit_counts_leads(self):
+        """Test leads matching on every one of their keys still fill the limit"""
+        leads = [
+            LeadFactory(user=self.user, first_name=f'9{i}0', last_name=f'9{i}1',
+                        email=f'9{i}2@example.com', phone=f'9{i}3-00')
+            for i in range(6)
+        ]
+        self.assertEqual(self.suggest_ids('9', limit=5), [lead.id for lead in leads[:5]])
+
+    def test_unchanged_keys_are_not_rewritten(self):
+        """Test full saves only write keys for fields that changed"""
+        self.john.status = 'contacted'
+        with CaptureQueriesContext(connection) as ctx:
+            self.john.save()
+        key_writes = [q['sql'] for q in ctx.captured_queries
+                      if 'crm_leadsuggestkey' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(key_writes, [])
+
+        self.john.last_name = 'Dough'
+        self.john.save()
+        self.assertEqual(
+            sorted(LeadSuggestKey.objects.filter(lead=self.john).values_list('key', flat=True)),
+            suggest.keys_for(self.john),
+        )
+        self.assertEqual(self.suggest_ids('dough'), [self.john.id])
+
+    def test_soft_deleted_and_renamed_leads(self):
+        """Test keys follow renames and soft-deleted leads are hidden"""
+        self.joan.is_active = False
+        self.joan.save(update_fields=['is_active'])
+        self.assertEqual(self.suggest_ids('joan'), [])
+
+        self.john.first_name = 'Jack'
+        self.john.save()
+        self.assertEqual(self.suggest_ids('jack'), [self.john.id])
+        self.assertEqual(LeadSuggestKey.objects.filter(lead=self.john, key='john').count(), 0)
+
+    @override_settings(SUGGEST_CACHE_ENABLED=True)
+    def test_cache_is_invalidated_by_writes(self):
+        """Test cached suggestions are dropped when the user's leads change"""
+        suggest.cache.clear()
+        self.assertEqual(self.suggest_ids('riv'), [self.joan.id])
+
+        with self.assertNumQueries(0):  # the user comes from the auth cache
+            self.assertEqual(self.suggest_ids('riv'), [self.joan.id])
+
+        LeadFactory(user=self.user, first_name='Rivka', last_name='Stone')
+        self.assertEqual(len(self.suggest_ids('riv')), 2)
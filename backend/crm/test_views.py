@@ -18,8 +18,11 @@ class LeadAPITest(APITestCase):
         self.user2 = UserFactory()
         
         # Create leads for user1
-        self.lead1 = LeadFactory(user=self.user1, first_name='John', last_name='Doe')
-        self.lead2 = LeadFactory(user=self.user1, first_name='Jane', last_name='Smith')
+        # LeadFactory cycles statuses across the whole run, so pin the ones the filter test reads
+        self.lead1 = LeadFactory(user=self.user1, first_name='John', last_name='Doe', status='new')
+        # A random email could start with 'john' and match the search test as well
+        self.lead2 = LeadFactory(user=self.user1, first_name='Jane', last_name='Smith', status='new',
+                                 email='jane.smith@example.com')
         
         # Create lead for user2
         self.lead3 = LeadFactory(user=self.user2, first_name='Bob', last_name='Johnson')
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LeadViewSet,  LeadActivityListCreateAPIView, ActivityDetailAPIView, RecentActivitiesAPIView, AnalyticsAPIView
+from .views import LeadViewSet,  LeadActivityListCreateAPIView, LeadActivityExportAPIView, ActivityDetailAPIView, RecentActivitiesAPIView, AnalyticsAPIView, DashboardAPIView, LeadCubeAPIView, BatchAPIView, DatabaseStatsAPIView
 
 router = DefaultRouter()
 router.register(r'leads', LeadViewSet, basename='lead')
@@ -8,8 +8,13 @@ router.register(r'leads', LeadViewSet, basename='lead')
 urlpatterns = [
     path('', include(router.urls)),
     path('leads/<int:lead_id>/activities/', LeadActivityListCreateAPIView.as_view(), name='lead-activities'),
+    path('leads/<int:lead_id>/activities/export/', LeadActivityExportAPIView.as_view(), name='lead-activities-export'),
     path('leads/<int:lead_id>/activities/<int:pk>/', ActivityDetailAPIView.as_view(), name='activity-detail'),
     path('activities/recent/', RecentActivitiesAPIView.as_view(), name='recent-activities'),
     path('leads/<int:pk>/restore/', LeadViewSet.as_view({'post': 'restore'}), name='lead-restore'),
     path('analytics/', AnalyticsAPIView.as_view(), name='analytics'),
+    path('dashboard/', DashboardAPIView.as_view(), name='dashboard'),
+    path('analytics/cube/', LeadCubeAPIView.as_view(), name='analytics-cube'),
+    path('batch/', BatchAPIView.as_view(), name='batch'),
+    path('system/db/', DatabaseStatsAPIView.as_view(), name='system-db'),
 ]
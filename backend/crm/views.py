@@ -1,20 +1,46 @@
+import hmac
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch, Sum
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import viewsets, permissions, filters, status, generics
-from rest_framework.exceptions import NotFound
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Lead, Activity
-from .serializers import LeadSerializer, ActivitySerializer
+from .serializers import (
+    LeadSerializer, LeadSearchResultSerializer, LeadBulkSerializer, LeadBulkStatusSerializer, ActivitySerializer,
+    BatchSerializer,
+)
+from . import aio, batch, bulk, cube, dbstats, importer, metrics, search, stats, suggest
+from . import export as exports
+from .aio import AsyncAPIView
+from .response_cache import cache_response
+from .routers import ReplicaReadsMixin
+from .pagination import CursorPaginationOptInMixin, LeadCursorPagination, ActivityCursorPagination
+from .fieldsets import SparseFieldsetMixin, parse_field_list, select_names
 # Create your views here.
 
-class LeadViewSet(viewsets.ModelViewSet):
+class LeadViewSet(ReplicaReadsMixin, CursorPaginationOptInMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = LeadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_pagination_class = LeadCursorPagination  # ?pagination=cursor
+    sparse_always_load = ('id', 'created_at')  # ?fields=; cursor pages read created_at
 
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['first_name', 'last_name', 'email']
     filterset_fields = ['status', 'is_active']  # ?status=new/contacted/...
+    retrieve_includes = ('activities', 'stats')  # ?include= sections embedded by retrieve
+    replica_actions = ('list', 'retrieve', 'export_leads')  # served from DATABASE_REPLICA_URL when configured
 
     def get_queryset(self):
         # Only show leads belonging to the authenticated user
@@ -28,17 +54,189 @@ class LeadViewSet(viewsets.ModelViewSet):
         else:
             # Default: only show active leads
             queryset = queryset.filter(is_active=True)
-            
-        return queryset
+
+        if 'activities' in self.get_includes():
+            # First timeline page (+1 row to detect a next page) in the same prefetch query
+            paginator = ActivityCursorPagination()
+            activities = Activity.objects.select_related('user').order_by(*paginator.ordering)
+            queryset = queryset.prefetch_related(
+                Prefetch('activities', queryset=activities[:paginator.page_size + 1], to_attr='first_activities')
+            )
+        return self.narrow_queryset(queryset)
+
+    def get_includes(self):
+        if self.action != 'retrieve':
+            return set()
+        include = set(parse_field_list(self.request.query_params.get('include')) or ())
+        unknown = include - set(self.retrieve_includes)
+        if unknown:
+            raise ValidationError({'include': f"Unknown include(s): {', '.join(sorted(unknown))}"})
+        return include
+
+    def get_serializer_class(self):
+        if self.action == 'list' and 'q' in self.request.query_params:
+            return LeadSearchResultSerializer
+        return super().get_serializer_class()
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q')
+        if query is None:
+            return super().list(request, *args, **kwargs)
+
+        # Full-text mode: rank ids in the search index, then load only the page's leads
+        queryset = self.filter_queryset(self.get_queryset())
+        hits = search.SearchResults(queryset, query)
+        # Results are ordered by relevance, so always page by number here; each page is one ranked slice
+        self._paginator = self.pagination_class()
+        page = self.paginate_queryset(hits)
+
+        leads = queryset.in_bulk([hit.lead_id for hit in page])
+        snippets = search.snippets(leads.keys(), query, using=queryset.db)
+        results = []
+        for hit in page:
+            lead = leads[hit.lead_id]
+            lead.search_rank = hit.rank
+            lead.search_snippet = snippets.get(hit.lead_id, '')
+            results.append(lead)
+
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # ?include=activities,stats saves the lead page its second round trip:
+    # `activities` is the first cursor page of the timeline, `stats` its aggregates
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        include = self.get_includes()
+        if not include:
+            return super().retrieve(request, *args, **kwargs)
+
+        lead = self.get_object()
+        data = self.get_serializer(lead).data
+        if 'activities' in include:
+            data['activities'] = self.embedded_activities(lead)
+        if 'stats' in include:
+            data['stats'] = self.activity_stats(lead)
+        return Response(data)
+
+    def embedded_activities(self, lead):
+        # Same shape as GET /api/leads/<id>/activities/?pagination=cursor, whose `next` link it hands over to
+        paginator = ActivityCursorPagination()
+        page = lead.first_activities[:paginator.page_size]
+        next_link = None
+        if len(lead.first_activities) > paginator.page_size:
+            base_url = self.request.build_absolute_uri(
+                reverse('lead-activities', kwargs={'lead_id': lead.id}) + '?pagination=cursor'
+            )
+            next_link = paginator.link_after(base_url, page[-1])
+        serializer = ActivitySerializer(page, many=True, context=self.get_serializer_context())
+        return {'next': next_link, 'previous': None, 'results': serializer.data}
+
+    def activity_stats(self, lead):
+        # One GROUP BY over the lead's timeline index
+        rows = (
+            Activity.objects.filter(lead=lead).order_by().values('activity_type')
+            .annotate(total=Count('id'), duration=Sum('duration'), last=Max('activity_date'))
+        )
+        by_type = {row['activity_type']: row['total'] for row in rows}
+        return {
+            'total': sum(by_type.values()),
+            'by_type': by_type,
+            'total_duration': sum(row['duration'] or 0 for row in rows),
+            'last_activity_at': max((row['last'] for row in rows), default=None),
+        }
+
+    # Typeahead for lead pickers: ?q=<prefix>&limit=<n>, returns id/full_name/email only
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def suggest(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', suggest.DEFAULT_LIMIT)), 1), suggest.MAX_LIMIT)
+        except ValueError:
+            limit = suggest.DEFAULT_LIMIT
+        return Response(suggest.lookup(request.user.id, request.query_params.get('q', ''), limit))
+
+    # Whole-book download honouring the list's filters and search: ?format=csv|ndjson, ?fields=/?omit=
+    @action(detail=False, methods=['get'], url_path='export', url_name='export',
+            renderer_classes=exports.EXPORT_RENDERERS, pagination_class=None)
+    def export_leads(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        query = request.query_params.get('q')
+        if query is not None:
+            # Every match, however many: a subquery on the index rather than a list of ranked ids
+            queryset = search.filter_matching(queryset, query)
+        columns = select_names(LeadSerializer.Meta.fields, **self.get_sparse_fieldset())
+        return exports.stream_export(request, queryset.order_by('-created_at', '-id'), columns, 'leads')
+
+    # Bulk import: multipart `file` (CSV, JSON array or NDJSON), optional `format`, `batch_size`, `dry_run`
+    @action(detail=False, methods=['post'], url_path='import', url_name='import',
+            parser_classes=[MultiPartParser], pagination_class=None)
+    def import_leads(self, request):
+        return self.run_import(request, sync=False)
+
+    # Feed sync: upsert on (source, external_id), skipping rows whose content hash is unchanged.
+    # Takes the import's multipart upload, or a JSON array body with ?batch_size= / ?dry_run=.
+    @action(detail=False, methods=['post'], url_path='sync', url_name='sync',
+            parser_classes=[JSONParser, MultiPartParser], pagination_class=None)
+    def sync_leads(self, request):
+        return self.run_import(request, sync=True)
+
+    def run_import(self, request, sync):
+        rows = request.data if isinstance(request.data, list) else None
+        options = request.query_params if rows is not None else request.data
+        try:
+            batch_size = int(options.get('batch_size') or importer.default_batch_size())
+        except ValueError:
+            return Response({'batch_size': 'Must be a whole number.'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(options.get('dry_run', '')).lower() in ['true', '1', 'yes']
+
+        if rows is not None:
+            result = importer.import_rows(request.user, rows, batch_size, dry_run, sync)
+        else:
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'file': 'Upload a CSV, JSON or NDJSON file.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                file_format = importer.detect_format(upload.name, request.data.get('format'))
+            except importer.ImportFormatError as exc:
+                return Response({'format': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            result = importer.import_leads(request.user, upload, file_format, batch_size, dry_run, sync)
+
+        if result['created']:
+            return Response(result, status=status.HTTP_201_CREATED)
+        if result['failed'] and not (result.get('updated') or result.get('unchanged')):
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    # Bulk actions: POST {"ids": [...]} (plus "status" for bulk-update-status). One UPDATE per call;
+    # the response lists each id's outcome (updated/deleted/restored, unchanged, already_active, not_found).
+    @action(detail=False, methods=['post'], url_path='bulk-update-status', url_name='bulk-update-status',
+            pagination_class=None)
+    def bulk_update_status(self, request):
+        serializer = LeadBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk.update_status(request.user, **serializer.validated_data))
+
+    @action(detail=False, methods=['post'], url_path='bulk-destroy', url_name='bulk-destroy', pagination_class=None)
+    def bulk_destroy(self, request):
+        serializer = LeadBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk.destroy(request.user, serializer.validated_data['ids']))
+
+    @action(detail=False, methods=['post'], url_path='bulk-restore', url_name='bulk-restore', pagination_class=None)
+    def bulk_restore(self, request):
+        serializer = LeadBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk.restore(request.user, serializer.validated_data['ids']))
 
     # Soft delete: mark is_active=False
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         # Ensure user can only delete their own leads
-        if instance.user != request.user:
+        if instance.user_id != request.user.id:
             return Response(status=status.HTTP_403_FORBIDDEN)
         instance.is_active = False
-        instance.save(update_fields=['is_active'])
+        # updated_at is auto_now but only written when listed; the Deleted Leads page shows it
+        instance.save(update_fields=['is_active', 'updated_at'])
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     # Restore soft-deleted lead
@@ -50,21 +248,23 @@ class LeadViewSet(viewsets.ModelViewSet):
                 return Response({'detail': 'Lead is already active'}, status=status.HTTP_400_BAD_REQUEST)
             
             lead.is_active = True
-            lead.save(update_fields=['is_active'])
+            lead.save(update_fields=['is_active', 'updated_at'])
             serializer = self.get_serializer(lead)
             return Response(serializer.data)
         except Lead.DoesNotExist:
             return Response({'detail': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class LeadActivityListCreateAPIView(generics.ListCreateAPIView):
+class LeadActivityListCreateAPIView(CursorPaginationOptInMixin, SparseFieldsetMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ActivitySerializer
+    cursor_pagination_class = ActivityCursorPagination  # ?pagination=cursor
+    sparse_always_load = ('id', 'activity_date', 'created_at')
 
     def get_queryset(self):
         lead_id = self.kwargs.get('lead_id')
         # Ensure the lead belongs to the authenticated user
         lead = get_object_or_404(Lead, id=lead_id, user=self.request.user, is_active=True)
-        return Activity.objects.filter(lead=lead).select_related('user', 'lead')
+        return self.narrow_queryset(Activity.objects.filter(lead=lead).select_related('user', 'lead'))
 
     def perform_create(self, serializer):
         lead_id = self.kwargs.get('lead_id')
@@ -73,55 +273,172 @@ class LeadActivityListCreateAPIView(generics.ListCreateAPIView):
         # force user & lead so clients can't spoof them
         serializer.save(lead=lead, user=self.request.user)
 
-class ActivityDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class LeadActivityExportAPIView(ReplicaReadsMixin, SparseFieldsetMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = exports.EXPORT_RENDERERS  # ?format=csv|ndjson
+
+    def get(self, request, lead_id):
+        lead = get_object_or_404(Lead, id=lead_id, user=request.user, is_active=True)
+        columns = select_names(exports.ACTIVITY_EXPORT_FIELDS, **self.get_sparse_fieldset())
+        queryset = Activity.objects.filter(lead=lead).order_by('-activity_date', '-created_at', '-id')
+        return exports.stream_export(request, queryset, columns, f'lead-{lead.id}-activities')
+
+class ActivityDetailAPIView(SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ActivitySerializer
 
     def get_queryset(self):
         # Ensure activities belong to leads owned by the authenticated user
         lead_id = self.kwargs.get('lead_id')
-        return Activity.objects.filter(
+        return self.narrow_queryset(Activity.objects.filter(
             lead_id=lead_id, 
             lead__user=self.request.user,
             lead__is_active=True
-        ).select_related('user', 'lead')
+        ).select_related('user', 'lead'))
+
+def recent_activities(user):
+    # Only show activities for leads owned by the authenticated user
+    return Activity.objects.filter(
+        lead__user=user,
+        lead__is_active=True
+    ).select_related('lead', 'user').order_by('-activity_date', '-created_at')
 
-class RecentActivitiesAPIView(APIView):
+def serialize_recent_activities(user):
+    return ActivitySerializer(recent_activities(user)[:10], many=True).data
+
+class RecentActivitiesAPIView(ReplicaReadsMixin, SparseFieldsetMixin, AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
-        # Only show activities for leads owned by the authenticated user
-        qs = Activity.objects.filter(
-            lead__user=request.user,
-            lead__is_active=True
-        ).select_related('lead', 'user').order_by('-activity_date', '-created_at')[:10]
-        data = ActivitySerializer(qs, many=True).data
+    @cache_response
+    async def get(self, request):
+        qs = self.narrow_queryset(recent_activities(request.user), ActivitySerializer)[:10]
+        activities = [activity async for activity in qs]
+        data = ActivitySerializer(activities, many=True, **self.get_sparse_fieldset()).data
         return Response(data)
 
-class AnalyticsAPIView(APIView):
+class AnalyticsAPIView(ReplicaReadsMixin, AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
-        # Get all active leads for analytics (no pagination)
-        leads = Lead.objects.filter(user=request.user, is_active=True)
-        
-        # Calculate stats
-        total = leads.count()
-        by_status = {}
-        for lead in leads:
-            status = lead.status
-            by_status[status] = by_status.get(status, 0) + 1
-        
-        # Get recent activities
-        recent_activities = Activity.objects.filter(
-            lead__user=request.user,
-            lead__is_active=True
-        ).select_related('lead', 'user').order_by('-activity_date', '-created_at')[:10]
-        
+    @cache_response
+    async def get(self, request):
+        # Pipeline counts come from the maintained LeadStats rows, not a scan of the book;
+        # they and the recent feed are independent, so the two queries overlap
+        (total, by_status), activities = await aio.gather(
+            partial(stats.summary, request.user.id),
+            partial(serialize_recent_activities, request.user),
+        )
         return Response({
             'leads': {
                 'total': total,
                 'by_status': by_status
             },
-            'recent_activities': ActivitySerializer(recent_activities, many=True).data
+            'recent_activities': activities
+        })
+
+class DashboardAPIView(ReplicaReadsMixin, AsyncAPIView):
+    """
+    Everything the dashboard shows in one request: pipeline counts, the recent
+    activity feed, activity counts by type and new leads over the last
+    `?days=` (default 30, at most 365). The four queries run concurrently.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cache_response
+    async def get(self, request):
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+        except ValueError:
+            return Response({'days': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        since = timezone.now() - timedelta(days=days)
+        user = request.user
+
+        def activity_counts():
+            return dict(
+                Activity.objects.filter(lead__user=user, lead__is_active=True, activity_date__gte=since)
+                .values_list('activity_type').annotate(count=Count('id')).order_by()
+            )
+
+        def new_leads():
+            return Lead.objects.filter(user=user, is_active=True, created_at__gte=since).count()
+
+        (total, by_status), activities, by_type, created = await aio.gather(
+            partial(stats.summary, user.id), partial(serialize_recent_activities, user), activity_counts, new_leads,
+        )
+        return Response({
+            'leads': {'total': total, 'by_status': by_status, 'new': created},
+            'activities': {'total': sum(by_type.values()), 'by_type': by_type},
+            'recent_activities': activities,
+            'days': days,
         })
+
+class LeadCubeAPIView(APIView):
+    """
+    Slice and drill into the analytics cube.
+
+    ?dims=source,month groups by any of month/status/source/activity_type;
+    ?status=, ?source=, ?activity_type= (comma-separated) and ?from=/?to=
+    (YYYY-MM) filter. Each cell reports leads, closed, activities and
+    conversion_rate (closed / leads).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        dims = list(dict.fromkeys(parse_field_list(params.get('dims')) or ['month']))
+        unknown = set(dims) - set(cube.DIMENSIONS)
+        if unknown:
+            return Response({'dims': f"Unknown dimension(s): {', '.join(sorted(unknown))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {name: parse_field_list(params.get(name)) for name in ('status', 'source', 'activity_type')}
+        for param, name in (('from', 'month_from'), ('to', 'month_to')):
+            if params.get(param):
+                try:
+                    filters[name] = datetime.strptime(params[param], '%Y-%m').date()
+                except ValueError:
+                    return Response({param: 'Use YYYY-MM.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Serve the stored cells; only refresh (a write) when the book changed since the watermark
+        cube.refresh_if_stale(request.user.id)
+        return Response({'dims': dims, 'cells': cube.query(request.user.id, dims, filters)})
+
+class BatchAPIView(APIView):
+    """
+    Run several API calls in one round trip (see crm/batch.py).
+
+    POST {"requests": [{"id": "me", "method": "GET", "path": "/api/auth/me/"}, ...],
+    "parallel": true} returns {"responses": [{"id", "status", "headers", "body",
+    "duration_ms"}, ...], "duration_ms"} in request order, always with HTTP 200.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        started = time.perf_counter()
+        responses = batch.run(request._request, request.user, serializer.validated_data['requests'],
+                              parallel=serializer.validated_data['parallel'])
+        return Response({'responses': responses, 'duration_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+
+class DatabaseStatsAPIView(APIView):
+    """Connection settings and counters of the process serving the request (crm/dbstats.py); staff only"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(dbstats.snapshot())
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (crm/metrics.py): bearer METRICS_TOKEN when set, otherwise DEBUG only"""
+    if not metrics.enabled():
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    elif not settings.DEBUG:
+        raise Http404
+    body, content_type = metrics.exposition()
+    return HttpResponse(body, content_type=content_type)
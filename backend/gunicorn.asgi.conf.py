@@ -0,0 +1,35 @@
+"""
+Gunicorn profile serving the API over ASGI with uvicorn workers:
+
+    gunicorn -c gunicorn.asgi.conf.py backend.asgi:application
+
+Each worker runs an event loop, so a request waiting on the database (the
+async dashboard and analytics views, see crm/aio.py) doesn't hold the worker;
+sync views still run, one thread per request. CSV/NDJSON exports are sent
+as async streams, a chunk of rows at a time (crm/export.py). The WSGI
+profile remains `gunicorn backend.wsgi:application`; compare the two with
+`python manage.py bench_dashboard`.
+
+Django opens a connection per request thread under ASGI, so persistent
+connections are turned off here unless DB_CONN_MAX_AGE is set explicitly;
+set DB_POOL=True to reuse connections from a per-worker pool instead.
+
+With METRICS_ENABLED, workers share PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates all of them; the directory and the hooks that manage it come from
+gunicorn.conf.py.
+"""
+import os
+import runpy
+
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+# gunicorn.conf.py isn't importable by name; running it also sets PROMETHEUS_MULTIPROC_DIR
+# when metrics are enabled
+_wsgi_profile = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+on_starting = _wsgi_profile['on_starting']
+child_exit = _wsgi_profile['child_exit']
+
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
@@ -0,0 +1,37 @@
+"""
+Gunicorn settings picked up by `gunicorn backend.wsgi:application` (the file
+is loaded from the working directory by default).
+
+Workers are separate processes, so /metrics (crm/metrics.py) only sees every
+worker's counters if they share PROMETHEUS_MULTIPROC_DIR: prometheus_client
+then keeps them in mmap'd files there and the endpoint merges them. The
+directory is emptied when the master starts, and a dead worker's live values
+are dropped when it exits. All of this only happens with METRICS_ENABLED;
+otherwise the hooks do nothing. gunicorn.asgi.conf.py reuses these hooks.
+"""
+import os
+import shutil
+
+import decouple
+
+# Read the same way as settings.METRICS_ENABLED. A module-level `config` would be taken
+# for gunicorn's own `config` setting, so the function stays behind its module.
+_metrics_enabled = decouple.config('METRICS_ENABLED', default=False, cast=bool)
+
+if _metrics_enabled:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/crm-prometheus')
+    # Imported up front: child_exit runs in the master's signal handling
+    from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    if not _metrics_enabled:
+        return
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if _metrics_enabled:
+        multiprocess.mark_process_dead(worker.pid)
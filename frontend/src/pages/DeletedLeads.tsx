@@ -34,7 +34,12 @@ export default function DeletedLeads() {
       setLoading(true);
       try {
         // Get all leads including soft-deleted ones
-        const response = await api.get("/leads/?is_active=false");
+        const response = await api.get("/leads/", {
+          params: {
+            is_active: false,
+            fields: "id,first_name,last_name,full_name,email,phone,status,budget_min,budget_max,updated_at",
+          },
+        });
         const responseData = response.data;
         
         // Handle both paginated and direct array responses
@@ -77,10 +82,15 @@ export default function DeletedLeads() {
     
     setRestoring(-1); // Special value for "restoring all"
     try {
-      for (const lead of leads) {
-        await api.post(`/leads/${lead.id}/restore/`);
-      }
-      setLeads([]);
+      // One request for the whole page instead of one restore per lead
+      const res = await api.post<{ results: { id: number; outcome: string }[] }>(
+        "/leads/bulk-restore/",
+        { ids: leads.map(lead => lead.id) }
+      );
+      const restored = new Set(
+        res.data.results.filter(r => r.outcome !== "not_found").map(r => r.id)
+      );
+      setLeads(leads.filter(lead => !restored.has(lead.id)));
     } catch (err) {
       const ax = err as AxiosError<{ detail?: string }>;
       setError(ax.response?.data?.detail ?? "Restore failed");
@@ -51,36 +51,26 @@ export default function LeadDetail() {
   const [saving, setSaving] = useState(false);
 
   useEffect(() => {
+    if (!id) return;
+
+    // One round trip: the lead with the first page of its activities embedded
     (async () => {
+      setLoadingActivities(true);
       try {
-        const res = await api.get<Lead>(`/leads/${id}/`);
-        setLead(res.data);
+        const res = await api.get<Lead & { activities?: { results: Activity[] } }>(`/leads/${id}/`, {
+          params: { include: "activities" },
+        });
+        const { activities: embedded, ...leadData } = res.data;
+        setLead(leadData);
+        setActivities(embedded?.results ?? []);
       } catch (err) {
         const ax = err as AxiosError<{ detail?: string }>;
         setError(ax.response?.data?.detail ?? "Failed to fetch lead");
-      }
-    })();
-  }, [id]);
-
-  useEffect(() => {
-    if (!id) return;
-    
-    const fetchActivities = async () => {
-      setLoadingActivities(true);
-      try {
-        const response = await api.get(`/leads/${id}/activities/`);
-        // Handle both paginated and direct array responses
-        const activitiesData = response.data.results || response.data || [];
-        setActivities(Array.isArray(activitiesData) ? activitiesData : []);
-      } catch (error) {
-        console.error('Error loading activities:', error);
         setActivities([]);
       } finally {
         setLoadingActivities(false);
       }
-    };
-
-    fetchActivities();
+    })();
   }, [id]);
 
   const handleDelete = async () => {
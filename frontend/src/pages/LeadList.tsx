@@ -50,6 +50,8 @@ export default function LeadList() {
             page_size: pageSize,
             search: q || undefined,
             status: statusFilter !== "all" ? statusFilter : undefined,
+            // Only the columns this table renders
+            fields: "id,full_name,email,phone,status,budget_min,budget_max,created_at",
           },
         });
         